@@ -0,0 +1,315 @@
+"""
+Fake LLM, Serper and frontend endpoints for the offline benchmarks.
+
+One threaded HTTP server answers:
+- POST .../chat/completions          OpenAI compatible (groq/* via LLM_BASE_URL)
+- POST ...:generateContent           Gemini API (gemini/* via LLM_BASE_URL)
+- POST /search                       Serper (via SERPER_BASE_URL)
+- anything else                      200 {"ok": true} (revalidation webhooks)
+
+The fake LLM plays the crews' ReAct loop: the manager delegates once to the
+coworker of the task and then answers, workers search once and then answer
+with a canned result matching the task. Latency is simulated per call and
+per completion token.
+
+    python -m bench.fake_backend --port 8900     # standalone, for manual runs
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from array import array
+import threading
+import argparse
+import hashlib
+import random
+import json
+import time
+import uuid
+import os
+import re
+
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "400"))
+FAKE_LLM_MS_PER_TOKEN = float(os.getenv("FAKE_LLM_MS_PER_TOKEN", "2"))
+FAKE_SEARCH_LATENCY_MS = float(os.getenv("FAKE_SEARCH_LATENCY_MS", "300"))
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "50"))
+
+# Task header in the prompt -> (kind, coworker role the manager delegates to)
+TASKS = [
+    ("Identify Trending News Topics Across Categories", "topics_multi", "Trending Topic Analyst"),
+    ("Identify Trending News Topics", "topics", "Trending Topic Analyst"),
+    ("Final Editorial Review", "review", "Senior News Editor"),
+    ("Write a Newsworthy Article", "write", "News Article Writer"),
+    ("Gather Related Research and Sources", "research", "Internet Intelligence Gatherer"),
+]
+
+WORDS = (
+    "flood budget election cricket vaccine market summit satellite court strike "
+    "festival drought reform merger outbreak tariff ceasefire launch verdict rally "
+    "monsoon currency startup stadium pipeline treaty census exports heatwave port"
+).split()
+
+
+def _words(n: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(n))
+
+
+def _article() -> dict:
+    return {
+        "title": f"Bench {_words(4).title()} {uuid.uuid4().hex[:6]}",
+        "summary": f"{_words(12).capitalize()}. {_words(10).capitalize()}.",
+        "content": "\n\n".join(
+            f"## {_words(3).title()}\n\n{_words(60).capitalize()}." for _ in range(4)
+        ),
+        "tags": [random.choice(WORDS) for _ in range(4)],
+        "sources": ["https://www.reuters.com/bench", "https://apnews.com/bench"],
+    }
+
+
+def _topics(multi: bool, categories: list) -> dict:
+    root = []
+    for category in categories or [""]:
+        for _ in range(2):
+            topic = {
+                "title": f"{_words(5).capitalize()} {uuid.uuid4().hex[:8]}",
+                "summary": f"{_words(15).capitalize()} {uuid.uuid4().hex}.",
+                "source": ["https://www.reuters.com/bench"],
+                "published": time.strftime("%Y-%m-%d"),
+            }
+            if multi:
+                topic["category"] = category
+            root.append(topic)
+    return {"root": root}
+
+
+def final_answer(kind: str, prompt: str) -> str:
+    if kind == "research":
+        return "\n".join(f"- {_words(14).capitalize()}." for _ in range(8))
+    if kind == "write":
+        return json.dumps(_article())
+    if kind == "review":
+        return json.dumps(
+            {
+                "accuracy_score": random.randint(70, 95),
+                "reason": "Consistent with the research",
+                "status": "APPROVED",
+                "feedback": _words(20).capitalize(),
+                "article": _article(),
+            }
+        )
+    if kind == "topics_multi":
+        block = prompt.split("- Categories:", 1)[-1].split("- Minimum", 1)[0]
+        categories = re.findall(r"^\s*- (.+)$", block, flags=re.MULTILINE)
+        return json.dumps(_topics(True, categories))
+    if kind == "topics":
+        return json.dumps(_topics(False, []))
+    return _words(30)
+
+
+def react_reply(prompt: str, last: str) -> str:
+    """
+    Next ReAct step for the agent whose full conversation is `prompt`.
+    """
+    kind, coworker = "other", ""
+    for header, task_kind, role in TASKS:
+        if header in prompt:
+            kind, coworker = task_kind, role
+            break
+
+    # The format instructions in the system prompt mention "Observation:" too
+    observed = bool(re.search(r"Observation:(?! the result of the action)", last))
+    is_manager = "Manager Agent" in prompt and "Delegate work to coworker" in prompt
+
+    if is_manager and not observed and coworker:
+        header = next(h for h, k, _ in TASKS if k == kind)
+        return (
+            "Thought: The coworker should handle this.\n"
+            "Action: Delegate work to coworker\n"
+            "Action Input: "
+            + json.dumps(
+                {
+                    "task": f"**Task**: {header}",
+                    "context": prompt[-1500:],
+                    "coworker": coworker,
+                }
+            )
+        )
+
+    if not is_manager and not observed and "Search the internet" in prompt:
+        return (
+            "Thought: I need to search first.\n"
+            "Action: Search the internet\n"
+            'Action Input: {"search_query": "' + _words(3) + '"}'
+        )
+
+    return "Thought: I now know the final answer\nFinal Answer: " + final_answer(kind, prompt)
+
+
+def _texts(value) -> list:
+    # Every string under "content" / "text" of an OpenAI or Gemini request
+    if isinstance(value, dict):
+        out = []
+        for k, v in value.items():
+            if k in ("content", "text") and isinstance(v, str):
+                out.append(v)
+            else:
+                out += _texts(v)
+        return out
+    if isinstance(value, list):
+        return [t for v in value for t in _texts(v)]
+    return []
+
+
+def _sleep_for(text: str):
+    tokens = len(text) // 4
+    time.sleep((FAKE_LLM_LATENCY_MS + FAKE_LLM_MS_PER_TOKEN * tokens) / 1000)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: dict, status: int = 200):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        self._send({"ok": True})
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+
+        if self.path.rstrip("/").endswith("/search"):
+            time.sleep(FAKE_SEARCH_LATENCY_MS / 1000)
+            query = body.get("q", "")
+            return self._send(
+                {
+                    "organic": [
+                        {
+                            "title": f"{query} {_words(4)}",
+                            "link": f"https://www.reuters.com/bench/{uuid.uuid4().hex[:8]}",
+                            "snippet": _words(25),
+                        }
+                        for _ in range(int(body.get("num", 10)))
+                    ]
+                }
+            )
+
+        texts = _texts(body)
+        if self.path.endswith("/chat/completions") or ":generateContent" in self.path:
+            prompt = "\n".join(texts)
+            reply = react_reply(prompt, texts[-1] if texts else "")
+            _sleep_for(reply)
+
+            prompt_tokens, completion_tokens = len(prompt) // 4, len(reply) // 4
+            if ":generateContent" in self.path:
+                return self._send(
+                    {
+                        "candidates": [
+                            {
+                                "content": {"parts": [{"text": reply}], "role": "model"},
+                                "finishReason": "STOP",
+                                "index": 0,
+                            }
+                        ],
+                        "usageMetadata": {
+                            "promptTokenCount": prompt_tokens,
+                            "candidatesTokenCount": completion_tokens,
+                            "totalTokenCount": prompt_tokens + completion_tokens,
+                        },
+                    }
+                )
+
+            return self._send(
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": reply},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                }
+            )
+
+        # Revalidation webhooks and anything else
+        self._send({"ok": True})
+
+
+class FakeBackend:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBackend":
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="fake-backend", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeEmbeddingFunction:
+    """
+    Stand-in for chromadb's GoogleGenerativeAiEmbeddingFunction: deterministic
+    768 dimensional vectors from the text hash, with simulated latency.
+    """
+
+    def __init__(self, api_key: str = "", model_name: str = "", **kwargs):
+        self.model_name = model_name
+
+    def __call__(self, input):
+        time.sleep(FAKE_EMBEDDING_LATENCY_MS / 1000)
+        vectors = []
+        for doc in input:
+            seed = hashlib.sha256(doc.encode("utf-8")).digest()
+            rng = random.Random(seed)
+            vectors.append(array("f", (rng.uniform(-1, 1) for _ in range(768))).tolist())
+        return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    backend = FakeBackend(args.host, args.port)
+    print(f"Fake backend listening on {backend.url}")
+    try:
+        backend.server.serve_forever()
+    except KeyboardInterrupt:
+        backend.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Microbenchmark and regression check for lib.json_extract over the raw crew
+outputs in bench/corpus (article_*.txt: editorial review output,
+topics_*.txt: topic research output).
+
+    python -m bench.json_extract
+    python -m bench.json_extract --number 2000
+
+For every file it reports whether the previous fence-stripping parser and
+the extractor get a usable result, how the extractor got it, whether it
+validates (when crewai is installed) and the time per call.
+"""
+
+from lib.clean_crewai_response import clean_crewai_article, clean_crewai_topics
+from lib.json_extract import extract_json, validate
+import contextlib
+import argparse
+import timeit
+import glob
+import json
+import io
+import os
+import re
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def legacy_parse(raw: str):
+    # The parser used before lib.json_extract, kept as the baseline
+    try:
+        cleaned = raw.strip()
+        cleaned = re.sub(r"^\s*(json)?\s*[\n\r]+", "", cleaned, flags=re.IGNORECASE)
+        cleaned = re.sub(r"^(```(json)?|'''|\"\"\")", "", cleaned, flags=re.IGNORECASE).strip()
+        cleaned = re.sub(r"(```|'''|\"\"\")$", "", cleaned, flags=re.IGNORECASE).strip()
+        return json.loads(cleaned)
+    except Exception:
+        return None
+
+
+def usable(value, kind: str) -> bool:
+    if not isinstance(value, dict):
+        return False
+    if kind == "article":
+        return isinstance(value.get("article"), dict) and bool(value["article"].get("content"))
+    return isinstance(value.get("root"), list) and bool(value["root"])
+
+
+def models():
+    try:
+        from config.article.tasks import VerifiedArticle
+        from config.topic.tasks import TrendingTopic
+
+        return {"article": VerifiedArticle, "topics": TrendingTopic}
+    except Exception:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    validators = models()
+    files = sorted(glob.glob(os.path.join(CORPUS, "*.txt")))
+
+    print(f"{'file':<36}{'legacy':>8}{'new':>10}{'valid':>7}{'legacy µs':>11}{'new µs':>9}")
+    totals = {"legacy": 0, "new": 0, "valid": 0}
+    for path in files:
+        name = os.path.basename(path)
+        kind = "article" if name.startswith("article") else "topics"
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+
+        legacy_ok = usable(legacy_parse(raw), kind)
+        value, how = extract_json(raw, kinds="{" if kind == "article" else "{[")
+        new_ok = usable(value, kind)
+
+        valid = "-"
+        if kind in validators:
+            # The clean_* helpers print their repairs, keep the table readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                if kind == "article":
+                    cleaned, _ = clean_crewai_article(raw, validators[kind])
+                    ok = validate(cleaned, validators[kind])[1] is None
+                else:
+                    cleaned = clean_crewai_topics(raw, validators[kind])
+                    ok = bool(cleaned["root"])
+            valid = "yes" if ok else "no"
+            totals["valid"] += ok
+
+        legacy_us = timeit.timeit(lambda: legacy_parse(raw), number=args.number) / args.number * 1e6
+        new_us = timeit.timeit(lambda: extract_json(raw), number=args.number) / args.number * 1e6
+
+        totals["legacy"] += legacy_ok
+        totals["new"] += new_ok
+        print(
+            f"{name:<36}{'ok' if legacy_ok else 'FAIL':>8}{how if new_ok else 'FAIL':>10}"
+            f"{valid:>7}{legacy_us:>11.1f}{new_us:>9.1f}"
+        )
+
+    print(
+        f"\n{len(files)} outputs: legacy parsed {totals['legacy']}, "
+        f"extractor parsed {totals['new']}"
+        + (f", {totals['valid']} validated" if validators else " (install crewai to validate)")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Prefix-reuse report for the crew prompts.
+
+Renders the prompts of a batch of jobs (agent system prompt + task
+description) the way the workers build them and reports, per task, how much
+of every prompt is a byte-identical prefix of the previous job's prompt,
+i.e. what a provider-side prompt cache can reuse.
+
+    python -m bench.prefix_reuse                 # offline, 8 synthetic jobs
+    python -m bench.prefix_reuse --jobs 20
+    python -m bench.prefix_reuse --topics topics.json
+    python -m bench.prefix_reuse --live          # also call the models once per
+                                                 # prompt, report cached tokens
+                                                 # and time to first token
+
+--topics takes a JSON list of {"title", "summary", "source"} objects.
+--live needs GROQ_API_KEY (and the provider keys of the task models).
+"""
+
+from lib.prompt_budget import count_text_tokens
+from typing import Dict, List
+import argparse
+import json
+import time
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+
+from config.article.agents import ArticleWriterAgents
+from config.article.tasks import ArticleWriterTasks
+from config.topic.agents import TopicReasearcherAgents
+from config.topic.tasks import TopicReasearcherTasks
+
+
+# Providers only cache prefixes above a minimum length (Gemini implicit
+# caching starts at 1024 tokens, Groq caches in blocks of similar size)
+MIN_CACHEABLE_PREFIX = int(os.getenv("MIN_CACHEABLE_PREFIX", "1024"))
+
+SAMPLE_TOPICS = [
+    {
+        "title": "Pakistan beat Australia in Perth to clinch ODI series",
+        "summary": "Pakistan won the third ODI by eight wickets, sealing their first series win in Australia in 22 years.",
+        "source": ["https://www.espncricinfo.com/", "https://www.dawn.com/"],
+    },
+    {
+        "title": "State Bank of Pakistan holds policy rate at 11 percent",
+        "summary": "The central bank kept rates unchanged citing easing inflation and external account risks.",
+        "source": ["https://www.sbp.org.pk/", "https://www.reuters.com/"],
+    },
+    {
+        "title": "OpenAI announces new reasoning model for developers",
+        "summary": "The model targets coding and math tasks and is available through the API from today.",
+        "source": ["https://openai.com/blog", "https://www.theverge.com/"],
+    },
+    {
+        "title": "WHO warns of dengue surge across South Asia",
+        "summary": "Cases have doubled compared to last year as monsoon rains extended into October.",
+        "source": ["https://www.who.int/", "https://apnews.com/"],
+    },
+    {
+        "title": "Oil prices climb after OPEC+ extends output cuts",
+        "summary": "Brent crude rose above $85 a barrel after the group extended voluntary cuts into next year.",
+        "source": ["https://www.bloomberg.com/", "https://www.ft.com/"],
+    },
+    {
+        "title": "Ceasefire talks resume in Cairo",
+        "summary": "Negotiators returned to Cairo for a new round of talks mediated by Egypt and Qatar.",
+        "source": ["https://www.aljazeera.com/", "https://www.bbc.com/"],
+    },
+]
+
+
+def system_prompt(agent) -> str:
+    # Same order as crewai's role_playing slice
+    return f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"
+
+
+def job_prompts(topic: dict, category: str) -> Dict[str, tuple]:
+    """
+    Returns {task name: (model, system prompt, user prompt)} for one job.
+    """
+    article_agents = ArticleWriterAgents("bench")
+    article_tasks = ArticleWriterTasks()
+    informant = article_agents.informant()
+    mentalist = article_agents.news_mentalist()
+    editor = article_agents.final_editor()
+
+    topic_agents = TopicReasearcherAgents("bench")
+    topic_tasks = TopicReasearcherTasks()
+    researcher = topic_agents.expert_researcher()
+
+    tasks = {
+        "research": (
+            informant,
+            article_tasks.gather_research_data(
+                informant, topic["title"], topic["summary"], topic["source"], ""
+            ),
+        ),
+        "write": (
+            mentalist,
+            article_tasks.write_news_article(
+                mentalist, topic["title"], topic["summary"], [], ""
+            ),
+        ),
+        "review": (
+            editor,
+            article_tasks.editorial_review(
+                editor, topic["title"], topic["summary"], topic["source"], [], ""
+            ),
+        ),
+        "fetch_trending_topics": (
+            researcher,
+            topic_tasks.fetch_trending_topics(researcher, category, [], 1, 2, "24 hours"),
+        ),
+    }
+
+    return {
+        name: (
+            agent.llm.model,
+            system_prompt(agent),
+            f"{task.description}\n\n{task.expected_output}",
+        )
+        for name, (agent, task) in tasks.items()
+    }
+
+
+def common_prefix(a: str, b: str) -> str:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return a[:n]
+
+
+def live_call(model: str, system: str, user: str) -> dict:
+    import litellm
+
+    started = time.perf_counter()
+    response = litellm.completion(
+        model=model,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ],
+        max_tokens=1,
+    )
+    latency = time.perf_counter() - started
+
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "ttft": latency,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def run(topics: List[dict], jobs: int, live: bool):
+    categories = ["Sports", "Business", "Technology", "Health", "International"]
+    report = {}
+    previous = {}
+
+    for i in range(jobs):
+        prompts = job_prompts(topics[i % len(topics)], categories[i % len(categories)])
+
+        for name, (model, system, user) in prompts.items():
+            full = f"{system}\n\n{user}"
+            stats = report.setdefault(
+                name,
+                {"model": model, "tokens": 0, "prefix": 0, "cacheable": 0, "live": []},
+            )
+            tokens = count_text_tokens(full)
+            stats["tokens"] += tokens
+
+            if name in previous:
+                prefix = count_text_tokens(common_prefix(full, previous[name]))
+                stats["prefix"] += prefix
+                stats["cacheable"] += prefix if prefix >= MIN_CACHEABLE_PREFIX else 0
+            previous[name] = full
+
+            if live:
+                try:
+                    stats["live"].append(live_call(model, system, user))
+                except Exception as e:
+                    print(f"@@ERROR ({name} live call): {e}")
+
+    print(f"\nPrefix reuse over {jobs} jobs (min cacheable prefix {MIN_CACHEABLE_PREFIX} tokens)\n")
+    print(f"{'task':<24}{'avg tokens':>12}{'reuse':>10}{'cacheable':>12}")
+    for name, stats in report.items():
+        # The first job of a batch never hits the cache
+        later = stats["tokens"] * (jobs - 1) / jobs if jobs > 1 else 0
+        reuse = stats["prefix"] / later if later else 0.0
+        cacheable = stats["cacheable"] / later if later else 0.0
+        print(
+            f"{name:<24}{stats['tokens'] // jobs:>12}{reuse:>10.1%}{cacheable:>12.1%}"
+        )
+
+        if stats["live"]:
+            calls = stats["live"]
+            cached = sum(c["cached_tokens"] for c in calls)
+            prompt = sum(c["prompt_tokens"] for c in calls) or 1
+            ttfts = sorted(c["ttft"] for c in calls)
+            print(
+                f"{'':<24}live: cached {cached / prompt:.1%} of {prompt} prompt tokens, "
+                f"first call {calls[0]['ttft']:.2f}s, median {ttfts[len(ttfts) // 2]:.2f}s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--topics", help="JSON file with a list of topics")
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    topics = SAMPLE_TOPICS
+    if args.topics:
+        with open(args.topics) as f:
+            topics = json.load(f)
+
+    run(topics, max(args.jobs, 1), args.live)
+
+
+if __name__ == "__main__":
+    main()
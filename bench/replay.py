@@ -0,0 +1,136 @@
+"""
+Re-runs recorded crew runs offline from their cassettes.
+
+Record on a worker with CASSETTE_MODE=record (files land in CASSETTE_DIR,
+default ./cassettes), then:
+
+    python -m bench.replay cassettes/article-42-20250101T120000.jsonl.gz
+    python -m bench.replay cassettes/*.jsonl.gz            # regression run
+    python -m bench.replay run.jsonl.gz --realtime         # recorded latencies
+    python -m bench.replay run.jsonl.gz --profile 30       # cProfile, top 30
+
+The crew (ArticleWriterCrew, ResearcherCrew or MultiCategoryResearcherCrew)
+is rebuilt from the arguments in the cassette and every LLM, search and
+embedding call is answered from it, so no quota or network is used. Without
+--realtime the wall time is the orchestration overhead alone. Exits 1 when
+a run asks for a call the cassette does not have or its output does not
+parse, so the cassettes double as regression tests.
+"""
+
+import contextlib
+import argparse
+import tempfile
+import cProfile
+import pstats
+import time
+import sys
+import io
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "replay")
+os.environ.setdefault("GROQ_API_KEY", "replay")
+os.environ.setdefault("SERPER_API_KEY", "replay")
+os.environ.setdefault("CREWAI_STORAGE_DIR", tempfile.mkdtemp(prefix="replay-crewai-"))
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+
+from lib.cassette import Cassette, CassetteMiss, replaying
+from lib.clean_crewai_response import clean_crewai_article, clean_crewai_topics
+from config.article.create_article import ArticleWriterCrew
+from config.article.tasks import VerifiedArticle
+from config.topic.create_topics import ResearcherCrew, MultiCategoryResearcherCrew
+from config.topic.tasks import TrendingTopic, CategorizedTrendingTopic
+
+
+CREWS = {
+    "article": ArticleWriterCrew,
+    "topic": ResearcherCrew,
+    "multi_category": MultiCategoryResearcherCrew,
+}
+
+
+def parses(kind: str, res) -> bool:
+    data = getattr(res, "json_dict", None) or str(res)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if kind == "article":
+            article, _ = clean_crewai_article(data, VerifiedArticle)
+            return bool(article and article.get("article"))
+
+        model = CategorizedTrendingTopic if kind == "multi_category" else TrendingTopic
+        return bool(clean_crewai_topics(data, model).get("root"))
+
+
+def replay(path: str, realtime: bool, profile: int, verbose: bool) -> dict:
+    cassette = Cassette.load(path)
+    cassette.realtime = realtime
+    kind = cassette.meta.get("crew")
+    crew = CREWS[kind](**cassette.meta.get("args", {}), api_key="replay")
+
+    profiler = cProfile.Profile() if profile else None
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    error, ok = None, False
+    started = time.perf_counter()
+    try:
+        with replaying(cassette), output:
+            if profiler:
+                profiler.enable()
+            try:
+                res = crew.run()
+            finally:
+                if profiler:
+                    profiler.disable()
+        ok = parses(kind, res)
+    except CassetteMiss as e:
+        error = str(e)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - started
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(profile)
+
+    return {
+        "path": path,
+        "crew": kind,
+        "ok": ok and not cassette.stats["missed"],
+        "error": error,
+        "wall_seconds": round(wall, 2),
+        "recorded_seconds": round(sum(e.get("ms", 0) for e in cassette.exchanges) / 1000, 2),
+        "calls": len(cassette.exchanges),
+        "unused": cassette.unused(),
+        **cassette.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("cassettes", nargs="+")
+    parser.add_argument("--realtime", action="store_true", help="sleep the recorded latency of every call")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="print the top N cProfile entries")
+    parser.add_argument("--verbose", action="store_true", help="show the crew's output")
+    args = parser.parse_args()
+
+    results = [
+        replay(path, args.realtime, args.profile, args.verbose) for path in args.cassettes
+    ]
+
+    print(
+        f"\n{'cassette':<48}{'crew':>15}{'ok':>5}{'wall s':>9}{'recorded s':>12}"
+        f"{'calls':>7}{'exact':>7}{'order':>7}{'unused':>8}"
+    )
+    for r in results:
+        print(
+            f"{os.path.basename(r['path'])[-48:]:<48}{r['crew']:>15}{'yes' if r['ok'] else 'NO':>5}"
+            f"{r['wall_seconds']:>9}{r['recorded_seconds']:>12}{r['calls']:>7}"
+            f"{r['exact']:>7}{r['in_order']:>7}{r['unused']:>8}"
+        )
+        if r["error"]:
+            print(f"  @@ERROR: {r['error']}")
+
+    if not all(r["ok"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Offline end-to-end throughput benchmark of the crew pipeline.
+
+Runs real topic and article jobs (run_researcher_crew / run_article_writer_crew
+through RQ workers, crews, tools, Prisma and Redis) with every external
+service replaced: LLMs, Serper and the frontend by bench.fake_backend,
+Gemini embeddings by a hash based fake, Redis by fakeredis served over TCP
+(or --redis-url). Only Postgres is real, the schema uses postgresql arrays
+and enums so SQLite is not an option:
+
+    createdb bench && DATABASE_URL=postgresql://localhost/bench prisma db push
+    DATABASE_URL=postgresql://localhost/bench python -m bench.throughput
+    python -m bench.throughput --workers 1,2,4 --topic-jobs 4 --article-jobs 8
+    python -m bench.throughput --json result.json      # for CI, exits 1 on failed jobs
+
+Reports jobs/sec, p50/p95 job latency (enqueue to end), DB round trips per
+job and peak worker RSS for every worker count. Fake latencies are set with
+FAKE_LLM_LATENCY_MS, FAKE_LLM_MS_PER_TOKEN, FAKE_SEARCH_LATENCY_MS and
+FAKE_EMBEDDING_LATENCY_MS, so the numbers show orchestration overhead on
+top of a fixed provider cost.
+"""
+
+from multiprocessing import Process
+from typing import Dict, List
+import argparse
+import tempfile
+import resource
+import asyncio
+import socket
+import json
+import time
+import uuid
+import sys
+import os
+
+from bench.fake_backend import FakeBackend, FakeEmbeddingFunction
+
+
+BENCH_CATEGORY = {"name": "Bench", "slug": "bench"}
+
+RESEARCHER_CREW = "config.topic.create_topics.run_researcher_crew"
+ARTICLE_WRITER_CREW = "config.article.create_article.run_article_writer_crew"
+
+# Per worker process, written by the worker when it exits
+RSS_KEY = "bench:rss"
+DB_KEY = "bench:db"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_redis() -> str:
+    """
+    Serves fakeredis over TCP, worker processes need a shared server.
+    """
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("fakeredis>=2.26 is required, or pass --redis-url")
+
+    import threading
+
+    port = _free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, name="fakeredis", daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def configure_env(backend_url: str, redis_url: str, database_url: str):
+    # Must run before lib/ and config/ are imported, they read env at import time
+    os.environ.update(
+        {
+            "REDIS_URL": redis_url,
+            "DATABASE_URL": database_url,
+            "LLM_BASE_URL": backend_url,
+            "SERPER_BASE_URL": backend_url,
+            "FRONTEND_BASE_URL": backend_url,
+            "SECRET_KEY": "bench",
+            "CREWAI_STORAGE_DIR": tempfile.mkdtemp(prefix="bench-crewai-"),
+            "CREWAI_DISABLE_TELEMETRY": "true",
+            "OTEL_SDK_DISABLED": "true",
+        }
+    )
+    for key in ("GOOGLE_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY", "SERPER_API_KEY"):
+        os.environ.setdefault(key, "bench")
+
+    # Every run starts cold, cached LLM answers would hide the pipeline cost
+    os.environ.setdefault("LLM_CACHE_DISABLED", "true")
+
+
+def _count_db_round_trips() -> Dict[str, int]:
+    """
+    Counts requests sent to the Prisma query engine in this process.
+    A batch_() is one round trip, like in production.
+    """
+    import prisma.engine as engine
+
+    counter = {"round_trips": 0}
+    for name in ("AsyncQueryEngine", "QueryEngine"):
+        cls = getattr(engine, name, None)
+        if cls is None or not hasattr(cls, "query"):
+            continue
+
+        original = cls.query
+
+        async def query(self, *args, _original=original, **kwargs):
+            counter["round_trips"] += 1
+            return await _original(self, *args, **kwargs)
+
+        cls.query = query
+        break
+    else:
+        print("@@ERROR (bench): prisma query engine not found, DB round trips not counted")
+
+    return counter
+
+
+def bench_worker(name: str):
+    """
+    One burst worker process: fakes the embedder, counts DB round trips,
+    drains the queues and records its peak RSS.
+    """
+    import lib.embeddings
+
+    lib.embeddings.GoogleGenerativeAiEmbeddingFunction = FakeEmbeddingFunction
+    counter = _count_db_round_trips()
+
+    from lib.worker_pool import run_worker
+    from lib.redis_conn import get_redis
+
+    try:
+        run_worker(name, burst=True)
+    finally:
+        # ru_maxrss is in KB on Linux
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(RSS_KEY, name, rss)
+        pipe.hset(DB_KEY, name, counter["round_trips"])
+        pipe.execute()
+
+
+async def seed(topic_jobs: int, article_jobs: int) -> Dict[str, list]:
+    """
+    Creates the bench category, the topic generation jobs and one topic per
+    article job. Returns the enqueue args of both job types.
+    """
+    from prisma.enums import TRIGGER, TYPE
+    from prisma import Prisma
+    from lib import job_state
+
+    db = Prisma()
+    await db.connect()
+    try:
+        category = await db.category.upsert(
+            where={"slug": BENCH_CATEGORY["slug"]},
+            data={"create": BENCH_CATEGORY, "update": {}},
+        )
+
+        topic_args = []
+        jobs = await job_state.create_jobs(
+            db, [category.id] * topic_jobs, TYPE.TOPIC_GENERATION, TRIGGER.MANUAL
+        )
+        for job in jobs:
+            topic_args.append(
+                (1, 2, "24 hours", [], category.name, category.id, TRIGGER.MANUAL, job["id"], "")
+            )
+
+        article_args = []
+        jobs = await job_state.create_jobs(
+            db, [category.id] * article_jobs, TYPE.ARTICLE_GENERATION, TRIGGER.MANUAL
+        )
+        for job in jobs:
+            title = f"Bench topic {uuid.uuid4().hex[:8]}"
+            summary = "Synthetic topic seeded by bench.throughput."
+            sources = ["https://www.reuters.com/bench"]
+            topic = await db.topic.create(
+                data={
+                    "jobId": job["id"],
+                    "categoryId": category.id,
+                    "title": title,
+                    "summary": summary,
+                    "source": sources,
+                }
+            )
+            article_args.append(
+                (title, summary, sources, job["id"], category.id, TRIGGER.MANUAL, topic.id, "")
+            )
+
+        return {"topic": topic_args, "article": article_args}
+    finally:
+        await db.disconnect()
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def run_round(workers: int, topic_jobs: int, article_jobs: int) -> dict:
+    from prisma.enums import TRIGGER, TYPE
+    from lib.queues import enqueue_many, get_queue
+    from lib.redis_conn import get_redis
+    from rq.job import Job, JobStatus
+
+    redis_conn = get_redis()
+    redis_conn.flushdb()
+
+    args = asyncio.run(seed(topic_jobs, article_jobs))
+    enqueued = enqueue_many(
+        get_queue(TRIGGER.MANUAL, TYPE.TOPIC_GENERATION),
+        RESEARCHER_CREW,
+        args["topic"],
+        job_timeout=60 * 10,
+    ) + enqueue_many(
+        get_queue(TRIGGER.MANUAL, TYPE.ARTICLE_GENERATION),
+        ARTICLE_WRITER_CREW,
+        args["article"],
+        job_timeout=60 * 10,
+    )
+
+    started = time.perf_counter()
+    processes = [
+        Process(target=bench_worker, args=(f"bench.{workers}.{i}.{uuid.uuid4().hex[:6]}",))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - started
+
+    latencies, failed = [], 0
+    for job in Job.fetch_many([j.id for j in enqueued], connection=redis_conn):
+        if job is None or job.get_status() != JobStatus.FINISHED:
+            failed += 1
+            continue
+        latencies.append((job.ended_at - job.enqueued_at).total_seconds())
+
+    jobs = len(enqueued)
+    rss = [int(v) for v in redis_conn.hvals(RSS_KEY)]
+    round_trips = sum(int(v) for v in redis_conn.hvals(DB_KEY))
+
+    return {
+        "workers": workers,
+        "jobs": jobs,
+        "failed": failed,
+        "wall_seconds": round(wall, 2),
+        "jobs_per_second": round(jobs / wall, 3) if wall else 0.0,
+        "p50_seconds": round(percentile(latencies, 0.5), 2),
+        "p95_seconds": round(percentile(latencies, 0.95), 2),
+        "db_round_trips_per_job": round(round_trips / jobs, 1) if jobs else 0.0,
+        "peak_rss_mb": round(max(rss, default=0) / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+    parser.add_argument("--topic-jobs", type=int, default=2)
+    parser.add_argument("--article-jobs", type=int, default=4)
+    parser.add_argument("--redis-url", help="real Redis instead of fakeredis, it is flushed")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        sys.exit("Set DATABASE_URL or --database-url to a local Postgres (prisma db push first)")
+
+    backend = FakeBackend().start()
+    configure_env(backend.url, args.redis_url or start_fake_redis(), args.database_url)
+
+    results = []
+    try:
+        for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+            print(f"⏱️ {workers} worker(s): {args.topic_jobs} topic + {args.article_jobs} article jobs")
+            results.append(run_round(workers, args.topic_jobs, args.article_jobs))
+    finally:
+        backend.stop()
+
+    print(
+        f"\n{'workers':>8}{'jobs':>6}{'failed':>8}{'wall s':>9}{'jobs/s':>9}"
+        f"{'p50 s':>8}{'p95 s':>8}{'db/job':>8}{'rss MB':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['workers']:>8}{r['jobs']:>6}{r['failed']:>8}{r['wall_seconds']:>9}"
+            f"{r['jobs_per_second']:>9}{r['p50_seconds']:>8}{r['p95_seconds']:>8}"
+            f"{r['db_round_trips_per_job']:>8}{r['peak_rss_mb']:>9}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if any(r["failed"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,25 @@
-from crewai_tools import SerperDevTool
+from lib.tools.search import CachedSerperSearchTool
 from textwrap import dedent
 from crewai import Agent
-from crewai import LLM
+from lib.llm import CachedLLM
 import os
 
-search_tool = SerperDevTool()
+search_tool = CachedSerperSearchTool()
 
 
 class ArticleWriterAgents:
-    def __init__(self):
-        self.informantLLM = LLM(
-            api_key=os.getenv("GROQ_API_KEY"),
+    def __init__(self, api_key: str = ""):
+        self.informantLLM = CachedLLM(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
             model="groq/meta-llama/llama-4-scout-17b-16e-instruct",
+            cache=True,
         )
-        self.mentalistLLM = LLM(
-            api_key=os.getenv("GROQ_API_KEY"),
+        self.mentalistLLM = CachedLLM(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
             model="groq/gemma2-9b-it",
         )
-        self.editorLLM = LLM(
-            api_key=os.getenv("GROQ_API_KEY"),
+        self.editorLLM = CachedLLM(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
             model="groq/llama-3.3-70b-versatile",
         )
 
@@ -1,14 +1,28 @@
 from lib.clean_crewai_response import clean_crewai_article, clean_usage_tokens
 from config.article.agents import ArticleWriterAgents
-from config.article.tasks import ArticleWriterTasks
+from config.article.tasks import ArticleWriterTasks, VerifiedArticle
 from config.manager.agents import ManagerAgents
 from crewai import Crew, Process
 from crewai.memory import ShortTermMemory, EntityMemory
 from prisma.enums import STATUS, ARTICLESTATUS, TYPE
-from prisma import Prisma
-from typing import List
+from lib.db import get_db, run_job
+from lib.embeddings import embedder_config
+from lib import job_state
+from lib.job_events import bind_job, publish, register_task_events
+from lib import tracing
+from lib.metrics import timed_job
+from lib.llm import reset_llm_cache_stats, llm_cache_stats, llm_usage_by_model
+from lib.cassette import recording
+from lib.checkpoint import (
+    checkpoint_callback,
+    clear_checkpoints,
+    fingerprint,
+    load_checkpoints,
+    restore_output,
+)
+from typing import List, Optional
 from lib.revalidate import revalidate
-import asyncio
+from lib.key_pool import groq_key_pool
 import os
 
 
@@ -16,17 +30,32 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY environment variable is not set.")
 
+# Task and tool events of the jobs run by this process, see lib.job_events
+register_task_events()
+
 
 class ArticleWriterCrew:
-    def __init__(self, title: str, summary: str, sources: List[str] | str, prompt: str):
+    def __init__(
+        self,
+        title: str,
+        summary: str,
+        sources: List[str] | str,
+        prompt: str,
+        api_key: str = "",
+        topicId: Optional[int] = None,
+    ):
         self.topic_title = title
         self.summary = summary
         self.sources = sources
         self.prompt = prompt
+        self.api_key = api_key
+        # With a topicId, completed stages are checkpointed and a retry resumes
+        self.topicId = topicId
+        self.resumed_stages: List[str] = []
 
     def run(self):
         # Defining custom agents and tasks in agents.py and tasks.py
-        agents = ArticleWriterAgents()
+        agents = ArticleWriterAgents(self.api_key)
         tasks = ArticleWriterTasks()
 
         # Custom Agents for writing articles
@@ -51,30 +80,33 @@ class ArticleWriterCrew:
             self.prompt,
         )
 
-        embedder_cfg = {
-            "provider": "google",
-            "config": {
-                "api_key": GOOGLE_API_KEY,
-                "model": "text-embedding-004",
-            },
-        }
+        # Completed stages keep their output and are left out of the crew,
+        # the others save theirs when they complete
+        stages = {"research": research_task, "write": write_task}
+        checkpoints = {}
+        if self.topicId is not None:
+            inputs = fingerprint(self.topic_title, self.summary, self.sources, self.prompt)
+            checkpoints = load_checkpoints(self.topicId, inputs)
+            for stage, task in stages.items():
+                if stage in checkpoints:
+                    restore_output(task, stage, checkpoints[stage])
+                else:
+                    task.callback = checkpoint_callback(self.topicId, inputs, stage)
+        self.resumed_stages = list(checkpoints)
+
+        embedder_cfg = embedder_config(GOOGLE_API_KEY)
 
         NewsLetterCrew = Crew(
             agents=[informant, news_mentalist, final_editor],
-            tasks=[research_task, write_task, review_task],
+            tasks=[task for stage, task in stages.items() if stage not in checkpoints]
+            + [review_task],
             process=Process.hierarchical,
             verbose=True,
             manager_agent=manager_agent,
             max_rpm=15,
             short_term_memory=ShortTermMemory(embedder_config=embedder_cfg),
             entity_memory=EntityMemory(embedder_config=embedder_cfg),
-            embedder={
-                "provider": "google",
-                "config": {
-                    "api_key": GOOGLE_API_KEY,
-                    "model": "text-embedding-004",
-                },
-            },
+            embedder=embedder_cfg,
         )
 
         res = NewsLetterCrew.kickoff()
@@ -82,6 +114,7 @@ class ArticleWriterCrew:
         return res
 
 
+@timed_job(TYPE.ARTICLE_GENERATION)
 async def run_article_writer_crew_async(
     title: str,
     summary: str,
@@ -93,10 +126,6 @@ async def run_article_writer_crew_async(
     prompt: str = "",
     api_key: str = "",
 ):
-    # Set or overwrite an environment variable
-    if api_key:
-        os.environ["GROQ_API_KEY"] = api_key
-
     SECRET_KEY = os.getenv("SECRET_KEY")
     FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL")
 
@@ -111,29 +140,21 @@ async def run_article_writer_crew_async(
         "successful_requests": 0,
     }
 
-    db = Prisma()
-    await db.connect()
-
-    await db.job.update(
-        where={
-            "id": jobId,
-        },
-        data={
-            "status": STATUS.PROCESSING,
-        },
-    )
-
-    await db.topic.update(
-        where={
-            "id": topicId,
-        },
-        data={
-            "status": STATUS.PROCESSING,
-        },
-    )
+    db = await get_db()
+    reset_llm_cache_stats()
+    bind_job(jobId, topicId)
+    tracing.start_job("article_job", jobId, topicId=topicId, trigger=trigger)
+
+    await job_state.article_processing(db, jobId, topicId)
 
     revalidate(trigger, STATUS.PROCESSING, TYPE.ARTICLE_GENERATION)
 
+    # Key pinned by the caller, or the least loaded key of the pool for this job
+    groq_api_key = api_key or groq_key_pool.acquire(f"article:{topicId}", trigger)
+
+    # Marks the job's root span as failed
+    error = None
+
     try:
         # Initialize the Crew with provided parameters
         crew = ArticleWriterCrew(
@@ -141,16 +162,32 @@ async def run_article_writer_crew_async(
             summary,
             sources,
             prompt,
+            groq_api_key,
+            topicId=topicId,
         )
 
         # Run the Crew to get topics
-        res = crew.run()
+        with recording(
+            f"article-{jobId}",
+            crew="article",
+            args={"title": title, "summary": summary, "sources": sources, "prompt": prompt},
+        ):
+            with tracing.span("crew.kickoff", crew="article") as kickoff:
+                res = crew.run()
+                kickoff.set(resumed_stages=",".join(crew.resumed_stages))
+
+        if crew.resumed_stages:
+            print(f"♻️ Resumed article for topic {topicId} after: {', '.join(crew.resumed_stages)}")
+            publish("checkpoint_resumed", stages=crew.resumed_stages)
 
         data = getattr(res, "json_dict", None) or str(res)
-        raw_article = clean_crewai_article(data)
+        raw_article, how = clean_crewai_article(data, VerifiedArticle)
 
         metrics = getattr(res, "token_usage", None)
         usage_json = clean_usage_tokens(metrics) if metrics else DEFAULT_USAGE
+        usage_json = {**usage_json, **llm_cache_stats(), "models": llm_usage_by_model()}
+        publish("tokens", **usage_json)
+        tracing.annotate_job(**usage_json)
 
         # Send topics to Next.js webhook if valid
         if raw_article and "article" in raw_article and raw_article["article"]:
@@ -158,12 +195,25 @@ async def run_article_writer_crew_async(
 
             article_status = (
                 ARTICLESTATUS.APPROVED
-                if article.get("status") == "APPROVED"
+                if (raw_article.get("status") or article.get("status")) == "APPROVED"
                 else ARTICLESTATUS.REJECTED
             )
-
-            await db.article.create(
-                data={
+            feedback = raw_article.get("feedback")
+
+            # Salvaged from a truncated output, the article may be cut short:
+            # never publish it on the model's own approval
+            if how == "salvaged":
+                article_status = ARTICLESTATUS.REJECTED
+                feedback = (
+                    "Rejected automatically: the crew output was truncated and the "
+                    f"article was salvaged from partial JSON.\n\n{feedback or ''}"
+                ).strip()
+
+            await job_state.article_completed(
+                db,
+                jobId,
+                topicId,
+                {
                     "topicId": topicId,
                     "jobId": jobId,
                     "categoryId": categoryId,
@@ -176,97 +226,51 @@ async def run_article_writer_crew_async(
                     "articleStatus": article_status,
                     "accuracy": raw_article.get("accuracy_score"),
                     "reasoning": raw_article.get("reason"),
-                    "feedback": raw_article.get("feedback"),
-                }
-            )
-
-            print(f"✅ Article saved successfully!")
-
-            await db.job.update(
-                where={
-                    "id": jobId,
+                    "feedback": feedback,
                 },
-                data={"status": STATUS.PENDING, "completedItems": {"increment": 1}},
+                usage_json,
+                trigger,
             )
 
-            await db.topic.update(
-                where={
-                    "id": topicId,
-                },
-                data={
-                    "status": STATUS.COMPLETED,
-                },
-            )
+            print(f"✅ Article saved successfully!")
+            clear_checkpoints(topicId)
 
             revalidate(trigger, STATUS.PENDING, TYPE.ARTICLE_GENERATION)
 
         else:
-            await db.job.update(
-                where={
-                    "id": jobId,
-                },
-                data={
-                    "status": STATUS.FAILED,
-                    "error": f"Missing article in response from AI Agents\n**ERROR:**\t\t{res.json_dict}",
-                },
-            )
-
-            await db.topic.update(
-                where={
-                    "id": topicId,
-                },
-                data={
-                    "status": STATUS.FAILED,
-                },
+            error = "Missing article in response from AI Agents"
+            await job_state.article_failed(
+                db,
+                jobId,
+                topicId,
+                f"{error}\n**ERROR:**\t\t{res.json_dict}",
+                usage_json,
+                trigger,
             )
 
             revalidate(trigger, STATUS.FAILED, TYPE.ARTICLE_GENERATION)
 
-        if usage_json and usage_json.get("total_tokens"):
-            await db.usagemetric.create(
-                data={
-                    "trigger": trigger,
-                    "date": usage_json.get("date"),
-                    "promptTokens": usage_json.get("prompt_tokens"),
-                    "completionTokens": usage_json.get("completion_tokens"),
-                    "totalTokens": usage_json.get("total_tokens"),
-                    "successfulRequests": usage_json.get("successful_requests"),
-                    "jobId": jobId,
-                }
-            )
-
+        if job_state.usage_metric_data(usage_json, trigger, jobId):
             revalidate(trigger, STATUS.COMPLETED, TYPE.ARTICLE_GENERATION)
 
+        if error:
+            return {"ok": False, "message": error}
         return {"ok": True, "message": "Article saved"}
 
     except Exception as e:
         print(f"run_article_writer_crew failed for {title}: {e}")
-        await db.job.update(
-            where={
-                "id": jobId,
-            },
-            data={
-                "status": STATUS.FAILED,
-                "error": str(e),
-            },
-        )
-
-        await db.topic.update(
-            where={
-                "id": topicId,
-            },
-            data={
-                "status": STATUS.FAILED,
-            },
-        )
+        error = f"{type(e).__name__}: {e}"
+        await job_state.article_failed(db, jobId, topicId, str(e))
 
         revalidate(trigger, STATUS.FAILED, TYPE.ARTICLE_GENERATION)
 
         return {"ok": False, "message": "No article generated"}
 
     finally:
-        print("Closing Database Connection")
+        groq_key_pool.release(f"article:{topicId}")
+        bind_job(None)
+        tracing.end_job(error)
 
 
 def run_article_writer_crew(*args, **kwargs):
-    return asyncio.run(run_article_writer_crew_async(*args, **kwargs))
+    return run_job(run_article_writer_crew_async(*args, **kwargs))
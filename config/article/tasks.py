@@ -3,6 +3,8 @@ from pydantic import BaseModel
 from datetime import datetime
 from textwrap import dedent
 from crewai import Task
+from lib.prompt_budget import Section, bullet_list, fit_prompt, model_of
+from lib.llm import skip_llm_cache
 
 
 class Article(BaseModel):
@@ -80,27 +82,49 @@ class ArticleWriterTasks:
     def gather_research_data(
         self, agent, topic_title: str, summary: str, source: List[str] | str, prompt
     ):
-        return Task(
-            description=dedent(
-                f"""
+        description = fit_prompt(
+            "research",
+            model_of(agent),
+            dedent(
+                """
             **Task**: Gather Related Research and Sources
-            **Description**: Perform a comprehensive internet investigation for the topic "{topic_title}". 
+            **Description**: Perform a comprehensive internet investigation for the topic given in **Parameters** below. 
             Collect credible facts, expert quotes, stats, background context, and reliable source URLs. 
             Do not include speculative, outdated, or low-credibility content.
 
-            **ADDITIONAL INFORMATION**: {prompt if prompt else "None"}
-            **CURRENT DATE AND TIME**: {datetime.now().isoformat()}
+            - Must from reliable sources:
+            {reliable_sources}
+
+            **Note**: {tip}
 
             **Parameters**:
             - Topic Title: {topic_title}
             - Summary: {summary}
-            - Original Source: {source}
-            - Must from reliable sources:
-            {self.__reliable_sources()}
+            - Original Source:
+            {source}
 
-            **Note**: {self.__tip_section()}
+            **ADDITIONAL INFORMATION**: {prompt}
+            **CURRENT DATE AND TIME**: {now}
             """
             ),
+            [
+                Section("topic_title", topic_title),
+                Section("now", datetime.now().isoformat()),
+                Section("tip", self.__tip_section()),
+                Section(
+                    "reliable_sources",
+                    bullet_list(self.__reliable_sources()),
+                    priority=1,
+                    lines=True,
+                ),
+                Section("prompt", prompt, priority=2),
+                Section("summary", summary, priority=3),
+                Section("source", bullet_list(source), priority=4, lines=True),
+            ],
+        )
+        return Task(
+            name="research",
+            description=description,
             agent=agent,
             expected_output=dedent(
                 """
@@ -117,11 +141,13 @@ class ArticleWriterTasks:
     def write_news_article(
         self, agent, topic_title: str, summary: str, context, prompt
     ):
-        return Task(
-            description=dedent(
-                f"""
+        description = fit_prompt(
+            "write",
+            model_of(agent),
+            dedent(
+                """
             **Task**: Write a Newsworthy Article
-            **Description**: Create a highly engaging, informative, and factual news article for the topic "{topic_title}".
+            **Description**: Create a highly engaging, informative, and factual news article for the topic given in **Parameters** below.
             Use a neutral tone, avoid opinions or fluff. The article must contain:
             - A compelling title, 40 to 95 characters
             - A 2-3 sentence summary
@@ -129,18 +155,29 @@ class ArticleWriterTasks:
             - relevant tags, each seperated by commas in a list
             - A list of source URLs used in research
 
-            **ADDITIONAL INFORMATION**: {prompt if prompt else "None"}
-            **CURRENT DATE AND TIME**: {datetime.now().isoformat()}
+            **NOTE**: Do NOT write the names of sources in sources list, but ONLY the URLs of sources
+            **NOTE**: Do NOT write a blog or opinion piece. {tip}
+            **NOTE**: Make sure that both values and keys are in double quotes in the JSON output
 
             **Parameters**:
             - Topic Title: {topic_title}
             - Summary: {summary}
-            
-            **NOTE**: Do NOT write the names of sources in sources list, but ONLY the URLs of sources
-            **NOTE**: Do NOT write a blog or opinion piece. {self.__tip_section()}
-            **NOTE**: Make sure that both values and keys are in double quotes in the JSON output
+
+            **ADDITIONAL INFORMATION**: {prompt}
+            **CURRENT DATE AND TIME**: {now}
             """
             ),
+            [
+                Section("topic_title", topic_title),
+                Section("now", datetime.now().isoformat()),
+                Section("tip", self.__tip_section()),
+                Section("prompt", prompt, priority=1),
+                Section("summary", summary, priority=2),
+            ],
+        )
+        return Task(
+            name="write",
+            description=description,
             context=context,
             agent=agent,
             expected_output=dedent(
@@ -166,17 +203,16 @@ class ArticleWriterTasks:
         context,
         prompt,
     ):
-        return Task(
-            description=dedent(
-                f"""
+        description = fit_prompt(
+            "review",
+            model_of(agent),
+            dedent(
+                """
             **Task**: Final Editorial Review
-            **Description**: Evaluate the drafted article for "{topic_title}". 
+            **Description**: Evaluate the drafted article for the topic given in **Parameters** below. 
             Ensure it meets journalistic standards — objectivity, accuracy, relevance, clarity, on-brand tone, and newsworthiness.
             Give it an accuracy score from 0 to 100, where 100 is perfect accuracy.
             Provide detailed feedback on any issues, and if rejected, explain why it does not meet standards
-            
-            **ADDITIONAL INFORMATION**: {prompt if prompt else "None"}
-            **CURRENT DATE AND TIME**: {datetime.now().isoformat()}
 
             **You must output the FULL article JSON plus review details.**
             Return JSON like:
@@ -193,17 +229,33 @@ class ArticleWriterTasks:
                 "sources": ["https://www...", "..."]
               }}
             }}
-    
+
+            **NOTE**: Do NOT write the names of sources in sources list, but ONLY the URLs of sources
+            **NOTE**: Make sure that both values and keys are in double quotes in the JSON output
+            **NOTE**: {tip}
+
             **Parameters**:
             - Topic Title: {topic_title}
             - Summary: {summary}
-            - Original Source: {source}
+            - Original Source:
+            {source}
 
-            **NOTE**: Do NOT write the names of sources in sources list, but ONLY the URLs of sources
-            **NOTE**: Make sure that both values and keys are in double quotes in the JSON output
-            **NOTE**: {self.__tip_section()}
+            **ADDITIONAL INFORMATION**: {prompt}
+            **CURRENT DATE AND TIME**: {now}
             """
             ),
+            [
+                Section("topic_title", topic_title),
+                Section("now", datetime.now().isoformat()),
+                Section("tip", self.__tip_section()),
+                Section("prompt", prompt, priority=1),
+                Section("summary", summary, priority=2),
+                Section("source", bullet_list(source), priority=3, lines=True),
+            ],
+        )
+        task = Task(
+            name="review",
+            description=description,
             agent=agent,
             async_execution=True,
             context=context,
@@ -226,3 +278,7 @@ class ArticleWriterTasks:
             ),
             output_json=VerifiedArticle,
         )
+
+        # A retried review must not get the manager's cached answer of the
+        # review that failed
+        return skip_llm_cache(task)
@@ -1,4 +1,5 @@
-from crewai import Agent, LLM
+from lib.llm import CachedLLM
+from crewai import Agent
 from textwrap import dedent
 import os
 
@@ -10,10 +11,11 @@ if not GOOGLE_API_KEY:
 
 class ManagerAgents:
     def __init__(self):
-        self.llm = LLM(
+        self.llm = CachedLLM(
             api_key=GOOGLE_API_KEY,
             model="gemini/gemini-2.5-flash-lite",
             temperature=0.5,
+            cache=True,
         )
 
     def manager_agent(self):
@@ -1,17 +1,19 @@
-from crewai_tools import SerperDevTool
-from crewai import Agent, LLM
+from lib.tools.search import CachedSerperSearchTool
+from lib.llm import CachedLLM
+from crewai import Agent
 from textwrap import dedent
 import os
 
-search_tool = SerperDevTool()
+search_tool = CachedSerperSearchTool()
 
 
 class TopicReasearcherAgents:
-    def __init__(self):
-        self.llm = LLM(
-            api_key=os.getenv("GROQ_API_KEY"),
+    def __init__(self, api_key: str = ""):
+        self.llm = CachedLLM(
+            api_key=api_key or os.getenv("GROQ_API_KEY"),
             model="groq/meta-llama/llama-guard-4-12b",
             temperature=0.5,
+            cache=True,
         )
 
     def expert_researcher(self):
@@ -1,20 +1,58 @@
 from lib.clean_crewai_response import clean_crewai_topics, clean_usage_tokens
 from config.topic.agents import TopicReasearcherAgents
-from config.topic.tasks import TopicReasearcherTasks
+from config.topic.tasks import (
+    TopicReasearcherTasks,
+    TrendingTopic,
+    CategorizedTrendingTopic,
+)
+from lib.topic_classifier import classify_and_dedup
 from config.manager.agents import ManagerAgents
 from crewai.memory import EntityMemory, ShortTermMemory
 from crewai import Crew, Process
-from typing import List
+from typing import Dict, List
 from lib.revalidate import revalidate
+from config.article.create_article import run_article_writer_crew
+from lib.queues import get_queue
+from rq import Dependency, get_current_job
+from lib.redis_conn import get_redis
+from lib.key_pool import groq_key_pool
+from lib.topic_index import topic_index
 from prisma.enums import STATUS, TYPE
-from prisma import Prisma
-import asyncio
+from lib.db import get_db, run_job
+from lib.embeddings import embedder_config
+from lib import job_state
+from lib.job_events import bind_job, publish, register_task_events
+from lib import tracing
+from lib.metrics import timed_job
+from lib.llm import reset_llm_cache_stats, llm_cache_stats, llm_usage_by_model
+from lib.cassette import recording
+from lib.usage_rollup import split_usage
 import os
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY environment variable is not set.")
 
+# Task and tool events of the jobs run by this process, see lib.job_events
+register_task_events()
+
+# Auto-pipeline: at most this many article jobs per topic job, and at most
+# this many of them running at the same time for one category
+AUTO_PIPELINE_MAX_ARTICLES = int(os.getenv("AUTO_PIPELINE_MAX_ARTICLES", "5"))
+AUTO_PIPELINE_CATEGORY_CONCURRENCY = int(
+    os.getenv("AUTO_PIPELINE_CATEGORY_CONCURRENCY", "1")
+)
+
+# Tail job of every article chain ("slot") of a category, plus the slot the
+# next article goes to. Shared by all topic jobs of the category, so the
+# concurrency cap holds across jobs and cron runs.
+AUTO_PIPELINE_SLOTS_KEY = "auto-pipeline:slots:{categoryId}"
+AUTO_PIPELINE_SLOTS_TTL = 60 * 60 * 24
+
+# Duplicates are filtered by lib.topic_index, the prompt only gets the most
+# recent excluded titles as a hint
+PROMPT_EXCLUDED_TITLES = int(os.getenv("PROMPT_EXCLUDED_TITLES", "10"))
+
 
 class ResearcherCrew:
     def __init__(
@@ -25,6 +63,7 @@ class ResearcherCrew:
         max_topics: int = 2,
         time_duration: str = "24 hours",
         prompt: str = "",
+        api_key: str = "",
     ):
         self.category = category
         self.excluded_titles = excluded_titles
@@ -32,10 +71,11 @@ class ResearcherCrew:
         self.max_topics = max_topics
         self.time_duration = time_duration
         self.prompt = prompt
+        self.api_key = api_key
 
     def run(self):
         # Defining custom agents and tasks in agents.py and tasks.py
-        agents = TopicReasearcherAgents()
+        agents = TopicReasearcherAgents(self.api_key)
         tasks = TopicReasearcherTasks()
 
         # Custom Agents for trending topics
@@ -53,13 +93,7 @@ class ResearcherCrew:
             self.prompt,
         )
 
-        embedder_cfg = {
-            "provider": "google",
-            "config": {
-                "api_key": GOOGLE_API_KEY,
-                "model": "text-embedding-004",
-            },
-        }
+        embedder_cfg = embedder_config(GOOGLE_API_KEY)
 
         # Fetch Trending Topics
         CrewInstance = Crew(
@@ -79,6 +113,64 @@ class ResearcherCrew:
         return res
 
 
+class MultiCategoryResearcherCrew:
+    """
+    One researcher run for all categories of a cron run, instead of one
+    hierarchical crew (manager, memory and search loop) per category.
+    """
+
+    def __init__(
+        self,
+        categories: List[str],
+        excluded_titles: List[str] = [],
+        min_topics: int = 1,
+        max_topics: int = 2,
+        time_duration: str = "24 hours",
+        api_key: str = "",
+    ):
+        self.categories = categories
+        self.excluded_titles = excluded_titles
+        self.min_topics = min_topics
+        self.max_topics = max_topics
+        self.time_duration = time_duration
+        self.api_key = api_key
+
+    def run(self):
+        agents = TopicReasearcherAgents(self.api_key)
+        tasks = TopicReasearcherTasks()
+
+        expert_researcher = agents.expert_researcher()
+        manager_agent = ManagerAgents().manager_agent()
+
+        fetch_trending = tasks.fetch_trending_topics_multi(
+            expert_researcher,
+            self.categories,
+            self.excluded_titles,
+            self.min_topics,
+            self.max_topics,
+            self.time_duration,
+        )
+
+        embedder_cfg = embedder_config(GOOGLE_API_KEY)
+
+        CrewInstance = Crew(
+            agents=[expert_researcher],
+            tasks=[fetch_trending],
+            cache=True,
+            process=Process.hierarchical,
+            verbose=True,
+            manager_agent=manager_agent,
+            max_rpm=15,
+            short_term_memory=ShortTermMemory(embedder_config=embedder_cfg),
+            entity_memory=EntityMemory(embedder_config=embedder_cfg),
+        )
+
+        res = CrewInstance.kickoff()
+
+        return res
+
+
+@timed_job(TYPE.TOPIC_GENERATION)
 async def run_researcher_crew_async(
     min_topics: int,
     max_topics: int,
@@ -90,11 +182,8 @@ async def run_researcher_crew_async(
     jobId: int,
     prompt: str = "",
     api_key: str = "",
+    auto_pipeline: bool = False,
 ):
-    # Set or overwrite an environment variable
-    if api_key:
-        os.environ["GROQ_API_KEY"] = api_key
-
     SECRET_KEY = os.getenv("SECRET_KEY")
     FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL")
 
@@ -109,39 +198,64 @@ async def run_researcher_crew_async(
         "successful_requests": 0,
     }
 
-    db = Prisma()
-    await db.connect()
+    db = await get_db()
+    reset_llm_cache_stats()
+    bind_job(jobId)
+    tracing.start_job("topic_job", jobId, category=category, trigger=trigger)
 
-    await db.job.update(
-        where={
-            "id": jobId,
-        },
-        data={
-            "status": STATUS.PROCESSING,
-        },
-    )
+    await job_state.topics_processing(db, jobId)
 
     revalidate(trigger, STATUS.PROCESSING, TYPE.TOPIC_GENERATION)
 
+    # Key pinned by the caller, or the least loaded key of the pool for this job
+    groq_api_key = api_key or groq_key_pool.acquire(f"topic:{jobId}", trigger)
+
+    # Marks the job's root span as failed
+    error = None
+
     try:
         # Initialize the Crew with provided parameters
         crew = ResearcherCrew(
             category=category,
-            excluded_titles=excluded_titles,
+            excluded_titles=(excluded_titles or [])[-PROMPT_EXCLUDED_TITLES:]
+            if PROMPT_EXCLUDED_TITLES
+            else [],
             min_topics=min_topics,
             max_topics=max_topics,
             time_duration=time_duration,
             prompt=prompt,
+            api_key=groq_api_key,
         )
 
         # Run the Crew to get topics
-        res = crew.run()
+        with recording(
+            f"topic-{jobId}",
+            crew="topic",
+            args={
+                "category": crew.category,
+                "excluded_titles": crew.excluded_titles,
+                "min_topics": min_topics,
+                "max_topics": max_topics,
+                "time_duration": time_duration,
+                "prompt": prompt,
+            },
+        ):
+            with tracing.span("crew.kickoff", crew="topic"):
+                res = crew.run()
 
         data = getattr(res, "json_dict", None) or str(res)
-        topics = clean_crewai_topics(data)
+        topics = clean_crewai_topics(data, TrendingTopic)
 
         metrics = getattr(res, "token_usage", None)
         usage_json = clean_usage_tokens(metrics) if metrics else DEFAULT_USAGE
+        usage_json = {**usage_json, **llm_cache_stats(), "models": llm_usage_by_model()}
+        publish("tokens", **usage_json)
+        tracing.annotate_job(**usage_json)
+
+        if topics and "root" in topics and topics["root"]:
+            topics["root"] = await topic_index.filter_new(
+                db, categoryId, topics["root"]
+            )
 
         if topics and "root" in topics and topics["root"]:
             topic_records = [
@@ -156,17 +270,10 @@ async def run_researcher_crew_async(
                 }
                 for t in topics["root"]
             ]
-            await db.topic.create_many(data=topic_records)
-
-            await db.job.update(
-                where={
-                    "id": jobId,
-                },
-                data={
-                    "status": STATUS.PENDING,
-                    "totalItems": len(topics["root"]),
-                },
+            stored = await job_state.topics_completed(
+                db, jobId, topic_records, usage_json, trigger
             )
+            topic_index.add(categoryId, stored)
 
             revalidate(trigger, STATUS.PENDING, TYPE.TOPIC_GENERATION)
 
@@ -174,55 +281,290 @@ async def run_researcher_crew_async(
                 f"Successfully created {len(topics['root'])} topics for category {category}"
             )
 
+            if auto_pipeline:
+                await enqueue_article_pipeline(db, jobId, trigger)
+
         else:
-            await db.job.update(
-                where={
-                    "id": jobId,
-                },
-                data={
-                    "status": STATUS.FAILED,
-                    "error": f"Missing topics in response from AI Agents\n**ERROR:**\t\t{res.json_dict}",
-                },
+            error = "Missing topics in response from AI Agents"
+            await job_state.topics_failed(
+                db,
+                jobId,
+                f"{error}\n**ERROR:**\t\t{res.json_dict}",
+                usage_json,
+                trigger,
             )
 
             revalidate(trigger, STATUS.FAILED, TYPE.TOPIC_GENERATION)
 
-        if usage_json and usage_json.get("total_tokens"):
-            await db.usagemetric.create(
-                data={
-                    "trigger": trigger,
-                    "date": usage_json.get("date"),
-                    "promptTokens": usage_json.get("prompt_tokens"),
-                    "completionTokens": usage_json.get("completion_tokens"),
-                    "totalTokens": usage_json.get("total_tokens"),
-                    "successfulRequests": usage_json.get("successful_requests"),
-                    "jobId": jobId,
-                }
-            )
-
+        if job_state.usage_metric_data(usage_json, trigger, jobId):
             revalidate(trigger, STATUS.COMPLETED, TYPE.TOPIC_GENERATION)
 
+        if error:
+            return {"ok": False, "message": error}
         return {"ok": True, "message": f"{len(topics['root'])} topics saved"}
 
     except Exception as e:
         print(f"run_researcher_crew failed for category {category}: {e}")
-        await db.job.update(
-            where={
-                "id": jobId,
-            },
-            data={
-                "status": STATUS.FAILED,
-                "error": str(e),
+        error = f"{type(e).__name__}: {e}"
+        await job_state.topics_failed(db, jobId, str(e))
+
+        revalidate(trigger, STATUS.FAILED, TYPE.TOPIC_GENERATION)
+
+        return {"ok": False, "message": f"No topics generated!"}
+
+    finally:
+        groq_key_pool.release(f"topic:{jobId}")
+        bind_job(None)
+        tracing.end_job(error)
+
+
+async def enqueue_article_pipeline(db, jobId: int, trigger: str):
+    """
+    Enqueues article jobs for the topics just stored by this job, as RQ
+    dependents of the running topic job. Each category has
+    AUTO_PIPELINE_CATEGORY_CONCURRENCY chains, each article waiting for the
+    previous one of its chain, whichever topic job enqueued it. A failed
+    article only frees its slot, the rest of the chain still runs.
+    """
+    topics = await db.topic.find_many(
+        where={"jobId": jobId},
+        order={"id": "asc"},
+        take=AUTO_PIPELINE_MAX_ARTICLES,
+    )
+    if not topics:
+        return []
+
+    await job_state.articles_queued(
+        db, [jobId] * len(topics), [topic.id for topic in topics]
+    )
+
+    current_job = get_current_job()
+    queue = get_queue(trigger, TYPE.ARTICLE_GENERATION)
+    concurrency = max(1, AUTO_PIPELINE_CATEGORY_CONCURRENCY)
+
+    redis_conn = get_redis()
+    slots_key = AUTO_PIPELINE_SLOTS_KEY.format(categoryId=topics[0].categoryId)
+
+    article_jobs = []
+    # Two topic jobs of one category must not pick the same chain tails
+    with redis_conn.lock(f"{slots_key}:lock", timeout=60, blocking_timeout=60):
+        slots = {k.decode(): v.decode() for k, v in redis_conn.hgetall(slots_key).items()}
+        cursor = int(slots.pop("next", 0))
+
+        for i, topic in enumerate(topics):
+            slot = str((cursor + i) % concurrency)
+            dependencies = [current_job] if current_job else []
+            if slots.get(slot):
+                # A tail that already finished or expired doesn't hold the article
+                dependencies.append(slots[slot])
+
+            article_job = queue.enqueue(
+                run_article_writer_crew,
+                args=(
+                    topic.title,
+                    topic.summary,
+                    topic.source,
+                    jobId,
+                    topic.categoryId,
+                    trigger,
+                    topic.id,
+                ),
+                depends_on=Dependency(jobs=dependencies, allow_failure=True)
+                if dependencies
+                else None,
+                job_timeout=60 * 10,
+            )
+            slots[slot] = article_job.id
+            article_jobs.append(article_job)
+
+        pipe = redis_conn.pipeline(transaction=True)
+        pipe.hset(slots_key, mapping={**slots, "next": (cursor + len(topics)) % concurrency})
+        pipe.expire(slots_key, AUTO_PIPELINE_SLOTS_TTL)
+        pipe.execute()
+
+    revalidate(trigger, STATUS.QUEUED, TYPE.ARTICLE_GENERATION)
+    print(f"Auto-pipeline enqueued {len(article_jobs)} article jobs for job {jobId}")
+
+    return article_jobs
+
+
+def run_researcher_crew(*args, **kwargs):
+    return run_job(run_researcher_crew_async(*args, **kwargs))
+
+
+@timed_job(TYPE.TOPIC_GENERATION)
+async def run_multi_category_crew_async(
+    min_topics: int,
+    max_topics: int,
+    time_duration: str,
+    excluded_titles: Dict[str, List[str]],
+    categories: List[dict],
+    trigger: str,
+    jobIds: Dict[int, int],
+    api_key: str = "",
+    auto_pipeline: bool = False,
+):
+    """
+    Researches all categories in one pass, classifies every story into a
+    category locally and fans the results out to the per-category jobs.
+    The token usage of the single run is split across the category jobs by
+    the number of stories classified into each category.
+    """
+    SECRET_KEY = os.getenv("SECRET_KEY")
+    FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL")
+
+    if not SECRET_KEY or not FRONTEND_BASE_URL:
+        return "Environment varaibles not found for SECRET_KEY and FRONTEND_BASE_URL"
+
+    DEFAULT_USAGE = {
+        "date": "0000-00-00T00:00:00Z",
+        "total_tokens": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "successful_requests": 0,
+    }
+
+    leadJobId = jobIds[categories[0]["id"]]
+
+    db = await get_db()
+    reset_llm_cache_stats()
+    bind_job(leadJobId)
+    tracing.start_job(
+        "multi_category_job", leadJobId, categories=len(categories), trigger=trigger
+    )
+
+    for category in categories:
+        await job_state.topics_processing(db, jobIds[category["id"]])
+
+    revalidate(trigger, STATUS.PROCESSING, TYPE.TOPIC_GENERATION)
+
+    groq_api_key = api_key or groq_key_pool.acquire(f"topic:{leadJobId}", trigger)
+
+    # Marks the job's root span as failed
+    error = None
+
+    if not isinstance(excluded_titles, dict):
+        excluded_titles = {}
+
+    # Spread the prompt's exclusion hint over all categories
+    per_category = PROMPT_EXCLUDED_TITLES // len(categories) if PROMPT_EXCLUDED_TITLES else 0
+    prompt_excluded_titles = [
+        title
+        for category in categories
+        for title in (excluded_titles.get(category["slug"]) or [])[-max(per_category, 1):]
+    ] if PROMPT_EXCLUDED_TITLES else []
+
+    try:
+        crew = MultiCategoryResearcherCrew(
+            categories=[category["name"] for category in categories],
+            excluded_titles=prompt_excluded_titles,
+            min_topics=min_topics,
+            max_topics=max_topics,
+            time_duration=time_duration,
+            api_key=groq_api_key,
+        )
+
+        with recording(
+            f"multi-category-{leadJobId}",
+            crew="multi_category",
+            args={
+                "categories": crew.categories,
+                "excluded_titles": crew.excluded_titles,
+                "min_topics": min_topics,
+                "max_topics": max_topics,
+                "time_duration": time_duration,
             },
+        ):
+            with tracing.span("crew.kickoff", crew="multi_category"):
+                res = crew.run()
+
+        data = getattr(res, "json_dict", None) or str(res)
+        topics = clean_crewai_topics(data, CategorizedTrendingTopic)
+
+        metrics = getattr(res, "token_usage", None)
+        usage_json = clean_usage_tokens(metrics) if metrics else DEFAULT_USAGE
+        usage_json = {**usage_json, **llm_cache_stats(), "models": llm_usage_by_model()}
+        publish("tokens", **usage_json)
+        tracing.annotate_job(**usage_json)
+
+        grouped = classify_and_dedup(topics.get("root") or [], categories)
+
+        usage_by_category = split_usage(
+            usage_json, {category["id"]: len(grouped[category["id"]]) for category in categories}
         )
 
+        saved, failed = 0, 0
+        for category in categories:
+            jobId = jobIds[category["id"]]
+            usage = usage_by_category[category["id"]]
+            new_topics = await topic_index.filter_new(
+                db, category["id"], grouped[category["id"]]
+            )
+            new_topics = new_topics[:max_topics]
+
+            if not new_topics:
+                await job_state.topics_failed(
+                    db,
+                    jobId,
+                    f"No new trending topics classified into category {category['name']}",
+                    usage,
+                    trigger,
+                )
+                failed += 1
+                continue
+
+            topic_records = [
+                {
+                    "jobId": jobId,
+                    "categoryId": category["id"],
+                    "title": t.get("title"),
+                    "summary": t.get("summary"),
+                    "source": t.get("source"),
+                    "published": t.get("published"),
+                    "status": STATUS.COMPLETED,
+                }
+                for t in new_topics
+            ]
+            stored = await job_state.topics_completed(db, jobId, topic_records, usage, trigger)
+            topic_index.add(category["id"], stored)
+            saved += len(topic_records)
+
+            print(
+                f"Successfully created {len(topic_records)} topics for category {category['name']}"
+            )
+
+            if auto_pipeline:
+                await enqueue_article_pipeline(db, jobId, trigger)
+
+        if saved:
+            revalidate(trigger, STATUS.PENDING, TYPE.TOPIC_GENERATION)
+        else:
+            error = "No new topics classified into any category"
+        if failed:
+            revalidate(trigger, STATUS.FAILED, TYPE.TOPIC_GENERATION)
+        if job_state.usage_metric_data(usage_json, trigger, leadJobId):
+            revalidate(trigger, STATUS.COMPLETED, TYPE.TOPIC_GENERATION)
+
+        return {
+            "ok": not error,
+            "message": f"{saved} topics saved across {len(categories)} categories",
+        }
+
+    except Exception as e:
+        print(f"run_multi_category_crew failed: {e}")
+        error = f"{type(e).__name__}: {e}"
+        for category in categories:
+            await job_state.topics_failed(db, jobIds[category["id"]], str(e))
+
         revalidate(trigger, STATUS.FAILED, TYPE.TOPIC_GENERATION)
 
         return {"ok": False, "message": f"No topics generated!"}
 
     finally:
-        print("Closing Database Connection")
+        groq_key_pool.release(f"topic:{leadJobId}")
+        bind_job(None)
+        tracing.end_job(error)
 
 
-def run_researcher_crew(*args, **kwargs):
-    return asyncio.run(run_researcher_crew_async(*args, **kwargs))
+def run_multi_category_crew(*args, **kwargs):
+    return run_job(run_multi_category_crew_async(*args, **kwargs))
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from datetime import datetime
 from textwrap import dedent
 from crewai import Task
+from lib.prompt_budget import Section, bullet_list, fit_prompt, model_of
 from typing import List
 
 
@@ -16,6 +17,14 @@ class TrendingTopicList(BaseModel):
     root: List[TrendingTopic]
 
 
+class CategorizedTrendingTopic(TrendingTopic):
+    category: str
+
+
+class CategorizedTrendingTopicList(BaseModel):
+    root: List[CategorizedTrendingTopic]
+
+
 class TopicReasearcherTasks:
     def __tip_section(self):
         return (
@@ -82,20 +91,14 @@ class TopicReasearcherTasks:
         time_duration: str,
         prompt: str = "",
     ):
-        exclusion = (
-            "\n".join(f"- {title}" for title in exclude_titles)
-            if exclude_titles
-            else "None"
-        )
-        return Task(
-            description=dedent(
-                f"""
+        description = fit_prompt(
+            "fetch_trending_topics",
+            model_of(agent),
+            dedent(
+                """
             **Task**: Identify Trending News Topics
-            **Description**: Discover {min_topics} to {max_topics} highly relevant and trending news topics in the category **{category}**. 
-            Only select topics that are less than {time_duration} old, Today is {datetime.now()}, have strong online engagement, and are not already covered by our platform. Use online sources like Google News, Twitter/X, Reddit, and top global news platforms.
-
-            **ADDITIONAL INFORMATION**: {prompt if prompt else "None"}
-            **CURRENT DATE AND TIME**: {datetime.now()}
+            **Description**: Discover highly relevant and trending news topics in the category given in **Parameters** below. 
+            Only select topics that are recent enough, have strong online engagement, and are not already covered by our platform. Use online sources like Google News, Twitter/X, Reddit, and top global news platforms.
 
             Return a JSON array like:
             {{
@@ -111,18 +114,44 @@ class TopicReasearcherTasks:
             }}
 
             **Constraints**:
+            - Recommended if from reliable sources:
+            {reliable_sources}
+            - Can also be from Official Pakistan Government sources, if relevant.
+
+            **Note**: {tip}
+
+            **Parameters**:
+            - Category: {category}
             - Minimum: {min_topics} Topics
             - Maximum: {max_topics} Topics
             - Published within last {time_duration}
             - Not in excluded titles:
             {exclusion}
-            - Recommended if from reliable sources:
-            {self.__reliable_sources()}
-            - Can also be from Official Pakistan Government sources, if relevant.
 
-            **Note**: {self.__tip_section()}
+            **ADDITIONAL INFORMATION**: {prompt}
+            **CURRENT DATE AND TIME**: {now}
             """
             ),
+            [
+                Section("category", category),
+                Section("min_topics", str(min_topics)),
+                Section("max_topics", str(max_topics)),
+                Section("time_duration", time_duration),
+                Section("now", str(datetime.now())),
+                Section("tip", self.__tip_section()),
+                Section(
+                    "reliable_sources",
+                    bullet_list(self.__reliable_sources()),
+                    priority=1,
+                    lines=True,
+                ),
+                Section("prompt", prompt, priority=2),
+                Section("exclusion", bullet_list(exclude_titles), priority=3, lines=True),
+            ],
+        )
+        return Task(
+            name="fetch_trending_topics",
+            description=description,
             agent=agent,
             expected_output=dedent(
                 """
@@ -140,3 +169,93 @@ class TopicReasearcherTasks:
             ),
             output_json=TrendingTopicList,
         )
+
+    def fetch_trending_topics_multi(
+        self,
+        agent,
+        categories: List[str],
+        exclude_titles: List[str],
+        min_topics: int,
+        max_topics: int,
+        time_duration: str,
+    ):
+        description = fit_prompt(
+            "fetch_trending_topics_multi",
+            model_of(agent),
+            dedent(
+                """
+            **Task**: Identify Trending News Topics Across Categories
+            **Description**: Discover highly relevant and trending news topics for EACH of the categories given in **Parameters** below.
+            Only select topics that are recent enough, have strong online engagement, and are not already covered by our platform. Use online sources like Google News, Twitter/X, Reddit, and top global news platforms.
+            Research every story only once, even if it fits several categories, and set "category" to the single best fitting category.
+
+            Return a JSON array like:
+            {{
+                "root" : [
+                  {{
+                    "title": "...",
+                    "summary": "...",
+                    "source": ["https://..."],
+                    "published": "YYYY-MM-DD",
+                    "category": "..."
+                  }},
+                  ...
+                ]
+            }}
+
+            **Constraints**:
+            - Recommended if from reliable sources:
+            {reliable_sources}
+            - Can also be from Official Pakistan Government sources, if relevant.
+
+            **Note**: {tip}
+
+            **Parameters**:
+            - Categories:
+            {category_list}
+            - Minimum: {min_topics} Topics per category
+            - Maximum: {max_topics} Topics per category
+            - Published within last {time_duration}
+            - Not in excluded titles:
+            {exclusion}
+
+            **CURRENT DATE AND TIME**: {now}
+            """
+            ),
+            [
+                Section("category_list", bullet_list(categories)),
+                Section("min_topics", str(min_topics)),
+                Section("max_topics", str(max_topics)),
+                Section("time_duration", time_duration),
+                Section("now", str(datetime.now())),
+                Section("tip", self.__tip_section()),
+                Section(
+                    "reliable_sources",
+                    bullet_list(self.__reliable_sources()),
+                    priority=1,
+                    lines=True,
+                ),
+                Section("exclusion", bullet_list(exclude_titles), priority=3, lines=True),
+            ],
+        )
+        return Task(
+            name="fetch_trending_topics_multi",
+            description=description,
+            agent=agent,
+            expected_output=dedent(
+                """
+                {"root": [
+                    {
+                        "title": "...",
+                        "summary": "...",
+                        "source": ["..."],
+                        "published": "YYYY-MM-DD",
+                        "category": "..."
+                      },
+                      ...
+                    ]
+                }
+                """
+            ),
+            output_json=CategorizedTrendingTopicList,
+        )
@@ -1,6 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 from routes.apiRoute import apiRoute
+from lib.metrics import WorkerMetricsCollector, http_request_duration
 from dotenv import load_dotenv
+import time
 
 
 load_dotenv()
@@ -11,3 +14,28 @@ app = FastAPI()
 app.include_router(
     apiRoute, prefix="/api/posts", tags=["create-articles-with-ai-agents"]
 )
+
+REGISTRY.register(WorkerMetricsCollector())
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template, not the raw path, keeps /jobs/{jobId}/events one series
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_request_duration.labels(request.method, route, str(status)).observe(
+            time.perf_counter() - started
+        )
+
+
+# Sync on purpose: the collector reads Redis with the blocking client,
+# FastAPI runs it in its threadpool
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
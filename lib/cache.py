@@ -0,0 +1,134 @@
+from lib.redis_conn import get_redis
+from typing import List, Optional
+import hashlib
+import json
+import time
+
+
+def cache_key(*parts) -> str:
+    """
+    Builds a stable hash key from any JSON serializable parts.
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RedisCache:
+    """
+    TTL'd, size-bounded cache shared by all worker processes through Redis.
+
+    Values live under "<namespace>:<key>" with a TTL, a sorted set
+    "<namespace>:lru" tracks last access for LRU eviction once the cache
+    grows over max_entries, "<namespace>:expires" the expiry of every entry
+    so expired ones are dropped before counting, and "<namespace>:stats"
+    counts hits and misses.
+    """
+
+    def __init__(self, namespace: str, ttl: int, max_entries: int):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _name(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            redis_conn = get_redis()
+            value = redis_conn.get(self._name(key))
+
+            pipe = redis_conn.pipeline(transaction=False)
+            if value is not None:
+                pipe.zadd(f"{self.namespace}:lru", {key: time.time()})
+                pipe.hincrby(f"{self.namespace}:stats", "hits", 1)
+            else:
+                pipe.hincrby(f"{self.namespace}:stats", "misses", 1)
+            pipe.execute()
+
+            return value
+
+        except Exception as e:
+            print(f"@@ERROR (cache get {self.namespace}): {e}")
+            return None
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Batched get, one round trip for all keys.
+        """
+        if not keys:
+            return []
+
+        try:
+            redis_conn = get_redis()
+            values = redis_conn.mget([self._name(k) for k in keys])
+
+            hits = {k: time.time() for k, v in zip(keys, values) if v is not None}
+            pipe = redis_conn.pipeline(transaction=False)
+            if hits:
+                pipe.zadd(f"{self.namespace}:lru", hits)
+                pipe.hincrby(f"{self.namespace}:stats", "hits", len(hits))
+            if len(hits) < len(keys):
+                pipe.hincrby(f"{self.namespace}:stats", "misses", len(keys) - len(hits))
+            pipe.execute()
+
+            return values
+
+        except Exception as e:
+            print(f"@@ERROR (cache get {self.namespace}): {e}")
+            return [None] * len(keys)
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        try:
+            now = time.time()
+            redis_conn = get_redis()
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.set(self._name(key), value, ex=ttl or self.ttl)
+            pipe.zadd(f"{self.namespace}:lru", {key: now})
+            pipe.zadd(f"{self.namespace}:expires", {key: now + (ttl or self.ttl)})
+            pipe.zrangebyscore(f"{self.namespace}:expires", "-inf", now)
+            pipe.zcard(f"{self.namespace}:lru")
+            *_, expired, size = pipe.execute()
+
+            # Expired values are gone already, they must not count toward the cap
+            if expired:
+                pipe = redis_conn.pipeline(transaction=False)
+                pipe.zrem(f"{self.namespace}:lru", *expired)
+                pipe.zrem(f"{self.namespace}:expires", *expired)
+                removed = pipe.execute()[0]
+                size -= removed
+
+            if size > self.max_entries:
+                self._evict(size - self.max_entries)
+
+        except Exception as e:
+            print(f"@@ERROR (cache set {self.namespace}): {e}")
+
+    def _evict(self, count: int):
+        redis_conn = get_redis()
+        evicted = redis_conn.zpopmin(f"{self.namespace}:lru", count)
+        if evicted:
+            keys = [k.decode() for k, _ in evicted]
+            pipe = redis_conn.pipeline(transaction=False)
+            pipe.delete(*[self._name(k) for k in keys])
+            pipe.zrem(f"{self.namespace}:expires", *keys)
+            pipe.execute()
+
+    def incr(self, field: str, amount: int = 1):
+        """
+        Adds to a custom counter next to hits/misses, e.g. saved tokens.
+        """
+        try:
+            get_redis().hincrby(f"{self.namespace}:stats", field, amount)
+        except Exception as e:
+            print(f"@@ERROR (cache stats {self.namespace}): {e}")
+
+    def stats(self) -> dict:
+        redis_conn = get_redis()
+        raw = redis_conn.hgetall(f"{self.namespace}:stats")
+        stats = {k.decode(): int(v) for k, v in raw.items()}
+
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        stats["hits"], stats["misses"] = hits, misses
+        stats["hit_rate"] = round(hits / (hits + misses), 4) if hits + misses else 0.0
+        stats["size"] = redis_conn.zcard(f"{self.namespace}:lru")
+        return stats
@@ -0,0 +1,164 @@
+from contextlib import contextmanager
+from lib.cache import cache_key
+from typing import Callable, Dict, List, Optional
+import threading
+import gzip
+import json
+import time
+import os
+
+
+# Record/replay of a job's external calls (LLM, search, embeddings).
+# With CASSETTE_MODE=record on a worker, every crew run writes its exchanges
+# to CASSETTE_DIR/<name>-<timestamp>.jsonl.gz: a meta line (crew and its
+# arguments) followed by one line per call. bench/replay.py re-runs the crew
+# from such a file without network access.
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "").lower()
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "cassettes")
+
+
+def _jsonable(value):
+    # numpy vectors from the embedder, enums, pydantic objects
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return getattr(value, "value", None) or str(value)
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+class Cassette:
+    """
+    Exchanges of one crew run. In replay, a call gets the recorded response
+    of the same request, or else the next unused one of the same kind (the
+    prompts carry the current date and time, so they rarely match exactly).
+    """
+
+    def __init__(self, path: str, mode: str, meta: Optional[dict] = None):
+        self.path = path
+        self.mode = mode
+        self.meta = meta or {}
+        self.exchanges: List[dict] = []
+        self.realtime = False
+        self.stats = {"exact": 0, "in_order": 0, "missed": 0}
+        self._lock = threading.Lock()
+        self._used = set()
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls(path, "replay")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                entry = json.loads(line)
+                if i == 0 and "meta" in entry:
+                    cassette.meta = entry["meta"]
+                else:
+                    cassette.exchanges.append(entry)
+        return cassette
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"meta": self.meta}, default=_jsonable) + "\n")
+            for entry in self.exchanges:
+                f.write(json.dumps(entry, default=_jsonable) + "\n")
+
+    def unused(self) -> int:
+        return len(self.exchanges) - len(self._used)
+
+    def _find(self, kind: str, key: str) -> dict:
+        with self._lock:
+            fallback = None
+            for i, entry in enumerate(self.exchanges):
+                if i in self._used or entry["kind"] != kind:
+                    continue
+                if entry["key"] == key:
+                    self._used.add(i)
+                    self.stats["exact"] += 1
+                    return entry
+                if fallback is None:
+                    fallback = i
+
+            if fallback is None:
+                self.stats["missed"] += 1
+                raise CassetteMiss(f"No recorded {kind} call left in {self.path}")
+
+            self._used.add(fallback)
+            self.stats["in_order"] += 1
+            return self.exchanges[fallback]
+
+    def exchange(self, kind: str, request, call: Callable):
+        key = cache_key(kind, request)
+
+        if self.mode == "replay":
+            entry = self._find(kind, key)
+            if self.realtime:
+                time.sleep(entry["ms"] / 1000)
+            if "error" in entry:
+                raise RuntimeError(f"{entry['error_type']} (recorded): {entry['error']}")
+            return entry["response"]
+
+        entry = {"kind": kind, "key": key, "request": request}
+        started = time.perf_counter()
+        try:
+            response = call()
+            entry["response"] = response
+            return response
+        except Exception as e:
+            entry["error"] = str(e)
+            entry["error_type"] = type(e).__name__
+            raise
+        finally:
+            entry["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            with self._lock:
+                self.exchanges.append(entry)
+
+
+# One job at a time per worker process. A module global and not a
+# contextvar: crewai runs async_execution tasks in threads.
+_active: Dict[str, Optional[Cassette]] = {"cassette": None}
+
+
+def exchange(kind: str, request, call: Callable):
+    """
+    Runs call() through the active cassette, or directly when there is none.
+    """
+    cassette = _active["cassette"]
+    if cassette is None:
+        return call()
+    return cassette.exchange(kind, request, call)
+
+
+@contextmanager
+def recording(name: str, **meta):
+    """
+    Records the external calls made inside this block when CASSETTE_MODE=record.
+    The cassette is written even when the block fails, failed jobs are the
+    ones worth replaying.
+    """
+    if CASSETTE_MODE != "record":
+        yield None
+        return
+
+    path = os.path.join(CASSETTE_DIR, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}.jsonl.gz")
+    cassette = Cassette(path, "record", {"name": name, "recorded_at": time.time(), **meta})
+    _active["cassette"] = cassette
+    try:
+        yield cassette
+    finally:
+        _active["cassette"] = None
+        try:
+            cassette.save()
+            print(f"📼 Recorded {len(cassette.exchanges)} calls to {path}")
+        except Exception as e:
+            print(f"@@ERROR (cassette save): {e}")
+
+
+@contextmanager
+def replaying(cassette: Cassette):
+    _active["cassette"] = cassette
+    try:
+        yield cassette
+    finally:
+        _active["cassette"] = None
@@ -0,0 +1,93 @@
+from lib.redis_conn import get_redis
+from lib.cache import cache_key
+from typing import Callable, Dict
+import os
+
+
+# Outputs of completed article stages (research, write), so a retried job
+# resumes at the stage that failed instead of starting over. One Redis hash
+# per topic, cleared once the article is saved, expired otherwise.
+CHECKPOINT_KEY = "checkpoint:article:{topicId}"
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", str(60 * 60 * 24)))
+
+# Stages in pipeline order. The review is never checkpointed, its output is
+# the job's result: a review that fails to parse must run again.
+ARTICLE_STAGES = ["research", "write"]
+
+_FINGERPRINT = "fingerprint"
+
+
+def fingerprint(*inputs) -> str:
+    # A regenerate with another prompt must not reuse the old research
+    return cache_key(*inputs)
+
+
+def load_checkpoints(topicId: int, inputs_fingerprint: str) -> Dict[str, str]:
+    """
+    Returns {stage: output} for the leading completed stages of this topic,
+    e.g. {"research": ...} or {"research": ..., "write": ...}.
+    """
+    name = CHECKPOINT_KEY.format(topicId=topicId)
+    try:
+        saved = {k.decode(): v.decode("utf-8") for k, v in get_redis().hgetall(name).items()}
+    except Exception as e:
+        print(f"@@ERROR (checkpoint load): {e}")
+        return {}
+
+    if saved.get(_FINGERPRINT) != inputs_fingerprint:
+        if saved:
+            clear_checkpoints(topicId)
+        return {}
+
+    done = {}
+    for stage in ARTICLE_STAGES:
+        if stage not in saved:
+            break
+        done[stage] = saved[stage]
+    return done
+
+
+def save_checkpoint(topicId: int, inputs_fingerprint: str, stage: str, output: str):
+    name = CHECKPOINT_KEY.format(topicId=topicId)
+    try:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hset(name, mapping={_FINGERPRINT: inputs_fingerprint, stage: output})
+        pipe.expire(name, CHECKPOINT_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"@@ERROR (checkpoint save {stage}): {e}")
+
+
+def checkpoint_callback(topicId: int, inputs_fingerprint: str, stage: str) -> Callable:
+    """
+    crewai Task callback, saves the task's raw output once it completes.
+    """
+
+    def callback(output):
+        raw = getattr(output, "raw", None) or str(output)
+        if raw.strip():
+            save_checkpoint(topicId, inputs_fingerprint, stage, raw)
+
+    return callback
+
+
+def clear_checkpoints(topicId: int):
+    try:
+        get_redis().delete(CHECKPOINT_KEY.format(topicId=topicId))
+    except Exception as e:
+        print(f"@@ERROR (checkpoint clear): {e}")
+
+
+def restore_output(task, stage: str, raw: str):
+    """
+    Marks a task as done with its checkpointed output, so tasks that list it
+    in their context get the output without running it again.
+    """
+    from crewai.tasks.task_output import TaskOutput
+
+    task.output = TaskOutput(
+        name=stage,
+        description=task.description,
+        raw=raw,
+        agent=getattr(task.agent, "role", ""),
+    )
@@ -1,82 +1,97 @@
 from datetime import datetime, timezone
-from typing import Union, Dict, Any
-import json
-import re
-
-
-def clean_crewai_topics(raw):
-    # Cleans and parses any CrewAI response into a consistent dict with a 'root' key.
-    # Ensures `cleaned["root"]` is always safe to access.
-
-    cleaned = {"root": []}
-
-    try:
-        # If already a dict with 'root'
-        if isinstance(raw, dict):
-            if "root" in raw and isinstance(raw["root"], list):
-                return raw
-            else:
-                return cleaned
-
-        # Ensure it's a string
-        if not isinstance(raw, str):
-            raw = str(raw)
-
-        # Remove code block formatting like ```json or triple quotes
-        raw = raw.strip()
-        raw = re.sub(r"^(```(json)?|'''|\"\"\")", "", raw, flags=re.IGNORECASE).strip()
-        raw = re.sub(r"(```|'''|\"\"\")$", "", raw, flags=re.IGNORECASE).strip()
-
-        # Try parsing it as JSON
-        parsed = json.loads(raw)
-
-        # Ensure it has a 'root' key that is a list
-        if isinstance(parsed, dict) and isinstance(parsed.get("root"), list):
-            return parsed
+from lib.json_extract import extract_json, validate
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+def _normalize_sources(item: dict) -> dict:
+    # The prompts ask for "sources", the models and the database use "source"
+    if "sources" in item and not item.get("source"):
+        item["source"] = item.pop("sources")
+    if "source" in item:
+        item["source"] = (
+            [item["source"]] if isinstance(item["source"], str) else _as_list(item["source"])
+        )
+    return item
+
+
+def _report(kind: str, how: Optional[str]):
+    if how in ("repaired", "salvaged"):
+        print(f"🩹 {kind} JSON {how} from crew output")
+
+
+def clean_crewai_topics(raw, item_model=None) -> Dict[str, Any]:
+    # Extracts the topics of any CrewAI response into a dict with a 'root' key.
+    # Ensures `cleaned["root"]` is always safe to access. With item_model,
+    # topics that do not validate are dropped instead of failing the job.
+
+    parsed, how = extract_json(raw, kinds="{[")
+    _report("Topics", how)
+
+    if isinstance(parsed, list):
+        parsed = {"root": parsed}
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("root"), list):
+        print("[!] Failed to parse topics JSON")
+        return {"root": []}
+
+    topics = []
+    for item in parsed["root"]:
+        if not isinstance(item, dict):
+            continue
+        item = _normalize_sources(item)
+        item.setdefault("published", "")
+
+        if item_model is not None:
+            item, error = validate(item, item_model)
+            if error:
+                print(f"[!] Dropped invalid topic {item.get('title')!r}: {error}")
+                continue
+        topics.append(item)
+
+    return {**parsed, "root": topics}
+
+
+def clean_crewai_article(
+    raw: Union[str, Dict[str, Any]], model=None
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    # Extracts the article JSON of any CrewAI output into a dict.
+    # With model (e.g. VerifiedArticle) the result is validated and
+    # normalized, an invalid article is still returned as parsed.
+    # Returns (article, how), how as from extract_json: "salvaged" means
+    # the output was truncated and the article may be incomplete.
+    # The article is {} on failure.
+
+    parsed, how = extract_json(raw)
+    _report("Article", how)
+
+    if not isinstance(parsed, dict):
+        print("[!] Failed to parse article JSON")
+        return {}, how
+
+    if isinstance(parsed.get("article"), dict):
+        article = _normalize_sources(parsed["article"])
+        if "tags" in article:
+            article["tags"] = _as_list(article["tags"])
+    if isinstance(parsed.get("status"), str):
+        parsed["status"] = parsed["status"].strip().upper()
+    if isinstance(parsed.get("accuracy_score"), float):
+        parsed["accuracy_score"] = round(parsed["accuracy_score"])
+
+    if model is not None:
+        validated, error = validate(parsed, model)
+        if error:
+            print(f"[!] Article failed validation: {error}")
         else:
-            return cleaned
-
-    except Exception as e:
-        print(f"[!] Failed to parse input: {e}")
-        return cleaned
-
-
-def clean_crewai_article(raw: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
-    # Cleans and parses any CrewAI raw article output into a consistent dict.
-    # Handles cases where output is wrapped with ```json, ```, ''' or """.
-    # Always returns a dict. Returns {} on failure.
-
-    # If already a dict, return as is
-    if isinstance(raw, dict):
-        return raw
-
-    if not isinstance(raw, str):
-        raw = str(raw)
-
-    try:
-        # Remove leading markdown wrappers like ```json, ``` , ''' ,
-        cleaned = raw.strip()
-
-        # Remove leading 'json' or similar tags (e.g. 'json\n{...}')
-        cleaned = re.sub(r"^\s*(json)?\s*[\n\r]+", "", cleaned, flags=re.IGNORECASE)
-
-        # Remove wrapping triple quotes or backticks
-        cleaned = re.sub(
-            r"^(```(json)?|'''|\"\"\")", "", cleaned, flags=re.IGNORECASE
-        ).strip()
-        cleaned = re.sub(r"(```|'''|\"\"\")$", "", cleaned, flags=re.IGNORECASE).strip()
-
-        # Testing:
-        print("=== CLEANED ARTICLE STRING ===")
-        print(repr(cleaned))
-
-
-        # Final attempt to parse
-        return json.loads(cleaned)
+            parsed = validated
 
-    except Exception as e:
-        print(f"[!] Failed to parse article JSON: {e}")
-        return {}
+    return parsed, how
 
 
 def clean_usage_tokens(metrics_obj) -> dict:
@@ -0,0 +1,127 @@
+from prisma import Prisma
+from typing import Optional
+import asyncio
+import atexit
+import time
+import os
+
+
+# Seconds a connection may stay idle before it is health-checked again
+DB_HEALTHCHECK_INTERVAL = int(os.getenv("DB_HEALTHCHECK_INTERVAL", "60"))
+
+# Connection counters for this worker process.
+# "opened" is the total number of connects, "last_job" the number of
+# connects made while running the most recent job (0 when the pooled
+# client was reused), "jobs" the number of jobs run through run_job().
+DB_STATS = {"opened": 0, "last_job": 0, "jobs": 0}
+
+# Seconds the tasks of an interrupted job get to run their cleanup
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "10"))
+
+_db: Optional[Prisma] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_last_used = 0.0
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the worker-lifetime event loop.
+    The Prisma client is bound to the loop it connected on, so every job
+    of this process must run on the same loop instead of asyncio.run().
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+async def _is_healthy(db: Prisma) -> bool:
+    if not db.is_connected():
+        return False
+
+    if time.monotonic() - _last_used < DB_HEALTHCHECK_INTERVAL:
+        return True
+
+    try:
+        await db.query_raw("SELECT 1")
+        return True
+    except Exception as e:
+        print("@@ERROR (db health check):", e)
+        try:
+            await db.disconnect()
+        except Exception:
+            pass
+        return False
+
+
+async def get_db() -> Prisma:
+    """
+    Returns the worker-lifetime Prisma client, connecting it on first use
+    and reconnecting it when the health check fails.
+    """
+    global _db, _last_used
+    if _db is None:
+        _db = Prisma()
+
+    if not await _is_healthy(_db):
+        await _db.connect()
+        DB_STATS["opened"] += 1
+        print("Opened Database Connection")
+
+    _last_used = time.monotonic()
+    return _db
+
+
+def _drain(loop: asyncio.AbstractEventLoop, before: set):
+    """
+    Cancels the tasks a job left pending, e.g. when RQ's JobTimeoutException
+    interrupted run_until_complete(), so they don't resume inside the next
+    job. Their finally blocks (key leases, tracing) still run.
+    """
+    pending = [task for task in asyncio.all_tasks(loop) - before if not task.done()]
+    if not pending:
+        return
+
+    for task in pending:
+        task.cancel()
+    try:
+        loop.run_until_complete(asyncio.wait(pending, timeout=JOB_DRAIN_TIMEOUT))
+    except BaseException as e:
+        print("@@ERROR (drain job tasks):", e)
+
+    print(f"Cancelled {len(pending)} pending tasks of the previous job")
+
+
+def run_job(coro):
+    """
+    Runs a job coroutine on the worker-lifetime event loop.
+    """
+    loop = get_loop()
+    before = asyncio.all_tasks(loop)
+    opened = DB_STATS["opened"]
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        _drain(loop, before)
+        DB_STATS["last_job"] = DB_STATS["opened"] - opened
+        DB_STATS["jobs"] += 1
+
+
+def close_db():
+    """
+    Disconnects the worker-lifetime client, called on worker shutdown.
+    """
+    global _db
+    if _loop is None or _loop.is_closed():
+        return
+
+    if _db is not None and _db.is_connected():
+        _loop.run_until_complete(_db.disconnect())
+        print("Closing Database Connection")
+
+    _db = None
+    _loop.close()
+
+
+atexit.register(close_db)
@@ -0,0 +1,88 @@
+from chromadb.utils.embedding_functions import GoogleGenerativeAiEmbeddingFunction
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from lib.rate_limit import RateLimiter, call_with_rate_limit
+from lib.cache import RedisCache, cache_key
+from lib import cassette, tracing
+from array import array
+import os
+
+
+EMBEDDING_MODEL = "text-embedding-004"
+
+# Entities (category names, people, places) barely change, keep them for long
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(60 * 60 * 24 * 30)))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+
+embedding_cache = RedisCache(
+    "cache:embedding", EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_MAX_ENTRIES
+)
+
+
+def pack_vector(vector) -> bytes:
+    # float32 blob, 3 KB for a 768 dimensional vector
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> list:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Google embedder behind a content-hash keyed cache.
+    Only documents missing from the cache are sent to the API, in one call.
+    """
+
+    def __init__(self, api_key: str, model_name: str = EMBEDDING_MODEL):
+        self.model_name = model_name
+        self._embedder = GoogleGenerativeAiEmbeddingFunction(
+            api_key=api_key, model_name=model_name
+        )
+        self._limiter = RateLimiter("gemini-embedding", api_key)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        with tracing.span("embedding", model=self.model_name, documents=len(input)):
+            return cassette.exchange(
+                "embedding",
+                {"model": self.model_name, "input": list(input)},
+                lambda: self._embed(input),
+            )
+
+    def _embed(self, input: Documents) -> Embeddings:
+        keys = [cache_key(self.model_name, doc) for doc in input]
+        cached = embedding_cache.get_many(keys)
+
+        missing = [i for i, blob in enumerate(cached) if blob is None]
+        tracing.set_attributes(cache_misses=len(missing))
+        fresh = []
+        if missing:
+            documents = [input[i] for i in missing]
+            fresh = call_with_rate_limit(
+                self._limiter,
+                lambda: self._embedder(documents),
+                sum(len(doc) for doc in documents) // 4,
+            )
+
+        for i, vector in zip(missing, fresh):
+            embedding_cache.set(keys[i], pack_vector(vector))
+
+        fresh_by_index = dict(zip(missing, fresh))
+        return [
+            fresh_by_index[i] if blob is None else unpack_vector(blob)
+            for i, blob in enumerate(cached)
+        ]
+
+
+def embedder_config(api_key: str) -> dict:
+    """
+    crewai embedder config using the cached Google embedder as a custom provider.
+    Drop-in for {"provider": "google", "config": {...}}.
+    """
+    return {
+        "provider": "custom",
+        "config": {
+            "embedder": CachedEmbeddingFunction(api_key=api_key),
+        },
+    }
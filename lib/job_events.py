@@ -0,0 +1,185 @@
+from redis.asyncio import Redis as AsyncRedis
+from lib.redis_conn import get_redis
+from lib import tracing
+from typing import AsyncIterator, List, Optional
+import json
+import time
+import os
+
+
+# Live job progress, published by the workers and streamed to the frontend
+# over SSE. The last event of every job is kept so a new subscriber gets the
+# current state without reading the Job row.
+JOB_EVENTS_CHANNEL = "job-events:{jobId}"
+JOB_LAST_EVENT_KEY = "job-events:last:{jobId}"
+JOB_LAST_EVENT_TTL = 60 * 60 * 24
+SSE_HEARTBEAT = 15
+
+# Job currently run by this worker process. A module global and not a
+# contextvar on purpose: crewai runs async_execution tasks in threads.
+_current = {"jobId": None, "topicId": None}
+_registered = {"task_events": False}
+
+
+def _value(value):
+    return getattr(value, "value", value)
+
+
+def bind_job(jobId: Optional[int], topicId: Optional[int] = None):
+    _current["jobId"] = jobId
+    _current["topicId"] = topicId
+
+
+def publish_job_event(jobId: int, event: str, **data):
+    payload = {"jobId": jobId, "event": event, "ts": time.time()}
+    payload.update({k: _value(v) for k, v in data.items()})
+    raw = json.dumps(payload, default=str)
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.publish(JOB_EVENTS_CHANNEL.format(jobId=jobId), raw)
+        if event == "status":
+            pipe.set(JOB_LAST_EVENT_KEY.format(jobId=jobId), raw, ex=JOB_LAST_EVENT_TTL)
+        pipe.execute()
+    except Exception as e:
+        print(f"@@ERROR (job event {event}): {e}")
+
+
+def publish(event: str, **data):
+    """
+    Publishes an event for the job bound to this process, if any.
+    """
+    if _current["jobId"] is None:
+        return
+
+    if _current["topicId"] is not None:
+        data.setdefault("topicId", _current["topicId"])
+
+    publish_job_event(_current["jobId"], event, **data)
+
+
+def _bound() -> bool:
+    return _current["jobId"] is not None
+
+
+def _task_name(source) -> str:
+    return getattr(source, "name", None) or str(getattr(source, "description", ""))[:60]
+
+
+def register_task_events():
+    """
+    Publishes task_started / task_completed / task_failed for the job bound
+    by bind_job(), using crewai's event bus, and opens a tracing span per
+    task and per tool call. Registered once per process, next to crewai's
+    own listeners (verbose console log, telemetry), which stay in place.
+    """
+    if _registered["task_events"]:
+        return
+    _registered["task_events"] = True
+
+    try:
+        from crewai.utilities.events import (
+            crewai_event_bus,
+            TaskStartedEvent,
+            TaskCompletedEvent,
+            TaskFailedEvent,
+        )
+    except ImportError as e:
+        print(f"@@WARNING (job events): crewai event bus not available, no task events: {e}")
+        return
+
+    @crewai_event_bus.on(TaskStartedEvent)
+    def on_task_started(source, event):
+        if not _bound():
+            return
+        publish("task_started", task=_task_name(source))
+        tracing.start_span(
+            ("task", id(source)),
+            f"task {_task_name(source)}",
+            agent=getattr(getattr(source, "agent", None), "role", None),
+        )
+
+    @crewai_event_bus.on(TaskCompletedEvent)
+    def on_task_completed(source, event):
+        if not _bound():
+            return
+        publish("task_completed", task=_task_name(source))
+        tracing.end_span(("task", id(source)))
+
+    @crewai_event_bus.on(TaskFailedEvent)
+    def on_task_failed(source, event):
+        if not _bound():
+            return
+        publish("task_failed", task=_task_name(source), error=getattr(event, "error", ""))
+        tracing.end_span(("task", id(source)), error=str(getattr(event, "error", "")))
+
+    try:
+        from crewai.utilities.events import (
+            ToolUsageStartedEvent,
+            ToolUsageFinishedEvent,
+            ToolUsageErrorEvent,
+        )
+    except ImportError as e:
+        # Older crewai without tool events, tool calls show up as LLM gaps
+        print(f"@@WARNING (job events): crewai tool events not available, no tool spans: {e}")
+        return
+
+    def tool_key(source, event):
+        # crewai emits the start and end events of one tool call from the
+        # same ToolUsage object, concurrent or nested calls use their own
+        return ("tool", id(source), getattr(event, "tool_name", ""))
+
+    @crewai_event_bus.on(ToolUsageStartedEvent)
+    def on_tool_started(source, event):
+        if not _bound():
+            return
+        tracing.start_span(
+            tool_key(source, event),
+            f"tool {getattr(event, 'tool_name', '')}",
+            agent=getattr(event, "agent_role", None),
+        )
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def on_tool_finished(source, event):
+        if _bound():
+            tracing.end_span(tool_key(source, event), from_cache=getattr(event, "from_cache", None))
+
+    @crewai_event_bus.on(ToolUsageErrorEvent)
+    def on_tool_error(source, event):
+        if _bound():
+            tracing.end_span(tool_key(source, event), error=str(getattr(event, "error", "")))
+
+
+async def stream_job_events(jobIds: List[int]) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for the given jobs, fed by Redis pub/sub.
+    """
+    redis_conn = AsyncRedis.from_url(os.getenv("REDIS_URL"))
+    pubsub = redis_conn.pubsub()
+    await pubsub.subscribe(*[JOB_EVENTS_CHANNEL.format(jobId=i) for i in jobIds])
+
+    try:
+        last_events = await redis_conn.mget(
+            [JOB_LAST_EVENT_KEY.format(jobId=i) for i in jobIds]
+        )
+        for raw in last_events:
+            if raw:
+                yield f"event: status\ndata: {raw.decode()}\n\n"
+
+        while True:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=SSE_HEARTBEAT
+            )
+            if message is None:
+                # Keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+
+            raw = message["data"].decode()
+            event = json.loads(raw).get("event", "message")
+            yield f"event: {event}\ndata: {raw}\n\n"
+
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await redis_conn.aclose()
@@ -0,0 +1,286 @@
+from prisma.enums import STATUS, TYPE
+from prisma import Prisma
+from typing import List, Optional
+from datetime import datetime, timezone
+from collections import Counter
+from lib.job_events import publish_job_event
+from lib.tracing import traced
+from lib.usage_rollup import queue_rollup
+
+
+# State transitions of Job/Topic rows written by the crew runners and routes.
+# Every transition queues its related writes on one Prisma batch, which is
+# sent in a single round trip and applied in a single transaction, so a job
+# is never left COMPLETED while its topic still says PROCESSING, and its
+# UsageMetric row never disagrees with the UsageRollup totals.
+
+
+def usage_metric_data(usage: Optional[dict], trigger: str, jobId: int) -> Optional[dict]:
+    """
+    Converts a clean_usage_tokens() dict, merged with llm_cache_stats(),
+    into UsageMetric create data. Returns None when there is nothing to record.
+    """
+    if not usage or not (usage.get("total_tokens") or usage.get("cache_hits")):
+        return None
+
+    date = usage.get("date")
+    if not date or date.startswith("0000"):
+        # A fully cached run has no crewai metrics, stamp it like clean_usage_tokens
+        date = (
+            datetime.now(timezone.utc)
+            .replace(hour=0, minute=0, second=0, microsecond=0)
+            .isoformat()
+        )
+
+    return {
+        "trigger": trigger,
+        "date": date,
+        "promptTokens": usage.get("prompt_tokens"),
+        "completionTokens": usage.get("completion_tokens"),
+        "totalTokens": usage.get("total_tokens"),
+        "successfulRequests": usage.get("successful_requests"),
+        "cacheHits": usage.get("cache_hits", 0),
+        "cachedTokens": usage.get("cached_tokens", 0),
+        "jobId": jobId,
+    }
+
+
+@traced("db.create_jobs")
+async def create_jobs(
+    db: Prisma, categoryIds: List[int], type: str, trigger: str
+) -> List[dict]:
+    """
+    Creates one QUEUED job per category in a single INSERT ... RETURNING,
+    prisma's create_many does not return the created ids.
+    Returns [{"id": ..., "categoryId": ...}] in the order of categoryIds.
+    """
+    if not categoryIds:
+        return []
+
+    return await db.query_raw(
+        """
+        INSERT INTO "Job" ("categoryId", "type", "trigger", "status", "updatedAt")
+        SELECT t.category_id, $2::"TYPE", $3::"TRIGGER", $4::"STATUS", NOW()
+        FROM unnest($1::int[]) WITH ORDINALITY AS t(category_id, position)
+        ORDER BY t.position
+        RETURNING "id", "categoryId"
+        """,
+        categoryIds,
+        str(getattr(type, "value", type)),
+        str(getattr(trigger, "value", trigger)),
+        STATUS.QUEUED.value,
+    )
+
+
+class _ClaimConflict(Exception):
+    pass
+
+
+@traced("db.claim_topics")
+async def claim_topics(db: Prisma, topicIds: List[int], regenerate: bool = False) -> bool:
+    """
+    Moves the topics to QUEUED in one transaction, all of them or none when
+    another request claimed one first: only topics that are not QUEUED or
+    PROCESSING (nor COMPLETED, unless regenerate) are updated, and the
+    update is rolled back when its count doesn't match. With regenerate,
+    the topics' articles are deleted and their jobs' completedItems
+    decremented, like /regenerate-article does.
+    """
+    blocked = [STATUS.QUEUED, STATUS.PROCESSING]
+    if not regenerate:
+        blocked.append(STATUS.COMPLETED)
+
+    try:
+        async with db.tx() as tx:
+            claimed = await tx.topic.update_many(
+                where={"id": {"in": topicIds}, "status": {"not_in": blocked}},
+                data={"status": STATUS.QUEUED},
+            )
+            if claimed != len(topicIds):
+                raise _ClaimConflict()
+
+            if regenerate:
+                articles = await tx.article.find_many(where={"topicId": {"in": topicIds}})
+                await tx.article.delete_many(where={"topicId": {"in": topicIds}})
+
+                per_job = Counter(article.jobId for article in articles)
+                for jobId, count in per_job.items():
+                    await tx.job.update(
+                        where={"id": jobId},
+                        data={"completedItems": {"decrement": count}},
+                    )
+
+    except _ClaimConflict:
+        return False
+
+    return True
+
+
+@traced("db.articles_queued")
+async def articles_queued(
+    db: Prisma, jobIds: List[int], topicIds: List[int], topics_claimed: bool = False
+):
+    """
+    Moves the jobs, and unless claim_topics() already did, the topics to QUEUED.
+    """
+    async with db.batch_() as batcher:
+        batcher.job.update_many(
+            where={"id": {"in": list(set(jobIds))}},
+            data={
+                "status": STATUS.QUEUED,
+                "type": TYPE.ARTICLE_GENERATION,
+                "error": "",
+            },
+        )
+        if not topics_claimed:
+            batcher.topic.update_many(
+                where={"id": {"in": topicIds}},
+                data={"status": STATUS.QUEUED},
+            )
+
+    for jobId, topicId in zip(jobIds, topicIds):
+        publish_job_event(jobId, "status", status=STATUS.QUEUED, topicId=topicId)
+
+
+@traced("db.article_processing")
+async def article_processing(db: Prisma, jobId: int, topicId: int):
+    async with db.batch_() as batcher:
+        batcher.job.update(
+            where={"id": jobId},
+            data={"status": STATUS.PROCESSING},
+        )
+        batcher.topic.update(
+            where={"id": topicId},
+            data={"status": STATUS.PROCESSING},
+        )
+
+    publish_job_event(jobId, "status", status=STATUS.PROCESSING, topicId=topicId)
+
+
+@traced("db.article_completed")
+async def article_completed(
+    db: Prisma,
+    jobId: int,
+    topicId: int,
+    article_data: dict,
+    usage: Optional[dict] = None,
+    trigger: str = "",
+):
+    usage_data = usage_metric_data(usage, trigger, jobId)
+
+    async with db.batch_() as batcher:
+        batcher.article.create(data=article_data)
+        batcher.job.update(
+            where={"id": jobId},
+            data={"status": STATUS.PENDING, "completedItems": {"increment": 1}},
+        )
+        batcher.topic.update(
+            where={"id": topicId},
+            data={"status": STATUS.COMPLETED},
+        )
+        if usage_data:
+            batcher.usagemetric.create(data=usage_data)
+            queue_rollup(batcher, usage_data, usage)
+
+    # The job stays PENDING until its last topic is done, only the topic is
+    # COMPLETED. The batch doesn't return rows, read the new completedItems.
+    job = await db.job.find_unique(where={"id": jobId})
+    publish_job_event(
+        jobId,
+        "status",
+        status=job.status if job else STATUS.PENDING,
+        completedItems=job.completedItems if job else None,
+        totalItems=job.totalItems if job else None,
+        topicId=topicId,
+        topicStatus=STATUS.COMPLETED,
+    )
+
+
+@traced("db.article_failed")
+async def article_failed(
+    db: Prisma,
+    jobId: int,
+    topicId: int,
+    error: str,
+    usage: Optional[dict] = None,
+    trigger: str = "",
+):
+    usage_data = usage_metric_data(usage, trigger, jobId)
+
+    async with db.batch_() as batcher:
+        batcher.job.update(
+            where={"id": jobId},
+            data={"status": STATUS.FAILED, "error": error},
+        )
+        batcher.topic.update(
+            where={"id": topicId},
+            data={"status": STATUS.FAILED},
+        )
+        if usage_data:
+            batcher.usagemetric.create(data=usage_data)
+            queue_rollup(batcher, usage_data, usage)
+
+    publish_job_event(
+        jobId, "status", status=STATUS.FAILED, topicId=topicId, error=error
+    )
+
+
+@traced("db.topics_processing")
+async def topics_processing(db: Prisma, jobId: int):
+    # Single write, kept here so every transition goes through this module
+    await db.job.update(
+        where={"id": jobId},
+        data={"status": STATUS.PROCESSING},
+    )
+
+    publish_job_event(jobId, "status", status=STATUS.PROCESSING)
+
+
+@traced("db.topics_completed")
+async def topics_completed(
+    db: Prisma,
+    jobId: int,
+    topic_records: List[dict],
+    usage: Optional[dict] = None,
+    trigger: str = "",
+):
+    usage_data = usage_metric_data(usage, trigger, jobId)
+
+    async with db.batch_() as batcher:
+        batcher.topic.create_many(data=topic_records)
+        batcher.job.update(
+            where={"id": jobId},
+            data={"status": STATUS.PENDING, "totalItems": len(topic_records)},
+        )
+        if usage_data:
+            batcher.usagemetric.create(data=usage_data)
+            queue_rollup(batcher, usage_data, usage)
+
+    publish_job_event(
+        jobId, "status", status=STATUS.PENDING, totalItems=len(topic_records)
+    )
+
+    # create_many doesn't return rows, the topic index needs their ids
+    return await db.topic.find_many(where={"jobId": jobId}, order={"id": "asc"})
+
+
+@traced("db.topics_failed")
+async def topics_failed(
+    db: Prisma,
+    jobId: int,
+    error: str,
+    usage: Optional[dict] = None,
+    trigger: str = "",
+):
+    usage_data = usage_metric_data(usage, trigger, jobId)
+
+    async with db.batch_() as batcher:
+        batcher.job.update(
+            where={"id": jobId},
+            data={"status": STATUS.FAILED, "error": error},
+        )
+        if usage_data:
+            batcher.usagemetric.create(data=usage_data)
+            queue_rollup(batcher, usage_data, usage)
+
+    publish_job_event(jobId, "status", status=STATUS.FAILED, error=error)
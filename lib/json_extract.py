@@ -0,0 +1,321 @@
+from json import JSONDecodeError, JSONDecoder
+from typing import Any, List, Optional, Tuple
+import json
+import re
+
+
+# Extracts the outermost JSON object from LLM output: code fences, prose
+# around it, single quotes, smart quotes, comments, trailing or missing
+# commas, Python literals, raw newlines and unescaped quotes inside strings,
+# and output cut off mid-way (the complete part is kept).
+
+_decoder = JSONDecoder()
+
+# A "{" that starts an object and not a brace inside prose
+_OBJECT_START = re.compile(r"\{\s*(?:[\"'“‘}]|[A-Za-z_][\w-]*\s*:)")
+_ARRAY_START = re.compile(r"\[\s*(?:[\"'“‘{\[\]\d-]|true|false|null)")
+
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?$")
+_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+    "NaN": "null",
+    "undefined": "null",
+}
+_VALUE_START = re.compile(r"(?:-?\d|true\b|false\b|null\b)")
+
+_WHITESPACE = " \t\r\n"
+_STRUCTURAL = ",:{}[]"
+_QUOTES = {'"': '"', "'": "'", "“": "”", "‘": "’"}
+_CLOSING_QUOTES = {'"': '"', "'": "'", "”": '"', "’": "'"}
+_ESCAPES = set('"\\/bfnrtu')
+_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+# Characters that need attention inside a string
+_STRING_SPECIAL = re.compile(r"[\"'\\”’\x00-\x1f]")
+
+
+class _Frame:
+    __slots__ = ("kind", "expect", "safe")
+
+    def __init__(self, kind: str, safe: int):
+        self.kind = kind
+        # objects: key / colon / value / comma, arrays: value / comma
+        self.expect = "key" if kind == "{" else "value"
+        # Output length up to the last complete member, for rollbacks
+        self.safe = safe
+
+
+def _candidates(text: str, kinds: str) -> List[int]:
+    starts = []
+    if "{" in kinds:
+        starts += [m.start() for m in _OBJECT_START.finditer(text)]
+    if "[" in kinds:
+        starts += [m.start() for m in _ARRAY_START.finditer(text)]
+    return sorted(starts)
+
+
+def _closes_string(text: str, i: int) -> bool:
+    """
+    Whether the quote at text[i] ends the string. A quote followed by text
+    is taken as an unescaped quote inside the string.
+    """
+    j = i + 1
+    n = len(text)
+    newline = False
+    while j < n and text[j] in _WHITESPACE:
+        newline = newline or text[j] == "\n"
+        j += 1
+
+    if j >= n or text[j] in "}]:":
+        return True
+    if text[j] == ",":
+        j += 1
+        while j < n and text[j] in _WHITESPACE:
+            j += 1
+        return j >= n or text[j] in "\"'“‘{[}],/" or bool(_VALUE_START.match(text, j))
+    # Next key or value on a new line, the comma is missing
+    return newline and text[j] in "\"'“‘{["
+
+
+def _read_string(text: str, i: int) -> Tuple[str, int, bool]:
+    """
+    Reads the string starting with the quote at text[i].
+    Returns (JSON string literal, index after it, closed).
+    """
+    opening = text[i]
+    closing = _QUOTES[opening]
+    n = len(text)
+    out = ['"']
+    i += 1
+
+    while True:
+        m = _STRING_SPECIAL.search(text, i)
+        if m is None:
+            out.append(text[i:])
+            out.append('"')
+            return "".join(out), n, False
+
+        j = m.start()
+        out.append(text[i:j])
+        c = text[j]
+
+        if c == "\\":
+            nxt = text[j + 1 : j + 2]
+            if nxt == "'":
+                out.append("'")
+                i = j + 2
+            elif nxt == "u" and re.match(r"[0-9a-fA-F]{4}", text[j + 2 : j + 6]):
+                out.append(text[j : j + 6])
+                i = j + 6
+            elif nxt and nxt in _ESCAPES:
+                out.append(text[j : j + 2])
+                i = j + 2
+            elif not nxt:
+                # Cut off right after a backslash
+                out.append('"')
+                return "".join(out), n, False
+            else:
+                out.append("\\\\")
+                i = j + 1
+
+        elif c in _CLOSING_QUOTES and (
+            c == closing or _CLOSING_QUOTES[c] == closing
+        ) and _closes_string(text, j):
+            out.append('"')
+            return "".join(out), j + 1, True
+
+        elif c == '"':
+            out.append('\\"')
+            i = j + 1
+
+        elif c in "'”’":
+            out.append(c)
+            i = j + 1
+
+        else:
+            out.append(_CONTROL.get(c, "\\u%04x" % ord(c)))
+            i = j + 1
+
+
+def repair_json(text: str, start: int = 0) -> Tuple[str, bool]:
+    """
+    Rewrites the value starting at text[start] into valid JSON in one pass.
+    Returns (JSON text, truncated), truncated when the input ended before the
+    outermost value was closed and the complete part was salvaged.
+    """
+    out: List[str] = []
+    stack: List[_Frame] = []
+    n = len(text)
+    i = start
+
+    def before_value() -> bool:
+        # Returns True when the value is an object key
+        if not stack:
+            return False
+        frame = stack[-1]
+        if frame.expect == "comma":
+            out.append(",")
+            frame.expect = "key" if frame.kind == "{" else "value"
+        elif frame.expect == "colon":
+            out.append(":")
+            frame.expect = "value"
+        return frame.kind == "{" and frame.expect == "key"
+
+    def after_value():
+        if stack:
+            stack[-1].expect = "comma"
+            stack[-1].safe = len(out)
+
+    def close_frame():
+        frame = stack.pop()
+        del out[frame.safe :]
+        out.append("}" if frame.kind == "{" else "]")
+        after_value()
+
+    while i < n:
+        c = text[i]
+
+        if c in _WHITESPACE:
+            i += 1
+
+        elif c == "/" and text[i + 1 : i + 2] in ("/", "*"):
+            if text[i + 1] == "/":
+                end = text.find("\n", i)
+                i = n if end == -1 else end + 1
+            else:
+                end = text.find("*/", i + 2)
+                i = n if end == -1 else end + 2
+
+        elif c in "{[":
+            before_value()
+            out.append(c)
+            stack.append(_Frame(c, len(out)))
+            i += 1
+
+        elif c in "}]":
+            i += 1
+            if not stack:
+                break
+            close_frame()
+            if not stack:
+                return "".join(out), False
+
+        elif c == ",":
+            i += 1
+            if stack and stack[-1].expect == "comma":
+                out.append(",")
+                stack[-1].expect = "key" if stack[-1].kind == "{" else "value"
+
+        elif c in ":=" and stack and stack[-1].expect == "colon":
+            out.append(":")
+            stack[-1].expect = "value"
+            i += 1
+
+        elif c in _QUOTES:
+            is_key = before_value()
+            literal, i, closed = _read_string(text, i)
+
+            if is_key:
+                if not closed:
+                    break
+                out.append(literal)
+                stack[-1].expect = "colon"
+            elif not closed and stack and stack[-1].kind == "[":
+                # A cut off list item (e.g. half a URL) is worth less than none
+                break
+            else:
+                out.append(literal)
+                after_value()
+                if not stack:
+                    return "".join(out), not closed
+
+        else:
+            j = i
+            while j < n and text[j] not in _WHITESPACE and text[j] not in _STRUCTURAL and text[j] not in _QUOTES:
+                j += 1
+            if j == i:
+                # Stray character, e.g. a closing smart quote
+                i += 1
+                continue
+
+            word = text[i:j]
+            if j >= n and stack:
+                # Cut off mid-token, dropped by the rollback below
+                break
+
+            is_key = before_value()
+            i = j
+            if is_key:
+                out.append(json.dumps(word))
+                stack[-1].expect = "colon"
+                continue
+
+            if word in _LITERALS:
+                out.append(_LITERALS[word])
+            elif _NUMBER.match(word.lstrip("+")):
+                out.append(word.lstrip("+"))
+            else:
+                try:
+                    out.append(json.dumps(float(word)) if "." in word else str(int(word)))
+                except ValueError:
+                    out.append(json.dumps(word))
+            after_value()
+            if not stack:
+                return "".join(out), False
+
+    truncated = bool(stack)
+    while stack:
+        close_frame()
+
+    return "".join(out), truncated
+
+
+def extract_json(text: Any, kinds: str = "{") -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Returns (value, how) for the outermost JSON value in `text`, `how` being
+    "json" (parsed as is), "repaired", "salvaged" (truncated output) or None
+    when nothing could be extracted. `kinds` is "{", "[" or "{[".
+    """
+    if isinstance(text, (dict, list)):
+        return text, "json"
+    if not isinstance(text, str):
+        text = str(text)
+
+    starts = _candidates(text, kinds)
+    if not starts:
+        return None, None
+
+    # Outermost first: a later candidate may only be a nested object
+    for start in starts:
+        # Fast path, valid JSON with prose or fences around it
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            return value, "json"
+        except JSONDecodeError:
+            pass
+
+        repaired, truncated = repair_json(text, start)
+        try:
+            value = json.loads(repaired)
+        except JSONDecodeError:
+            continue
+        if value:
+            return value, "salvaged" if truncated else "repaired"
+
+    return None, None
+
+
+def validate(data: Any, model) -> Tuple[Any, Optional[Exception]]:
+    """
+    Validates data against a pydantic model.
+    Returns (model_dump(), None) or (data unchanged, the validation error).
+    """
+    try:
+        return model.model_validate(data).model_dump(), None
+    except Exception as e:
+        return data, e
@@ -0,0 +1,124 @@
+from lib.rate_limit import RATE_LIMITS, key_id
+from lib.redis_conn import get_redis
+from typing import Dict, List, Optional
+import time
+import os
+
+
+# A lease older than this is considered leaked (crashed worker) and ignored
+KEY_LEASE_TTL = 60 * 15
+
+# 429s inside this window (seconds) count against a key
+KEY_THROTTLE_WINDOW = 60 * 10
+KEY_THROTTLE_WEIGHT = 5
+
+
+def _env_keys(name: str, default: str = "") -> List[str]:
+    return [k.strip() for k in os.getenv(name, default).split(",") if k.strip()]
+
+
+def load_keys(prefix: str) -> List[str]:
+    """
+    Reads "<PREFIX>S" (comma separated), then "<PREFIX>_1", "<PREFIX>_2", ...
+    and finally "<PREFIX>" itself, e.g. GROQ_API_KEYS / GROQ_API_KEY_1 / GROQ_API_KEY.
+    """
+    keys = _env_keys(f"{prefix}S")
+
+    index = 1
+    while os.getenv(f"{prefix}_{index}"):
+        keys.append(os.getenv(f"{prefix}_{index}"))
+        index += 1
+
+    if os.getenv(prefix):
+        keys.append(os.getenv(prefix))
+
+    return list(dict.fromkeys(keys))
+
+
+class KeyPool:
+    """
+    Assigns one API key per job, picking the least loaded key by running jobs,
+    recent 429s and how drained its tokens-per-minute bucket is. Keys reserved
+    for a trigger are only used by its jobs, the other keys by every job.
+    """
+
+    def __init__(
+        self, provider: str, keys: List[str], reserved: Optional[Dict[str, List[str]]] = None
+    ):
+        self.provider = provider
+        self.keys = keys
+        self.reserved = {
+            trigger.upper(): [k for k in trigger_keys if k in keys]
+            for trigger, trigger_keys in (reserved or {}).items()
+        }
+
+    def _candidates(self, trigger: Optional[str]) -> List[str]:
+        taken = {k for trigger_keys in self.reserved.values() for k in trigger_keys}
+        trigger = str(getattr(trigger, "value", trigger) or "").upper()
+        candidates = self.reserved.get(trigger, []) + [k for k in self.keys if k not in taken]
+        return candidates or self.keys
+
+    def _prefix(self, api_key: str) -> str:
+        # Same key names as lib.rate_limit.RateLimiter
+        return f"ratelimit:{self.provider}:{key_id(api_key)}"
+
+    def _scores(self, keys: List[str]) -> List[float]:
+        now = time.time()
+        tpm = RATE_LIMITS.get(self.provider, (0, 0))[1]
+
+        pipe = get_redis().pipeline(transaction=False)
+        for api_key in keys:
+            prefix = self._prefix(api_key)
+            # Leases of crashed workers are never released, prune them here
+            pipe.zremrangebyscore(f"{prefix}:leases", 0, now - KEY_LEASE_TTL)
+            pipe.zcard(f"{prefix}:leases")
+            pipe.zcount(f"{prefix}:throttles", now - KEY_THROTTLE_WINDOW, "+inf")
+            pipe.hget(f"{prefix}:tpm", "tokens")
+        results = pipe.execute()
+
+        scores = []
+        for i in range(len(keys)):
+            _, leases, throttles, tokens = results[i * 4 : i * 4 + 4]
+            drained = 0.0
+            if tpm and tokens is not None:
+                drained = 1 - max(0.0, min(1.0, float(tokens) / tpm))
+            scores.append(leases + KEY_THROTTLE_WEIGHT * throttles + drained)
+
+        return scores
+
+    def acquire(self, lease: str, trigger: Optional[str] = None) -> str:
+        if not self.keys:
+            return ""
+
+        keys = self._candidates(trigger)
+        try:
+            scores = self._scores(keys)
+            api_key = keys[scores.index(min(scores))]
+            get_redis().zadd(f"{self._prefix(api_key)}:leases", {lease: time.time()})
+            return api_key
+
+        except Exception as e:
+            print(f"@@ERROR (key pool {self.provider}): {e}")
+            return keys[0]
+
+    def release(self, lease: str):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for api_key in self.keys:
+                pipe.zrem(f"{self._prefix(api_key)}:leases", lease)
+            pipe.execute()
+        except Exception as e:
+            print(f"@@ERROR (key pool {self.provider}): {e}")
+
+
+# CRON and MANUAL jobs keep their own keys, like before the pool:
+# GROQ_API_KEY_1 for cron runs, GROQ_API_KEY_2 for editors. Comma separated
+# lists, set both to "" to share every key.
+groq_key_pool = KeyPool(
+    "groq",
+    load_keys("GROQ_API_KEY"),
+    {
+        "CRON": _env_keys("GROQ_API_KEYS_CRON", os.getenv("GROQ_API_KEY_1", "")),
+        "MANUAL": _env_keys("GROQ_API_KEYS_MANUAL", os.getenv("GROQ_API_KEY_2", "")),
+    },
+)
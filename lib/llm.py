@@ -0,0 +1,197 @@
+from lib.rate_limit import RateLimiter, call_with_rate_limit
+from lib.cache import RedisCache, cache_key
+from lib.job_events import publish
+from lib import cassette, metrics, tracing
+from crewai import LLM
+from typing import Dict
+import threading
+import re
+import json
+import os
+
+
+# Opt-in response cache for deterministic agent steps (research, manager
+# delegation): agents opt in with cache=True, LLM_CACHE_ENABLED=true caches
+# every agent, LLM_CACHE_DISABLED=true turns it off for all of them
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "false").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(60 * 60 * 24)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+llm_cache = RedisCache("cache:llm", LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES)
+
+# Tasks whose LLM calls are never cached, by task name, e.g. "review,write".
+# Tasks opt out in code with skip_llm_cache(task).
+_uncached_tasks = {
+    name.strip() for name in os.getenv("LLM_CACHE_SKIP_TASKS", "").split(",") if name.strip()
+}
+
+# Task prompts carry the current date and time to the microsecond, the key
+# only keeps the date so identical prompts of the same day share an entry
+_NOW_SECTION = re.compile(r"(\*\*CURRENT DATE AND TIME\*\*: \d{4}-\d{2}-\d{2})[^\n]*")
+
+# Sends every agent to one OpenAI compatible endpoint instead of the
+# providers, e.g. the fake LLM server of the offline benchmarks in bench/
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+
+# Per-job counters, reset by the crew runners before every job.
+# Tasks with async_execution=True run in threads, hence the lock.
+_stats_lock = threading.Lock()
+_job_stats = {"cache_hits": 0, "cache_misses": 0, "cached_tokens": 0}
+
+# Same, per model: locally counted tokens, used to split the job's provider
+# reported total across models (lib.usage_rollup)
+_model_stats: Dict[str, Dict[str, int]] = {}
+
+
+def reset_llm_cache_stats():
+    with _stats_lock:
+        for field in _job_stats:
+            _job_stats[field] = 0
+        _model_stats.clear()
+
+
+def llm_cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_job_stats)
+
+
+def llm_usage_by_model() -> Dict[str, Dict[str, int]]:
+    with _stats_lock:
+        return {model: dict(stats) for model, stats in _model_stats.items()}
+
+
+def _record(field: str, amount: int = 1):
+    with _stats_lock:
+        _job_stats[field] += amount
+
+
+def _record_model(model: str, **amounts):
+    with _stats_lock:
+        stats = _model_stats.setdefault(
+            model,
+            {"prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "cache_hits": 0, "cached_tokens": 0},
+        )
+        for field, amount in amounts.items():
+            stats[field] += amount
+
+
+def skip_llm_cache(task):
+    """
+    Opts a task out of the LLM cache, for every agent that works on it.
+    Returns the task.
+    """
+    _uncached_tasks.add(task.name)
+    return task
+
+
+def _stable_messages(messages):
+    if isinstance(messages, str):
+        return _NOW_SECTION.sub(r"\1", messages)
+    return [
+        {**message, "content": _NOW_SECTION.sub(r"\1", message["content"])}
+        if isinstance(message, dict) and isinstance(message.get("content"), str)
+        else message
+        for message in messages
+    ]
+
+
+def count_tokens(model: str, messages=None, text: str = "") -> int:
+    try:
+        import litellm
+
+        tokens = litellm.token_counter(model=model, text=text) if text else 0
+        if messages:
+            tokens += litellm.token_counter(model=model, messages=messages)
+        return tokens
+    except Exception:
+        # Rough estimate, ~4 characters per token
+        raw = json.dumps(messages, default=str) if messages else ""
+        return (len(raw) + len(text)) // 4
+
+
+class CachedLLM(LLM):
+    """
+    crewai LLM with an opt-in response cache keyed by
+    (model, temperature, full message list). Enable per agent with cache=True,
+    globally with LLM_CACHE_ENABLED=true, skip per task with skip_llm_cache().
+    Provider calls go through the shared Redis rate limiter of (provider, key).
+    """
+
+    def __init__(self, *args, cache: bool = False, **kwargs):
+        if LLM_BASE_URL and not kwargs.get("base_url"):
+            kwargs["base_url"] = LLM_BASE_URL
+        super().__init__(*args, **kwargs)
+        self.cache = (cache or LLM_CACHE_ENABLED) and not LLM_CACHE_DISABLED
+
+    def _call_provider(self, messages, *args, **kwargs):
+        # "groq/llama-3.3-70b-versatile" -> "groq"
+        limiter = RateLimiter(self.model.split("/")[0], self.api_key or "")
+
+        prompt_tokens = count_tokens(self.model, messages=messages)
+        response = call_with_rate_limit(
+            limiter,
+            lambda: super(CachedLLM, self).call(messages, *args, **kwargs),
+            prompt_tokens,
+            model=self.model,
+        )
+
+        completion_tokens = 0
+        if isinstance(response, str):
+            completion_tokens = count_tokens(self.model, text=response)
+            limiter.charge(completion_tokens)
+
+        publish(
+            "llm_call",
+            model=self.model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+        tracing.set_attributes(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        metrics.record_llm_call(self.model, prompt_tokens, completion_tokens)
+        _record_model(
+            self.model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, requests=1
+        )
+        return response
+
+    def call(self, messages, *args, **kwargs):
+        with tracing.span("llm.call", model=self.model):
+            return cassette.exchange(
+                "llm",
+                {"model": self.model, "messages": messages},
+                lambda: self._call_cached(messages, *args, **kwargs),
+            )
+
+    def _call_cached(self, messages, *args, **kwargs):
+        # Native function calling has side effects, never replay it
+        tools = kwargs.get("tools") or (args[0] if args else None)
+        # crewai passes the task being worked on as from_task
+        task_name = getattr(kwargs.get("from_task"), "name", None)
+        if not self.cache or tools or task_name in _uncached_tasks:
+            return self._call_provider(messages, *args, **kwargs)
+
+        key = cache_key(self.model, self.temperature, _stable_messages(messages))
+
+        cached = llm_cache.get(key)
+        if cached is not None:
+            entry = json.loads(cached)
+            _record("cache_hits")
+            _record("cached_tokens", entry["tokens"])
+            llm_cache.incr("saved_tokens", entry["tokens"])
+            publish("llm_call", model=self.model, cached=True, tokens=entry["tokens"])
+            tracing.set_attributes(cached=True, tokens=entry["tokens"])
+            metrics.record_llm_call(self.model, cached=True)
+            _record_model(self.model, cache_hits=1, cached_tokens=entry["tokens"])
+            return entry["response"]
+
+        _record("cache_misses")
+        response = self._call_provider(messages, *args, **kwargs)
+
+        if isinstance(response, str) and response.strip():
+            entry = {
+                "response": response,
+                "tokens": count_tokens(self.model, messages, response),
+            }
+            llm_cache.set(key, json.dumps(entry).encode("utf-8"))
+
+        return response
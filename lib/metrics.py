@@ -0,0 +1,219 @@
+from prometheus_client import Histogram
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    HistogramMetricFamily,
+)
+from lib.redis_conn import get_redis
+from lib.cache import RedisCache
+from typing import Dict, Tuple
+import functools
+import inspect
+import json
+import time
+import os
+
+
+# Prometheus metrics. The API and the workers run in separate containers, so
+# workers don't use prometheus_client's multiprocess directory: every worker
+# process adds to one Redis hash (HINCRBYFLOAT is atomic) and the API's
+# collector turns it into counters and histograms at scrape time, next to
+# live queue and cache stats. Request latency is measured in the API process.
+METRICS_KEY = "metrics:worker"
+
+JOB_DURATION_BUCKETS = (30, 60, 120, 180, 300, 450, 600, 900, 1200, float("inf"))
+
+CACHE_NAMESPACES = {"llm": "cache:llm", "search": "cache:search", "embedding": "cache:embedding"}
+
+HELP = {
+    "job_duration_seconds": "Duration of crew jobs by type, trigger and outcome",
+    "llm_calls": "LLM calls by model, cached ones included",
+    "llm_prompt_tokens": "Prompt tokens sent per model",
+    "llm_completion_tokens": "Completion tokens received per model",
+    "rate_limited": "429 responses by model or provider",
+}
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def _value(value) -> str:
+    return str(getattr(value, "value", value))
+
+
+def _field(kind: str, name: str, labels: dict) -> str:
+    return json.dumps([kind, name, {k: _value(v) for k, v in labels.items()}], sort_keys=True)
+
+
+def _write(fields: Dict[str, float]):
+    # Rendered offline too (bench/, replays), without Redis
+    if not os.getenv("REDIS_URL"):
+        return
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for field, amount in fields.items():
+            pipe.hincrbyfloat(METRICS_KEY, field, amount)
+        pipe.execute()
+    except Exception as e:
+        print(f"@@ERROR (metrics): {e}")
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if amount:
+        _write({_field("counter", name, labels): amount})
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...], **labels):
+    # Buckets are stored cumulative, the way Prometheus exposes them. Every
+    # bucket is written, even with 0, so a series never misses one. There is
+    # no count field: the collector exposes the +Inf bucket as _count.
+    fields = {
+        _field("bucket", name, {**labels, "le": "+Inf" if le == float("inf") else str(le)}): (
+            1 if value <= le else 0
+        )
+        for le in buckets
+    }
+    fields[_field("sum", name, labels)] = value
+    _write(fields)
+
+
+def record_llm_call(model: str, prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False):
+    fields = {_field("counter", "llm_calls", {"model": model, "cached": str(cached).lower()}): 1}
+    if prompt_tokens:
+        fields[_field("counter", "llm_prompt_tokens", {"model": model})] = prompt_tokens
+    if completion_tokens:
+        fields[_field("counter", "llm_completion_tokens", {"model": model})] = completion_tokens
+    _write(fields)
+
+
+def timed_job(type: str):
+    """
+    Decorator for the async crew runners: observes job_duration_seconds by
+    type, the runner's `trigger` argument and outcome (success when the
+    runner returns {"ok": True}, failure otherwise, error when it raises).
+    """
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
+            trigger = bound.arguments.get("trigger", "")
+            started = time.monotonic()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                ok = isinstance(result, dict) and result.get("ok")
+                outcome = "success" if ok else "failure"
+                return result
+            finally:
+                observe(
+                    "job_duration_seconds",
+                    time.monotonic() - started,
+                    JOB_DURATION_BUCKETS,
+                    type=type,
+                    trigger=trigger,
+                    outcome=outcome,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+class WorkerMetricsCollector:
+    """
+    Exposes the workers' Redis counters and histograms, RQ queue depth and
+    lag, and cache hit rates. Runs on every scrape of /metrics.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+
+    def _worker_metrics(self, redis_conn):
+        counters: Dict[str, dict] = {}
+        histograms: Dict[str, dict] = {}
+
+        for raw_field, raw_value in redis_conn.hgetall(METRICS_KEY).items():
+            kind, name, labels = json.loads(raw_field)
+            value = float(raw_value)
+
+            if kind == "counter":
+                counters.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+                continue
+
+            le = labels.pop("le", None)
+            series = histograms.setdefault(name, {}).setdefault(
+                tuple(sorted(labels.items())), {"buckets": {}, "sum": 0.0}
+            )
+            if kind == "bucket":
+                series["buckets"][le] = value
+            elif kind == "sum":
+                series["sum"] = value
+
+        for name, series in counters.items():
+            keys = [k for k, _ in next(iter(series))]
+            family = CounterMetricFamily(name, HELP.get(name, name), labels=keys)
+            for labels, value in series.items():
+                family.add_metric([v for _, v in labels], value)
+            yield family
+
+        for name, series in histograms.items():
+            keys = [k for k, _ in next(iter(series))]
+            family = HistogramMetricFamily(name, HELP.get(name, name), labels=keys)
+            for labels, data in series.items():
+                buckets = sorted(
+                    data["buckets"].items(),
+                    key=lambda item: float("inf") if item[0] == "+Inf" else float(item[0]),
+                )
+                family.add_metric([v for _, v in labels], buckets, data["sum"])
+            yield family
+
+    def _queue_metrics(self, redis_conn):
+        from lib.queues import queue_stats
+
+        depth = GaugeMetricFamily("rq_queue_depth", "Jobs waiting per queue", labels=["queue"])
+        running = GaugeMetricFamily("rq_queue_running", "Jobs running per queue", labels=["queue"])
+        age = GaugeMetricFamily(
+            "rq_queue_oldest_job_age_seconds",
+            "Wait time of the oldest job per queue",
+            labels=["queue"],
+        )
+        for name, stats in queue_stats(redis_conn).items():
+            depth.add_metric([name], stats["depth"])
+            running.add_metric([name], stats["running"])
+            age.add_metric([name], stats["oldest_wait_seconds"])
+
+        yield from (depth, running, age)
+
+    def _cache_metrics(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Lifetime cache hit ratio", labels=["cache"])
+        for name, namespace in CACHE_NAMESPACES.items():
+            stats = RedisCache(namespace, 0, 0).stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratio.add_metric([name], stats["hit_rate"])
+
+        yield from (hits, misses, ratio)
+
+    def collect(self):
+        redis_conn = self.connection or get_redis()
+        for part in (
+            lambda: self._worker_metrics(redis_conn),
+            lambda: self._queue_metrics(redis_conn),
+            self._cache_metrics,
+        ):
+            try:
+                # Materialized first, a Redis error must not cut a scrape in half
+                yield from list(part())
+            except Exception as e:
+                print(f"@@ERROR (metrics collect): {e}")
@@ -0,0 +1,168 @@
+from lib.job_events import publish
+from lib.redis_conn import get_redis
+from typing import Dict, List
+import os
+
+
+# Token budget for a task description, per model. The rest of the context
+# window is left for the agent's system prompt, tool calls and task context.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    "groq/gemma2-9b-it": int(os.getenv("PROMPT_TOKEN_BUDGET_GEMMA", "1500")),
+    "groq/meta-llama/llama-4-scout-17b-16e-instruct": PROMPT_TOKEN_BUDGET,
+    "groq/llama-3.3-70b-versatile": PROMPT_TOKEN_BUDGET,
+    "groq/meta-llama/llama-guard-4-12b": PROMPT_TOKEN_BUDGET,
+}
+
+# Sum of tokens before / after trimming per task, across all jobs
+PROMPT_BUDGET_STATS = "prompt-budget:stats"
+
+# tiktoken encoding, False once loading it failed so it isn't retried per call
+_encoding = None
+
+
+def count_text_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken's local cl100k_base encoding, close enough to
+    the Llama/Gemma tokenizers for budgeting. Falls back to ~4 chars a token.
+    """
+    global _encoding
+    if not text:
+        return 0
+
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"@@WARNING (prompt budget): tiktoken unavailable, estimating tokens: {e}")
+            _encoding = False
+
+    if _encoding is False:
+        return len(text) // 4
+
+    try:
+        return len(_encoding.encode(text, disallowed_special=()))
+    except Exception:
+        return len(text) // 4
+
+
+def _truncate_text(text: str, tokens: int) -> str:
+    """
+    Cuts text to about `tokens` tokens, at the last sentence end if possible.
+    """
+    if tokens <= 0:
+        return ""
+
+    chars = len(text) * tokens // max(count_text_tokens(text), 1)
+    cut = text[:chars]
+    end = max(cut.rfind(". "), cut.rfind(".\n"))
+    if end > chars // 2:
+        cut = cut[: end + 1]
+    return cut.rstrip() + " …"
+
+
+class Section:
+    """
+    A named part of a prompt. Priority 0 is never trimmed, otherwise the
+    highest priority number is trimmed first. Sections with lines=True lose
+    whole lines from the end (lists), others are cut at a sentence.
+    """
+
+    def __init__(
+        self, name: str, text: str, priority: int = 0, lines: bool = False, empty: str = "None"
+    ):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority
+        self.lines = lines
+        self.empty = empty
+
+    def tokens(self) -> int:
+        return count_text_tokens(self.text)
+
+    def trim(self, tokens: int):
+        if not self.lines:
+            self.text = _truncate_text(self.text, tokens)
+            return
+
+        kept = self.text.splitlines()
+        while kept and count_text_tokens("\n".join(kept)) > tokens:
+            kept.pop()
+        self.text = "\n".join(kept)
+
+    def render(self) -> str:
+        return self.text if self.text.strip() else self.empty
+
+
+def model_of(agent) -> str:
+    return getattr(getattr(agent, "llm", None), "model", "") or ""
+
+
+def bullet_list(items) -> str:
+    if isinstance(items, (list, tuple)):
+        return "\n".join(f"- {item}" for item in items)
+    return str(items or "")
+
+
+def budget_for(model: str) -> int:
+    return PROMPT_TOKEN_BUDGETS.get(model, PROMPT_TOKEN_BUDGET)
+
+
+def fit_prompt(task: str, model: str, template: str, sections: List[Section]) -> str:
+    """
+    Renders `template` (str.format placeholders named after the sections)
+    with the lower priority sections trimmed until it fits the model's budget.
+    Token counts before and after trimming are published for the job and
+    summed per task in Redis.
+    """
+    budget = budget_for(model)
+    fixed = count_text_tokens(template.format(**{s.name: "" for s in sections}))
+
+    before = {s.name: s.tokens() for s in sections}
+    total = fixed + sum(before.values())
+
+    for section in sorted(sections, key=lambda s: -s.priority):
+        if total <= budget or section.priority == 0:
+            break
+
+        current = section.tokens()
+        section.trim(max(0, current - (total - budget)))
+        total -= current - section.tokens()
+
+    after = {s.name: s.tokens() for s in sections}
+    before_total = fixed + sum(before.values())
+    after_total = fixed + sum(after.values())
+
+    trimmed = {
+        name: [before[name], after[name]] for name in before if before[name] != after[name]
+    }
+    if trimmed:
+        print(
+            f"✂️ Prompt for {task} trimmed from {before_total} to {after_total} tokens "
+            f"(budget {budget}): {trimmed}"
+        )
+
+    publish(
+        "prompt_budget",
+        task=task,
+        model=model,
+        budget=budget,
+        before=before_total,
+        after=after_total,
+        trimmed=trimmed,
+    )
+
+    # Prompts are also rendered offline (bench/prefix_reuse.py), without Redis
+    if os.getenv("REDIS_URL"):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.hincrby(PROMPT_BUDGET_STATS, f"{task}:before", before_total)
+            pipe.hincrby(PROMPT_BUDGET_STATS, f"{task}:after", after_total)
+            pipe.hincrby(PROMPT_BUDGET_STATS, f"{task}:count", 1)
+            pipe.execute()
+        except Exception as e:
+            print(f"@@ERROR (prompt budget): {e}")
+
+    return template.format(**{s.name: s.render() for s in sections})
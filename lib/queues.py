@@ -0,0 +1,145 @@
+from lib.redis_conn import get_redis
+from rq.registry import StartedJobRegistry
+from rq import Queue, SimpleWorker
+from rq.job import Job
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import random
+import os
+
+
+# Editors should never wait behind the nightly cron fan-out: MANUAL and CRON
+# jobs go to their own queues, optionally split by job type as well
+# ("manual-article", "cron-topic", ...). "default" is still consumed so jobs
+# enqueued before the split are not stranded.
+TRIGGER_QUEUES = ["manual", "cron"]
+DEFAULT_QUEUE = "default"
+QUEUE_SPLIT_BY_TYPE = os.getenv("QUEUE_SPLIT_BY_TYPE", "false").lower() == "true"
+
+# "priority": strict, a cron job only starts when every manual queue is empty.
+# "weighted": queues are polled in a random order biased by QUEUE_WEIGHTS.
+QUEUE_STRATEGY = os.getenv("QUEUE_STRATEGY", "priority")
+
+# e.g. "manual=10,cron=1" or "manual-article=10,manual-topic=5,cron=1"
+QUEUE_WEIGHTS = os.getenv("QUEUE_WEIGHTS", "manual=10,cron=1")
+
+
+def _value(value) -> str:
+    return str(getattr(value, "value", value))
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    weights = {}
+    for pair in raw.split(","):
+        if "=" in pair:
+            name, weight = pair.split("=", 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+WEIGHTS = _parse_weights(QUEUE_WEIGHTS)
+
+
+def queue_weight(name: str) -> float:
+    # Exact queue name first, then its trigger prefix ("manual-article" -> "manual")
+    return WEIGHTS.get(name, WEIGHTS.get(name.split("-")[0], 1.0))
+
+
+def queue_name(trigger: str, type: Optional[str] = None) -> str:
+    name = _value(trigger).lower()
+    if name not in TRIGGER_QUEUES:
+        return DEFAULT_QUEUE
+
+    if QUEUE_SPLIT_BY_TYPE and type:
+        # TOPIC_GENERATION -> topic, ARTICLE_GENERATION -> article
+        name = f"{name}-{_value(type).split('_')[0].lower()}"
+
+    return name
+
+
+def worker_queue_names() -> List[str]:
+    """
+    Every queue a worker listens on, in strict priority order.
+    """
+    names = []
+    for trigger in TRIGGER_QUEUES:
+        if QUEUE_SPLIT_BY_TYPE:
+            names += [f"{trigger}-article", f"{trigger}-topic"]
+        else:
+            names.append(trigger)
+
+    return names + [DEFAULT_QUEUE]
+
+
+def get_queue(trigger: str, type: Optional[str] = None, connection=None) -> Queue:
+    return Queue(queue_name(trigger, type), connection=connection or get_redis())
+
+
+class WeightedWorker(SimpleWorker):
+    """
+    Polls its queues in a weighted random order, reshuffled after every job,
+    so low-weight queues still make progress during a burst.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reorder_queues(reference_queue=None)
+
+    def reorder_queues(self, reference_queue):
+        # Efraimidis-Spirakis weighted shuffle
+        self._ordered_queues = sorted(
+            self.queues,
+            key=lambda q: random.random() ** (1.0 / max(queue_weight(q.name), 1e-6)),
+            reverse=True,
+        )
+
+
+def worker_class():
+    return WeightedWorker if QUEUE_STRATEGY == "weighted" else SimpleWorker
+
+
+def queue_stats(connection=None) -> Dict[str, dict]:
+    """
+    Depth, running jobs and age of the oldest waiting job per queue.
+    """
+    connection = connection or get_redis()
+    now = datetime.now(timezone.utc)
+
+    stats = {}
+    for name in worker_queue_names():
+        queue = Queue(name, connection=connection)
+        oldest_wait = 0.0
+
+        oldest_ids = queue.get_job_ids(0, 1)
+        if oldest_ids:
+            job = Job.fetch(oldest_ids[0], connection=connection)
+            if job.enqueued_at:
+                enqueued_at = job.enqueued_at.replace(tzinfo=timezone.utc)
+                oldest_wait = round((now - enqueued_at).total_seconds(), 1)
+
+        stats[name] = {
+            "depth": queue.count,
+            "running": StartedJobRegistry(queue=queue).count,
+            "oldest_wait_seconds": oldest_wait,
+            "weight": queue_weight(name),
+        }
+
+    return stats
+
+
+def enqueue_many(queue: Queue, func, args_list: List[tuple], **job_kwargs) -> List[Job]:
+    """
+    Enqueues one job per args tuple through a single Redis pipeline,
+    so fanning out N jobs costs one round trip instead of N.
+    """
+    if not args_list:
+        return []
+
+    with queue.connection.pipeline() as pipe:
+        jobs = queue.enqueue_many(
+            [Queue.prepare_data(func, args=args, **job_kwargs) for args in args_list],
+            pipeline=pipe,
+        )
+        pipe.execute()
+
+    return jobs
@@ -0,0 +1,240 @@
+from lib.redis_conn import get_redis
+from lib import metrics
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+import hashlib
+import time
+import os
+
+
+# Requests / tokens per minute per (provider, api key), shared by every worker
+# process through Redis. 0 disables a bucket.
+RATE_LIMITS: Dict[str, Tuple[int, int]] = {
+    "groq": (int(os.getenv("GROQ_RPM", "30")), int(os.getenv("GROQ_TPM", "6000"))),
+    "gemini": (int(os.getenv("GEMINI_RPM", "15")), int(os.getenv("GEMINI_TPM", "250000"))),
+    "gemini-embedding": (int(os.getenv("EMBEDDING_RPM", "1500")), 0),
+    "serper": (int(os.getenv("SERPER_RPM", "300")), 0),
+}
+
+# A call never waits longer than this before it is let through anyway
+RATE_LIMIT_MAX_WAIT = int(os.getenv("RATE_LIMIT_MAX_WAIT", "300"))
+
+# How often a 429 is retried after waiting for the provider's Retry-After
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+RATE_LIMIT_DEFAULT_RETRY_AFTER = 20
+
+
+# KEYS: rpm bucket, tpm bucket, cooldown
+# ARGV: now (ms), rpm, tpm, tokens, force
+# Returns milliseconds to wait, 0 when the request and its tokens were taken.
+# With force=1 the cost is always taken (buckets may go negative), used to
+# charge completion tokens that are only known after the call.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local force = tonumber(ARGV[5]) == 1
+
+if not force then
+  local cooldown = redis.call('PTTL', KEYS[3])
+  if cooldown > 0 then return cooldown end
+end
+
+local function refill(key, per_minute)
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or per_minute
+  local ts = tonumber(state[2]) or now
+  return math.min(per_minute, tokens + (now - ts) * per_minute / 60000)
+end
+
+local buckets = {
+  {KEYS[1], tonumber(ARGV[2]), 1},
+  {KEYS[2], tonumber(ARGV[3]), tonumber(ARGV[4])},
+}
+
+local wait = 0
+local levels = {}
+for i, bucket in ipairs(buckets) do
+  if bucket[2] > 0 then
+    levels[i] = refill(bucket[1], bucket[2])
+    local cost = math.min(bucket[3], bucket[2])
+    if levels[i] < cost then
+      wait = math.max(wait, math.ceil((cost - levels[i]) * 60000 / bucket[2]))
+    end
+  end
+end
+
+if wait > 0 and not force then return wait end
+
+for i, bucket in ipairs(buckets) do
+  if bucket[2] > 0 then
+    redis.call('HSET', bucket[1], 'tokens', levels[i] - bucket[3], 'ts', now)
+    redis.call('PEXPIRE', bucket[1], 120000)
+  end
+end
+return 0
+"""
+
+
+_script: Dict[str, object] = {}
+
+
+def _token_bucket(redis_conn):
+    # Registered once per process, limiters are created for every call.
+    # The Script keeps its SHA and falls back to EVAL after a SCRIPT FLUSH.
+    if "token_bucket" not in _script:
+        _script["token_bucket"] = redis_conn.register_script(TOKEN_BUCKET_SCRIPT)
+    return _script["token_bucket"]
+
+
+class RateLimitedError(Exception):
+    """
+    Raised by callers that detect a 429 themselves (e.g. plain requests calls).
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def key_id(api_key: str) -> str:
+    # Never put raw API keys into Redis key names
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+
+
+def retry_after_of(error: Exception) -> Optional[float]:
+    """
+    Returns the seconds to wait when the error is a 429, None otherwise.
+    """
+    if isinstance(error, RateLimitedError):
+        return error.retry_after or RATE_LIMIT_DEFAULT_RETRY_AFTER
+
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    name = type(error).__name__
+    if status != 429 and "RateLimit" not in name and "ResourceExhausted" not in name:
+        return None
+
+    try:
+        headers = getattr(response, "headers", None) or {}
+        retry_after = _parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    except Exception:
+        retry_after = None
+
+    # No usable header: back off by the default instead of failing the call
+    return RATE_LIMIT_DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    """
+    Retry-After is either delay-seconds or an HTTP-date.
+    """
+    if value is None:
+        return None
+
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if at is None:
+        return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return max(0.0, (at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    def __init__(self, provider: str, api_key: str):
+        self.provider = provider
+        self.rpm, self.tpm = RATE_LIMITS.get(provider, (0, 0))
+        self.prefix = f"ratelimit:{provider}:{key_id(api_key)}"
+        self.keys = [f"{self.prefix}:rpm", f"{self.prefix}:tpm", f"{self.prefix}:cooldown"]
+        self.stats_key = f"{self.prefix}:stats"
+
+    def _run(self, tokens: int, force: bool) -> int:
+        redis_conn = get_redis()
+        return int(
+            _token_bucket(redis_conn)(
+                keys=self.keys,
+                args=[int(time.time() * 1000), self.rpm, self.tpm, tokens, int(force)],
+                client=redis_conn,
+            )
+        )
+
+    def acquire(self, tokens: int = 0):
+        """
+        Blocks until one request and `tokens` tokens are available.
+        """
+        if not self.rpm and not self.tpm:
+            return
+
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT
+        while True:
+            try:
+                wait = self._run(tokens, force=False)
+            except Exception as e:
+                print(f"@@ERROR (rate limit {self.provider}): {e}")
+                return
+
+            if wait <= 0:
+                return
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⏳ Rate limit wait exceeded for {self.provider}, sending anyway")
+                return
+
+            time.sleep(min(wait / 1000, remaining))
+
+    def charge(self, tokens: int):
+        """
+        Takes tokens that are only known after the call, e.g. completion tokens.
+        """
+        if not self.tpm or tokens <= 0:
+            return
+
+        try:
+            self._run(tokens, force=True)
+        except Exception as e:
+            print(f"@@ERROR (rate limit {self.provider}): {e}")
+
+    def penalize(self, retry_after: float):
+        """
+        Learns from a 429: every process waits out the provider's Retry-After.
+        """
+        now = time.time()
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            pipe.set(self.keys[2], 1, px=int(retry_after * 1000))
+            pipe.hincrby(self.stats_key, "throttled", 1)
+            # Recent 429s, read by lib.key_pool to steer jobs to other keys
+            pipe.zadd(f"{self.prefix}:throttles", {str(now): now})
+            pipe.zremrangebyscore(f"{self.prefix}:throttles", 0, now - 60 * 60)
+            pipe.execute()
+        except Exception as e:
+            print(f"@@ERROR (rate limit {self.provider}): {e}")
+
+
+def call_with_rate_limit(limiter: RateLimiter, fn: Callable, tokens: int = 0, model: str = ""):
+    """
+    Calls fn() inside the shared limits, waiting out 429s instead of failing.
+    429s are counted per model, or per provider when no model is given.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(tokens)
+        try:
+            return fn()
+        except Exception as e:
+            retry_after = retry_after_of(e)
+            if retry_after is not None:
+                metrics.inc("rate_limited", model=model or limiter.provider)
+            if retry_after is None or attempt == RATE_LIMIT_RETRIES:
+                raise
+
+            print(f"⏳ {limiter.provider} rate limited, retrying in {retry_after}s")
+            limiter.penalize(retry_after)
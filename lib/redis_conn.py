@@ -0,0 +1,19 @@
+from redis import Redis
+from typing import Optional
+import os
+
+
+_conn: Optional[Redis] = None
+_pid: Optional[int] = None
+
+
+def get_redis() -> Redis:
+    """
+    Returns this process' Redis connection.
+    A new connection is opened after fork, sockets must not be shared.
+    """
+    global _conn, _pid
+    if _conn is None or _pid != os.getpid():
+        _conn = Redis.from_url(os.getenv("REDIS_URL"))
+        _pid = os.getpid()
+    return _conn
@@ -1,32 +1,271 @@
+from redis.asyncio import Redis as AsyncRedis
+from lib.redis_conn import get_redis
+from lib import tracing
+from typing import Dict, Optional, Set, Tuple
+import threading
+import secrets
+import asyncio
+import atexit
+import httpx
+import json
+import time
 import os
-import requests
 
 FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://host.docker.internal:3000")
 SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-key")
 
+# Identical (trigger, status, type) events inside this window (seconds)
+# are merged into one POST, across all worker processes.
+REVALIDATE_WINDOW = float(os.getenv("REVALIDATE_WINDOW", "1.5"))
 
-def revalidate(trigger: str, status: str, type: str):
+# The process that claims an event marks it done once sent or parked for a
+# retry. Processes that lost the claim check for the mark this long after the
+# window and send the event themselves when the claimer died or never got to
+# it. Longer than the webhook timeout.
+REVALIDATE_CLAIM_GRACE = float(os.getenv("REVALIDATE_CLAIM_GRACE", "15"))
+REVALIDATE_DONE_KEY = "revalidate:done:{claim}"
+
+# Undelivered events are parked in this Redis list and retried with backoff
+REVALIDATE_RETRY_KEY = "revalidate:retry"
+REVALIDATE_RETRY_INTERVAL = float(os.getenv("REVALIDATE_RETRY_INTERVAL", "5"))
+REVALIDATE_MAX_ATTEMPTS = int(os.getenv("REVALIDATE_MAX_ATTEMPTS", "6"))
+REVALIDATE_MAX_BACKOFF = 60 * 5
+
+
+def _value(value) -> str:
+    # prisma enums are str subclasses, send their plain value
+    return str(getattr(value, "value", value))
+
+
+def _payload_key(payload: dict) -> Tuple[str, str, str]:
+    return (payload["trigger"], payload["status"], payload["type"])
+
+
+class RevalidationDispatcher:
     """
-    Send revalidation request to Next.js /api/webhooks/revalidate/route.ts
+    Sends revalidation webhooks from a background thread with its own event
+    loop and a pooled HTTP client, so callers never block on the frontend.
+    Processes that lose the claim on an event keep watching it until the
+    claimer marks it done, see REVALIDATE_CLAIM_GRACE.
     """
-    try:
-        url = f"{FRONTEND_BASE_URL}/api/webhooks/revalidate"
+
+    def __init__(self, window: float = REVALIDATE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._client = None
+        self._redis: Optional[AsyncRedis] = None
+        self._pending: Dict[Tuple[str, str, str], asyncio.TimerHandle] = {}
+        self._claims: Dict[Tuple[str, str, str], Optional[str]] = {}
+        self._watching: Set[str] = set()
+
+    def _ensure_started(self):
+        with self._lock:
+            alive = self._thread is not None and self._thread.is_alive()
+            if alive and self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._pending = {}
+            self._claims = {}
+            self._watching = set()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._run, name="revalidate", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+        # The loop never blocks on Redis, it has its own async client
+        self._redis = AsyncRedis.from_url(os.getenv("REDIS_URL"))
+        self._loop.create_task(self._retry_loop())
+        self._loop.run_forever()
+
+    def _claim(self, payload: dict) -> Tuple[bool, Optional[str]]:
+        """
+        Only the first process to see an event inside the window sends it.
+        Returns (claimed, claim id), the claim id being ours or the winner's.
+        """
+        name = "revalidate:pending:" + ":".join(_payload_key(payload))
+        claim = secrets.token_hex(8)
+        try:
+            redis_conn = get_redis()
+            if redis_conn.set(name, claim, nx=True, px=int(self.window * 1000)):
+                return True, claim
+
+            winner = redis_conn.get(name)
+            return False, winner.decode() if winner else None
+
+        except Exception as e:
+            print(f"@@ERROR (revalidate claim): {e}")
+            return True, None
+
+    def submit(self, trigger: str, status: str, type: str) -> bool:
         payload = {
-            "trigger": trigger,
-            "status": status,
-            "type": type,
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {SECRET_KEY}",
+            "trigger": _value(trigger),
+            "status": _value(status),
+            "type": _value(type),
         }
 
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
+        claimed, claim = self._claim(payload)
+        if not claimed and claim is None:
+            # The winner's claim expired in between, try again
+            claimed, claim = self._claim(payload)
 
-        print(f"🔄 Revalidation triggered: {payload}")
+        self._ensure_started()
+        if claimed:
+            self._loop.call_soon_threadsafe(self._schedule, payload, claim)
+        else:
+            self._loop.call_soon_threadsafe(self._watch, payload, claim)
         return True
 
-    except Exception as e:
-        print(f"❌ Revalidation failed for {payload}: {e}")
-        return False
+    def _schedule(self, payload: dict, claim: Optional[str] = None):
+        key = _payload_key(payload)
+        if key in self._pending:
+            return
+
+        self._claims[key] = claim
+        self._pending[key] = self._loop.call_later(
+            self.window, lambda: self._loop.create_task(self._send(payload))
+        )
+
+    def _watch(self, payload: dict, claim: Optional[str]):
+        if not claim or claim in self._watching:
+            return
+
+        self._watching.add(claim)
+        self._loop.call_later(
+            self.window + REVALIDATE_CLAIM_GRACE,
+            lambda: self._loop.create_task(self._check_claim(payload, claim)),
+        )
+
+    async def _check_claim(self, payload: dict, claim: str):
+        self._watching.discard(claim)
+        try:
+            if await self._redis.exists(REVALIDATE_DONE_KEY.format(claim=claim)):
+                return
+        except Exception as e:
+            print(f"@@ERROR (revalidate check): {e}")
+            return
+
+        print(f"⚠️ Revalidation claimed by another process was never sent: {payload}")
+        # Runs the blocking claim off the loop, then goes the usual way
+        await asyncio.to_thread(
+            self.submit, payload["trigger"], payload["status"], payload["type"]
+        )
+
+    async def _mark_done(self, claim: Optional[str]):
+        if not claim:
+            return
+        try:
+            await self._redis.set(
+                REVALIDATE_DONE_KEY.format(claim=claim),
+                1,
+                ex=int(self.window + REVALIDATE_CLAIM_GRACE) * 2,
+            )
+        except Exception as e:
+            print(f"@@ERROR (revalidate done): {e}")
+
+    async def _send(self, payload: dict, attempts: int = 0):
+        self._pending.pop(_payload_key(payload), None)
+        claim = self._claims.pop(_payload_key(payload), None) if not attempts else None
+
+        try:
+            response = await self._client.post(
+                f"{FRONTEND_BASE_URL}/api/webhooks/revalidate",
+                json=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {SECRET_KEY}",
+                },
+            )
+            response.raise_for_status()
+
+            print(f"🔄 Revalidation triggered: {payload}")
+            await self._mark_done(claim)
+            return True
+
+        except Exception as e:
+            print(f"❌ Revalidation failed for {payload}: {e}")
+            # Parked in Redis, any process retries it: done for the followers
+            if await self._park(payload, attempts + 1):
+                await self._mark_done(claim)
+            return False
+
+    async def _park(self, payload: dict, attempts: int) -> bool:
+        if attempts >= REVALIDATE_MAX_ATTEMPTS:
+            print(f"❌ Revalidation dropped after {attempts} attempts: {payload}")
+            return True
+
+        backoff = min(REVALIDATE_MAX_BACKOFF, 2**attempts)
+        entry = {"payload": payload, "attempts": attempts, "next_at": time.time() + backoff}
+        try:
+            await self._redis.rpush(REVALIDATE_RETRY_KEY, json.dumps(entry))
+            return True
+        except Exception as e:
+            print(f"@@ERROR (revalidate retry): {e}")
+            return False
+
+    async def _retry_loop(self):
+        while True:
+            await asyncio.sleep(REVALIDATE_RETRY_INTERVAL)
+            try:
+                await self._retry_due()
+            except Exception as e:
+                print(f"@@ERROR (revalidate retry): {e}")
+
+    async def _retry_due(self):
+        # LPOP is atomic, so several processes can share the list safely
+        for _ in range(await self._redis.llen(REVALIDATE_RETRY_KEY)):
+            raw = await self._redis.lpop(REVALIDATE_RETRY_KEY)
+            if not raw:
+                break
+
+            entry = json.loads(raw)
+            if entry["next_at"] > time.time():
+                await self._redis.rpush(REVALIDATE_RETRY_KEY, raw)
+                continue
+
+            await self._send(entry["payload"], entry["attempts"])
+
+    async def _flush(self):
+        for handle in list(self._pending.values()):
+            handle.cancel()
+
+        payloads = [
+            {"trigger": t, "status": s, "type": ty} for (t, s, ty) in self._pending
+        ]
+        await asyncio.gather(*(self._send(p) for p in payloads))
+
+    def flush(self, timeout: float = 10):
+        """
+        Sends pending events right away, called on process exit.
+        """
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+
+        future = asyncio.run_coroutine_threadsafe(self._flush(), self._loop)
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            print(f"@@ERROR (revalidate flush): {e}")
+
+
+dispatcher = RevalidationDispatcher()
+atexit.register(dispatcher.flush)
+
+
+def revalidate(trigger: str, status: str, type: str):
+    """
+    Send revalidation request to Next.js /api/webhooks/revalidate/route.ts
+    Non-blocking: the request is coalesced and sent by the dispatcher thread.
+    """
+    with tracing.span("revalidate", trigger=trigger, status=status, type=type):
+        return dispatcher.submit(trigger, status, type)
@@ -1,41 +1,137 @@
+from lib.rate_limit import RateLimiter, RateLimitedError, call_with_rate_limit, _parse_retry_after
+from lib.cache import RedisCache, cache_key
+from lib import cassette, tracing
 from langchain.tools import tool
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+from typing import Type
 import requests
 import json
+import re
 import os
 
 
+SERPER_BASE_URL = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+
+# News goes stale fast, keep search results for a few hours only
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(60 * 60 * 3)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+
+search_cache = RedisCache("cache:search", SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES)
+
+
+def normalize_query(query: str) -> str:
+    # "Pakistan  Floods!" and "pakistan floods" share one cache entry, but
+    # "C++" and "C", or "U.S." and "US", don't: + and # are kept, . and -
+    # inside a token too
+    query = re.sub(r"[^\w\s+#.\-]", " ", str(query).lower())
+    tokens = (token.strip(".-") for token in query.split())
+    return " ".join(token for token in tokens if token)
+
+
+def serper_search(query: str, n_results: int = 10) -> dict:
+    """
+    Searches google.serper.dev, results are cached by normalized query.
+    """
+    with tracing.span("serper.search", query=query, n_results=n_results):
+        return cassette.exchange(
+            "search",
+            {"q": query, "num": n_results},
+            lambda: _cached_serper_search(query, n_results),
+        )
+
+
+def _cached_serper_search(query: str, n_results: int) -> dict:
+    key = cache_key(normalize_query(query), n_results)
+
+    cached = search_cache.get(key)
+    tracing.set_attributes(cached=cached is not None)
+    if cached is not None:
+        return json.loads(cached)
+
+    def post():
+        response = requests.post(
+            f"{SERPER_BASE_URL}/search",
+            headers={
+                "X-API-KEY": os.environ["SERPER_API_KEY"],
+                "content-type": "application/json",
+            },
+            data=json.dumps({"q": query, "num": n_results}),
+            timeout=30,
+        )
+        if response.status_code == 429:
+            # Seconds or an HTTP-date, None falls back to the default backoff
+            raise RateLimitedError(
+                "Serper rate limited",
+                _parse_retry_after(response.headers.get("retry-after")),
+            )
+        return response.json()
+
+    limiter = RateLimiter("serper", os.environ["SERPER_API_KEY"])
+    results = call_with_rate_limit(limiter, post)
+
+    # Don't cache errors or empty pages
+    if results.get("organic"):
+        search_cache.set(key, json.dumps(results).encode("utf-8"))
+
+    return results
+
+
+def format_results(results: dict, top_result_to_return: int) -> str:
+    string = []
+    for result in results.get("organic", [])[:top_result_to_return]:
+        try:
+            string.append(
+                "\n".join(
+                    [
+                        f"Title: {result['title']}",
+                        f"Link: {result['link']}",
+                        f"Snippet: {result['snippet']}",
+                        "\n-----------------",
+                    ]
+                )
+            )
+        except KeyError:
+            next
+
+    return "\n".join(string)
+
+
+class SearchQuery(BaseModel):
+    search_query: str = Field(
+        ..., description="Mandatory search query you want to use to search the internet"
+    )
+
+
+class CachedSerperSearchTool(BaseTool):
+    """
+    Drop-in replacement for crewai_tools.SerperDevTool with a shared cache.
+    """
+
+    name: str = "Search the internet"
+    description: str = (
+        "A tool that can be used to search the internet with a search_query."
+    )
+    args_schema: Type[BaseModel] = SearchQuery
+    n_results: int = 10
+
+    def _run(self, search_query: str) -> str:
+        results = serper_search(search_query, self.n_results)
+        if "organic" not in results:
+            return "Sorry, I couldn't find anything about that, there could be an error with your serper api key."
+
+        return format_results(results, self.n_results)
+
+
 class SearchTools:
     @tool("Search the internet")
     def search_internet(query):
         """Useful to search the internet
         about a a given topic and return relevant results"""
         top_result_to_return = 4
-        url = "https://google.serper.dev/search"
-        payload = json.dumps({"q": query})
-        headers = {
-            "X-API-KEY": os.environ["SERPER_API_KEY"],
-            "content-type": "application/json",
-        }
-        response = requests.request("POST", url, headers=headers, data=payload)
+        results = serper_search(query)
         # check if there is an organic key
-        if "organic" not in response.json():
+        if "organic" not in results:
             return "Sorry, I couldn't find anything about that, there could be an error with your serper api key."
         else:
-            results = response.json()["organic"]
-            string = []
-            for result in results[:top_result_to_return]:
-                try:
-                    string.append(
-                        "\n".join(
-                            [
-                                f"Title: {result['title']}",
-                                f"Link: {result['link']}",
-                                f"Snippet: {result['snippet']}",
-                                "\n-----------------",
-                            ]
-                        )
-                    )
-                except KeyError:
-                    next
-
-            return "\n".join(string)
+            return format_results(results, top_result_to_return)
@@ -0,0 +1,164 @@
+from lib.topic_index import minhash, similarity, topic_text, shingles
+from typing import Dict, List, Optional, Tuple
+import re
+import os
+
+
+# Stories of one multi-category research pass that are at least this similar
+# are the same story, covered once under the best matching category
+CROSS_CATEGORY_DUPLICATE_THRESHOLD = float(
+    os.getenv("CROSS_CATEGORY_DUPLICATE_THRESHOLD", "0.4")
+)
+
+# Keyword hits per category slug. Category names and descriptions from the
+# database are added on top, so new categories work without an entry here.
+# All-caps keywords are acronyms, matched case-sensitively ("WHO", not "who").
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "pakistan": [
+        "pakistan", "pakistani", "islamabad", "lahore", "karachi", "peshawar",
+        "quetta", "rawalpindi", "punjab", "sindh", "balochistan", "khyber",
+        "pakhtunkhwa", "gilgit", "kashmir", "pti", "pml", "ppp", "imran khan",
+        "shehbaz", "nawaz", "sharif", "bhutto", "zardari", "ispr", "nadra",
+        "sbp", "pkr",
+    ],
+    "politics": [
+        "election", "elections", "parliament", "senate", "congress", "minister",
+        "president", "prime minister", "government", "opposition", "party",
+        "vote", "voting", "bill", "cabinet", "coalition", "campaign", "lawmakers",
+        "policy", "supreme court", "constitution", "protest", "sanctions",
+    ],
+    "international": [
+        "united nations", "un", "nato", "ukraine", "russia", "china", "gaza",
+        "israel", "iran", "india", "afghanistan", "saudi", "europe", "eu",
+        "summit", "ceasefire", "war", "diplomatic", "foreign", "global",
+        "border", "refugees",
+    ],
+    "business": [
+        "market", "markets", "stocks", "shares", "economy", "economic",
+        "inflation", "interest rate", "bank", "imf", "gdp", "trade", "tariff",
+        "tariffs", "earnings", "revenue", "profit", "investment", "investors",
+        "oil", "prices", "budget", "exports", "imports", "company", "merger",
+    ],
+    "technology": [
+        "ai", "artificial intelligence", "openai", "google", "apple",
+        "microsoft", "meta", "nvidia", "chip", "chips", "software", "app",
+        "smartphone", "iphone", "android", "cyber", "hack", "startup", "tech",
+        "robot", "satellite", "spacex", "crypto", "bitcoin", "data",
+    ],
+    "sports": [
+        "cricket", "football", "soccer", "match", "tournament", "cup", "league",
+        "olympics", "tennis", "hockey", "squash", "pcb", "icc", "fifa", "psl",
+        "ipl", "wicket", "goal", "championship", "coach", "player", "players",
+        "team", "series", "final", "score",
+    ],
+    "entertainment": [
+        "film", "movie", "box office", "actor", "actress", "singer", "music",
+        "album", "song", "drama", "series", "netflix", "hollywood", "bollywood",
+        "lollywood", "celebrity", "concert", "award", "awards", "oscar",
+        "trailer", "show", "tv",
+    ],
+    "health": [
+        "health", "hospital", "disease", "virus", "outbreak", "vaccine",
+        "polio", "dengue", "covid", "cancer", "WHO", "world health", "doctors", "patients",
+        "medicine", "drug", "mental health", "diabetes", "heatwave", "study",
+    ],
+    "anime": [
+        "anime", "manga", "crunchyroll", "studio", "season", "episode",
+        "one piece", "naruto", "demon slayer", "jujutsu kaisen", "ghibli",
+        "shonen", "cosplay", "otaku",
+    ],
+}
+
+# Weight of the category the researcher itself suggested for a story
+SUGGESTED_CATEGORY_WEIGHT = 2
+
+
+def _category_terms(category: dict) -> set:
+    slug = category.get("slug") or ""
+    terms = {k for k in CATEGORY_KEYWORDS.get(slug, []) if not k.isupper()}
+    terms |= shingles(
+        f"{slug} {category.get('name') or ''} {category.get('description') or ''}"
+    )
+    return terms
+
+
+def _category_acronyms(category: dict) -> set:
+    return {k for k in CATEGORY_KEYWORDS.get(category.get("slug") or "", []) if k.isupper()}
+
+
+def _best_category(topic: dict, categories: List[dict]) -> Tuple[Optional[dict], int]:
+    text = topic_text(topic)
+    tokens = shingles(text)
+    words = set(re.findall(r"[A-Za-z0-9]+", text))
+    suggested = (topic.get("category") or "").strip().lower()
+
+    best, best_score = None, 0
+    for category in categories:
+        score = len(tokens & _category_terms(category))
+        score += len(words & _category_acronyms(category))
+        if suggested and suggested in (
+            (category.get("slug") or "").lower(),
+            (category.get("name") or "").lower(),
+        ):
+            score += SUGGESTED_CATEGORY_WEIGHT
+
+        if score > best_score:
+            best, best_score = category, score
+
+    return best, best_score
+
+
+def classify(topic: dict, categories: List[dict]) -> Optional[dict]:
+    """
+    Assigns a story to the category whose keywords it matches most, the
+    researcher's suggestion breaks ties and counts as extra hits. None when
+    no category matches at all.
+    """
+    return _best_category(topic, categories)[0]
+
+
+def classify_and_dedup(
+    topics: List[dict], categories: List[dict]
+) -> Dict[int, List[dict]]:
+    """
+    Groups the stories of a multi-category pass by category id. Of stories
+    that are near-duplicates, in any category, only the copy that matches its
+    category best is kept, in the position of the first one.
+    """
+    # [signature, category, score, topic] per kept story
+    kept = []
+
+    for topic in topics:
+        category, score = _best_category(topic, categories)
+        if category is None:
+            print(f"Dropped story matching no category: {topic.get('title')}")
+            continue
+
+        signature = minhash(topic_text(topic))
+        duplicate = None
+        if signature is not None:
+            duplicate = next(
+                (
+                    entry
+                    for entry in kept
+                    if entry[0] is not None
+                    and similarity(signature, entry[0]) >= CROSS_CATEGORY_DUPLICATE_THRESHOLD
+                ),
+                None,
+            )
+
+        if duplicate is None:
+            kept.append([signature, category, score, topic])
+        elif score > duplicate[2]:
+            print(f"Dropped cross-category duplicate: {duplicate[3].get('title')}")
+            duplicate[:] = [signature, category, score, topic]
+        else:
+            print(f"Dropped cross-category duplicate: {topic.get('title')}")
+
+    grouped: Dict[int, List[dict]] = {category["id"]: [] for category in categories}
+    for _, category, _, topic in kept:
+        grouped[category["id"]].append(
+            {k: v for k, v in topic.items() if k != "category"}
+        )
+
+    return grouped
@@ -0,0 +1,229 @@
+from lib.redis_conn import get_redis
+from prisma import Prisma
+from typing import Dict, List, Optional
+from array import array
+import hashlib
+import re
+import os
+
+
+# MinHash signatures of every stored topic (title + summary), one index per
+# category, with LSH bands in Redis so a lookup only compares a handful of
+# candidates instead of the whole history. Members are topic ids. v1 keyed
+# new topics by a hash of their title, its indexes are rebuilt under v2.
+TOPIC_INDEX_PREFIX = "topic-index:v2:{categoryId}"
+MINHASH_BANDS = 20
+MINHASH_ROWS = 3
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+
+# Estimated Jaccard similarity from which a topic counts as a duplicate
+TOPIC_DUPLICATE_THRESHOLD = float(os.getenv("TOPIC_DUPLICATE_THRESHOLD", "0.4"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seeds, signatures must stay comparable across processes and deploys
+_PERMUTATIONS = [
+    (
+        int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME or 1,
+        int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME,
+    )
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has",
+    "in", "is", "it", "its", "of", "on", "or", "that", "the", "to", "was",
+    "were", "will", "with", "after", "over", "amid", "new",
+}
+
+
+def shingles(text: str) -> set:
+    """
+    Word unigrams and bigrams of the normalized text, without stopwords.
+    Unigrams keep short paraphrased titles comparable.
+    """
+    words = [
+        w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if w not in _STOPWORDS
+    ]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    tokens = shingles(text)
+    if not tokens:
+        return None
+
+    hashes = [
+        int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=4).digest(), "big")
+        for t in tokens
+    ]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / MINHASH_PERMUTATIONS
+
+
+def _bands(signature: List[int]) -> List[str]:
+    return [
+        hashlib.blake2b(
+            array("I", signature[i * MINHASH_ROWS : (i + 1) * MINHASH_ROWS]).tobytes(),
+            digest_size=8,
+        ).hexdigest()
+        for i in range(MINHASH_BANDS)
+    ]
+
+
+def topic_text(topic: dict) -> str:
+    return f"{topic.get('title') or ''} {topic.get('summary') or ''}"
+
+
+class TopicIndex:
+    """
+    Near-duplicate index over stored topics, per category.
+    Bootstrapped from the Topic table the first time a category is used.
+    """
+
+    def _prefix(self, categoryId: int) -> str:
+        return TOPIC_INDEX_PREFIX.format(categoryId=categoryId)
+
+    def _add(self, pipe, categoryId: int, member: str, signature: List[int]):
+        prefix = self._prefix(categoryId)
+        pipe.hset(f"{prefix}:sigs", member, array("I", signature).tobytes())
+        for band, bucket in enumerate(_bands(signature)):
+            pipe.sadd(f"{prefix}:band:{band}:{bucket}", member)
+
+    async def ensure(self, db: Prisma, categoryId: int):
+        redis_conn = get_redis()
+        if redis_conn.exists(f"{self._prefix(categoryId)}:ready"):
+            return
+
+        topics = await db.topic.find_many(where={"categoryId": categoryId})
+        pipe = redis_conn.pipeline(transaction=False)
+        for topic in topics:
+            signature = minhash(topic_text({"title": topic.title, "summary": topic.summary}))
+            if signature:
+                self._add(pipe, categoryId, str(topic.id), signature)
+        pipe.set(f"{self._prefix(categoryId)}:ready", 1)
+        pipe.execute()
+
+        print(f"Topic index bootstrapped with {len(topics)} topics for category {categoryId}")
+
+    def _match(self, categoryId: int, signature: List[int]) -> Dict[str, float]:
+        """
+        Similarity of the indexed topics sharing a band with the signature.
+        """
+        prefix = self._prefix(categoryId)
+        redis_conn = get_redis()
+
+        pipe = redis_conn.pipeline(transaction=False)
+        for band, bucket in enumerate(_bands(signature)):
+            pipe.smembers(f"{prefix}:band:{band}:{bucket}")
+        candidates = list(set().union(*pipe.execute()))
+        if not candidates:
+            return {}
+
+        scores = {}
+        for member, blob in zip(candidates, redis_conn.hmget(f"{prefix}:sigs", candidates)):
+            if blob:
+                stored = array("I")
+                stored.frombytes(blob)
+                scores[member.decode()] = similarity(signature, stored.tolist())
+        return scores
+
+    async def _existing(self, db: Prisma, categoryId: int, members: List[str]) -> set:
+        # Topics deleted without remove() (e.g. cascaded from their job) are
+        # dropped from the index the first time they match
+        ids = [int(m) for m in members if m.isdigit()]
+        rows = await db.topic.find_many(where={"id": {"in": ids}}) if ids else []
+        existing = {str(row.id) for row in rows}
+
+        stale = [int(m) for m in members if m not in existing and m.isdigit()]
+        if stale:
+            self.remove(categoryId, stale)
+        return existing
+
+    async def filter_new(
+        self, db: Prisma, categoryId: int, topics: List[dict]
+    ) -> List[dict]:
+        """
+        Drops topics that are near-duplicates of stored topics of the category
+        or of an earlier topic of the same batch.
+        """
+        try:
+            await self.ensure(db, categoryId)
+        except Exception as e:
+            print(f"@@ERROR (topic index {categoryId}): {e}")
+            return topics
+
+        kept, kept_signatures = [], []
+        for topic in topics:
+            signature = minhash(topic_text(topic))
+            if signature is None:
+                kept.append(topic)
+                continue
+
+            try:
+                scores = self._match(categoryId, signature)
+                duplicates = [m for m, sc in scores.items() if sc >= TOPIC_DUPLICATE_THRESHOLD]
+                existing = await self._existing(db, categoryId, duplicates) if duplicates else set()
+                score = max([sc for m, sc in scores.items() if m in existing] + [0.0])
+            except Exception as e:
+                print(f"@@ERROR (topic index {categoryId}): {e}")
+                score = 0.0
+
+            score = max([score] + [similarity(signature, s) for s in kept_signatures])
+            if score >= TOPIC_DUPLICATE_THRESHOLD:
+                print(f"Dropped duplicate topic ({score:.2f}): {topic.get('title')}")
+                continue
+
+            kept.append(topic)
+            kept_signatures.append(signature)
+
+        return kept
+
+    def add(self, categoryId: int, topics: list):
+        """
+        Indexes topics that were just stored, Topic rows as returned by
+        job_state.topics_completed.
+        """
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for topic in topics:
+                signature = minhash(topic_text({"title": topic.title, "summary": topic.summary}))
+                if signature:
+                    self._add(pipe, categoryId, str(topic.id), signature)
+            pipe.execute()
+        except Exception as e:
+            print(f"@@ERROR (topic index {categoryId}): {e}")
+
+    def remove(self, categoryId: int, topicIds: List[int]):
+        """
+        Drops deleted topics from the index of their category.
+        """
+        if not topicIds:
+            return
+
+        prefix = self._prefix(categoryId)
+        members = [str(topicId) for topicId in topicIds]
+        try:
+            redis_conn = get_redis()
+            pipe = redis_conn.pipeline(transaction=False)
+            for member, blob in zip(members, redis_conn.hmget(f"{prefix}:sigs", members)):
+                if not blob:
+                    continue
+                stored = array("I")
+                stored.frombytes(blob)
+                for band, bucket in enumerate(_bands(stored.tolist())):
+                    pipe.srem(f"{prefix}:band:{band}:{bucket}", member)
+            pipe.hdel(f"{prefix}:sigs", *members)
+            pipe.execute()
+        except Exception as e:
+            print(f"@@ERROR (topic index {categoryId}): {e}")
+
+
+topic_index = TopicIndex()
@@ -0,0 +1,249 @@
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import functools
+import threading
+import secrets
+import json
+import time
+import os
+
+
+# Per-job spans (crew kickoff, tasks, LLM and tool calls, embeddings,
+# revalidation, DB writes), exported as OTLP/JSON when the job ends:
+# TRACING_EXPORTER=file appends one ExportTraceServiceRequest per line to
+# TRACING_FILE, TRACING_EXPORTER=otlp posts it to the collector's /v1/traces.
+# Off by default, every helper below is a no-op without a job trace.
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "").lower()
+TRACING_FILE = os.getenv("TRACING_FILE", "traces/spans.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "news-worker")
+
+# Bounds memory for runaway jobs, later spans are dropped
+TRACING_MAX_SPANS = int(os.getenv("TRACING_MAX_SPANS", "5000"))
+
+
+def _attribute(key: str, value) -> dict:
+    value = getattr(value, "value", value)
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        # int64 is a string in proto3 JSON
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            # SPAN_KIND_INTERNAL
+            "kind": 1,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end or time.time_ns()),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+# The job currently traced by this worker process. A module global and not a
+# contextvar: crewai runs async_execution tasks in threads. Each thread keeps
+# its own stack of open spans, event bus spans (tasks, tools) are shared.
+_lock = threading.Lock()
+_job: Dict[str, object] = {"root": None, "spans": [], "open": {}}
+_local = threading.local()
+
+
+def _stack() -> List[Span]:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _parent() -> Optional[Span]:
+    # The most recent of this thread's innermost span and the latest task or
+    # tool span opened by an event bus callback, else the root
+    stack = _stack()
+    with _lock:
+        opened = list(_job["open"].values())
+
+    candidates = stack[-1:] + opened[-1:]
+    if not candidates:
+        return _job["root"]
+    return max(candidates, key=lambda s: s.start)
+
+
+def _finish(span: Span):
+    span.end = time.time_ns()
+    with _lock:
+        if len(_job["spans"]) < TRACING_MAX_SPANS:
+            _job["spans"].append(span)
+
+
+def start_job(name: str, jobId: int, **attributes) -> Optional[str]:
+    """
+    Opens the root span of a job, returns its trace id.
+    """
+    if TRACING_EXPORTER not in ("file", "otlp"):
+        return None
+
+    root = Span(secrets.token_hex(16), None, name, {"job.id": jobId, **attributes})
+    with _lock:
+        _job["root"], _job["spans"], _job["open"] = root, [], {}
+    _local.stack = []
+    return root.trace_id
+
+
+def annotate_job(**attributes):
+    """
+    Adds attributes to the job's root span, e.g. its token usage.
+    """
+    root = _job["root"]
+    if root is not None:
+        root.set(**attributes)
+
+
+def end_job(error: Optional[str] = None):
+    """
+    Closes the root span and exports every span of the job in one request.
+    """
+    root = _job["root"]
+    if root is None:
+        return
+
+    root.error = error
+    _finish(root)
+    with _lock:
+        spans, _job["root"], _job["spans"], _job["open"] = _job["spans"], None, [], {}
+
+    try:
+        export(spans)
+    except Exception as e:
+        print(f"@@ERROR (tracing export): {e}")
+
+
+def export(spans: List[Span]):
+    request = {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_attribute("service.name", TRACING_SERVICE_NAME)]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "lib.tracing"},
+                        "spans": [span.otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+    if TRACING_EXPORTER == "file":
+        os.makedirs(os.path.dirname(TRACING_FILE) or ".", exist_ok=True)
+        with open(TRACING_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request) + "\n")
+        return
+
+    import httpx
+
+    httpx.post(f"{OTLP_ENDPOINT.rstrip('/')}/v1/traces", json=request, timeout=5).raise_for_status()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times the block as a child of the innermost open span of this thread.
+    Yields the span, attributes known only at the end go through .set().
+    """
+    parent = _parent()
+    if parent is None:
+        yield _NOOP
+        return
+
+    current = Span(parent.trace_id, parent.span_id, name, attributes)
+    stack = _stack()
+    stack.append(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.remove(current)
+        _finish(current)
+
+
+def set_attributes(**attributes):
+    """
+    Adds attributes to the innermost open span of this thread.
+    """
+    stack = _stack()
+    if stack:
+        stack[-1].set(**attributes)
+
+
+def start_span(key, name: str, **attributes):
+    """
+    Opens a span closed later by end_span(key), for start/end callbacks
+    such as crewai's event bus.
+    """
+    if _job["root"] is None:
+        return
+
+    parent = _parent()
+    with _lock:
+        _job["open"][key] = Span(parent.trace_id, parent.span_id, name, attributes)
+
+
+def end_span(key, error: Optional[str] = None, **attributes):
+    with _lock:
+        current = _job["open"].pop(key, None)
+    if current is None:
+        return
+
+    current.set(**attributes)
+    current.error = error
+    _finish(current)
+
+
+def traced(name: str):
+    """
+    Decorator, runs an async function inside a span named `name`.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,274 @@
+from prisma import Prisma
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta, timezone
+import argparse
+import asyncio
+
+
+# Incremental daily rollup of token usage, see the UsageRollup model.
+# Every job adds its usage on the same Prisma batch as its UsageMetric row,
+# so the rollup never drifts from the raw rows, and dashboards read one row
+# per (day, model) instead of scanning UsageMetric.
+ALL_MODELS = "*"
+
+# Widest range GET /usage answers in one request
+USAGE_MAX_DAYS = 366
+
+_FIELDS = [
+    "promptTokens",
+    "completionTokens",
+    "totalTokens",
+    "successfulRequests",
+    "cacheHits",
+    "cachedTokens",
+    "jobs",
+]
+
+UPSERT_ROLLUP = """
+INSERT INTO "UsageRollup" ("day", "trigger", "categoryId", "model", "promptTokens",
+    "completionTokens", "totalTokens", "successfulRequests", "cacheHits",
+    "cachedTokens", "jobs", "updatedAt")
+SELECT $1::date, $2::"TRIGGER", j."categoryId", m.model, m.prompt, m.completion,
+    m.prompt + m.completion, m.requests, m.cache_hits, m.cached_tokens, m.jobs, NOW()
+FROM "Job" j,
+    unnest($4::text[], $5::int[], $6::int[], $7::int[], $8::int[], $9::int[], $10::int[])
+    AS m(model, prompt, completion, requests, cache_hits, cached_tokens, jobs)
+WHERE j."id" = $3
+ON CONFLICT ("day", "trigger", "categoryId", "model") DO UPDATE SET
+    "promptTokens" = "UsageRollup"."promptTokens" + EXCLUDED."promptTokens",
+    "completionTokens" = "UsageRollup"."completionTokens" + EXCLUDED."completionTokens",
+    "totalTokens" = "UsageRollup"."totalTokens" + EXCLUDED."totalTokens",
+    "successfulRequests" = "UsageRollup"."successfulRequests" + EXCLUDED."successfulRequests",
+    "cacheHits" = "UsageRollup"."cacheHits" + EXCLUDED."cacheHits",
+    "cachedTokens" = "UsageRollup"."cachedTokens" + EXCLUDED."cachedTokens",
+    "jobs" = "UsageRollup"."jobs" + EXCLUDED."jobs",
+    "updatedAt" = NOW()
+"""
+
+# Rebuilds the "*" rows from UsageMetric. Idempotent, rows are overwritten.
+# Per-model rows can't be backfilled, history only has job totals.
+BACKFILL_ROLLUP = """
+INSERT INTO "UsageRollup" ("day", "trigger", "categoryId", "model", "promptTokens",
+    "completionTokens", "totalTokens", "successfulRequests", "cacheHits",
+    "cachedTokens", "jobs", "updatedAt")
+SELECT u."date"::date, u."trigger", j."categoryId", $2,
+    SUM(u."promptTokens"), SUM(u."completionTokens"), SUM(u."totalTokens"),
+    SUM(u."successfulRequests"), SUM(u."cacheHits"), SUM(u."cachedTokens"),
+    COUNT(*), NOW()
+FROM "UsageMetric" u
+JOIN "Job" j ON j."id" = u."jobId"
+WHERE u."date" >= $1::timestamp
+GROUP BY 1, 2, 3
+ON CONFLICT ("day", "trigger", "categoryId", "model") DO UPDATE SET
+    "promptTokens" = EXCLUDED."promptTokens",
+    "completionTokens" = EXCLUDED."completionTokens",
+    "totalTokens" = EXCLUDED."totalTokens",
+    "successfulRequests" = EXCLUDED."successfulRequests",
+    "cacheHits" = EXCLUDED."cacheHits",
+    "cachedTokens" = EXCLUDED."cachedTokens",
+    "jobs" = EXCLUDED."jobs",
+    "updatedAt" = NOW()
+"""
+
+USAGE_QUERY = """
+SELECT "day", "model",
+    SUM("promptTokens")::int AS "promptTokens",
+    SUM("completionTokens")::int AS "completionTokens",
+    SUM("totalTokens")::int AS "totalTokens",
+    SUM("successfulRequests")::int AS "successfulRequests",
+    SUM("cacheHits")::int AS "cacheHits",
+    SUM("cachedTokens")::int AS "cachedTokens",
+    SUM("jobs")::int AS "jobs"
+FROM "UsageRollup"
+WHERE "day" BETWEEN $1::date AND $2::date
+    AND ($3::int IS NULL OR "categoryId" = $3::int)
+    AND ($4::text IS NULL OR "trigger"::text = $4::text)
+GROUP BY "day", "model"
+ORDER BY "day", "model"
+"""
+
+
+def _split(total: int, weights: Dict[str, int]) -> Dict[str, int]:
+    """
+    Splits total in proportion to weights, the rounding remainder goes to
+    the heaviest model so the parts add up to the total.
+    """
+    weight_sum = sum(weights.values())
+    if not weight_sum:
+        return {model: 0 for model in weights}
+
+    parts = {model: total * weight // weight_sum for model, weight in weights.items()}
+    heaviest = max(weights, key=weights.get)
+    parts[heaviest] += total - sum(parts.values())
+    return parts
+
+
+def split_usage(usage: dict, weights: Dict[int, int]) -> Dict[int, dict]:
+    """
+    Splits one run's usage (clean_usage_tokens() merged with the LLM stats)
+    across the jobs that share it, e.g. the categories of a multi-category
+    research pass by their number of stories. Every count, per-model ones
+    included, adds up to the run's total. Equal shares when all weights are 0.
+    """
+    if not any(weights.values()):
+        weights = {key: 1 for key in weights}
+
+    shares = {key: {"date": usage.get("date")} for key in weights}
+    for field, value in usage.items():
+        if isinstance(value, int) and not isinstance(value, bool):
+            for key, part in _split(value, weights).items():
+                shares[key][field] = part
+
+    for model, stats in (usage.get("models") or {}).items():
+        for field, value in stats.items():
+            for key, part in _split(value, weights).items():
+                shares[key].setdefault("models", {}).setdefault(model, {})[field] = part
+
+    # Rounding must not make a share's total disagree with its parts
+    prompt, completion = usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    if usage.get("total_tokens") == prompt + completion:
+        for share in shares.values():
+            share["total_tokens"] = share["prompt_tokens"] + share["completion_tokens"]
+
+    return shares
+
+
+def rollup_rows(usage_data: dict, usage: dict) -> List[list]:
+    """
+    [model, prompt, completion, requests, cache hits, cached tokens, jobs]
+    rows for one job: the "*" row with the job's UsageMetric totals, then the
+    totals split by model in proportion to the locally counted tokens
+    (usage["models"], from lib.llm.llm_usage_by_model).
+    """
+    rows = [
+        [
+            ALL_MODELS,
+            usage_data["promptTokens"] or 0,
+            usage_data["completionTokens"] or 0,
+            usage_data["successfulRequests"] or 0,
+            usage_data["cacheHits"] or 0,
+            usage_data["cachedTokens"] or 0,
+            1,
+        ]
+    ]
+
+    models = usage.get("models") or {}
+    if not models:
+        return rows
+
+    prompt = _split(rows[0][1], {m: s.get("prompt_tokens", 0) for m, s in models.items()})
+    completion = _split(rows[0][2], {m: s.get("completion_tokens", 0) for m, s in models.items()})
+    for model, stats in sorted(models.items()):
+        rows.append(
+            [
+                model,
+                prompt[model],
+                completion[model],
+                stats.get("requests", 0),
+                stats.get("cache_hits", 0),
+                stats.get("cached_tokens", 0),
+                1,
+            ]
+        )
+
+    return rows
+
+
+def queue_rollup(batcher, usage_data: dict, usage: dict):
+    """
+    Adds the job's usage to its rollup rows on the job's completion batch.
+    usage_data is the UsageMetric create data from job_state.usage_metric_data.
+    """
+    rows = rollup_rows(usage_data, usage)
+    columns = list(zip(*rows))
+    day = str(usage_data["date"])[:10]
+
+    batcher.execute_raw(
+        UPSERT_ROLLUP,
+        day,
+        str(getattr(usage_data["trigger"], "value", usage_data["trigger"])),
+        usage_data["jobId"],
+        *[list(column) for column in columns],
+    )
+
+
+async def backfill(db: Prisma, since: Optional[date] = None) -> int:
+    """
+    Rebuilds the "*" rollup rows from UsageMetric, from `since` (default all
+    history). Run it when no jobs are completing: a job that commits while
+    the statement runs may be left out of its day until the next backfill.
+    """
+    since = since or date(1970, 1, 1)
+    return await db.execute_raw(BACKFILL_ROLLUP, since.isoformat(), ALL_MODELS)
+
+
+async def usage_report(
+    db: Prisma,
+    start: date,
+    end: date,
+    categoryId: Optional[int] = None,
+    trigger: Optional[str] = None,
+) -> dict:
+    """
+    Daily buckets between start and end (inclusive) with the totals and the
+    per-model split, plus the totals of the whole range.
+    """
+    rows = await db.query_raw(
+        USAGE_QUERY,
+        start.isoformat(),
+        end.isoformat(),
+        categoryId,
+        str(getattr(trigger, "value", trigger)) if trigger else None,
+    )
+
+    days: Dict[str, dict] = {}
+    total = {field: 0 for field in _FIELDS}
+    models: Dict[str, dict] = {}
+
+    for row in rows:
+        day = str(row["day"])[:10]
+        bucket = days.setdefault(
+            day, {"day": day, **{field: 0 for field in _FIELDS}, "models": {}}
+        )
+        values = {field: row[field] or 0 for field in _FIELDS}
+
+        if row["model"] == ALL_MODELS:
+            bucket.update(values)
+            for field in _FIELDS:
+                total[field] += values[field]
+            continue
+
+        bucket["models"][row["model"]] = values
+        model_total = models.setdefault(row["model"], {field: 0 for field in _FIELDS})
+        for field in _FIELDS:
+            model_total[field] += values[field]
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total": {**total, "models": models},
+        "days": list(days.values()),
+    }
+
+
+def default_range(days: int = 30):
+    end = datetime.now(timezone.utc).date()
+    return end - timedelta(days=days - 1), end
+
+
+async def _backfill_command(since: Optional[date]):
+    db = Prisma()
+    await db.connect()
+    try:
+        count = await backfill(db, since)
+        print(f"✅ Backfilled {count} usage rollup rows")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the UsageRollup totals from UsageMetric")
+    parser.add_argument("--since", type=date.fromisoformat, help="YYYY-MM-DD, default all history")
+    args = parser.parse_args()
+
+    asyncio.run(_backfill_command(args.since))
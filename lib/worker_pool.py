@@ -0,0 +1,194 @@
+from multiprocessing import Process
+from typing import Dict, Tuple
+from lib.queues import worker_queue_names, worker_class, queue_stats
+from rq import Worker, Queue
+from lib.db import close_db
+from redis import Redis
+from uuid import uuid4
+import signal
+import socket
+import time
+import os
+
+
+# Number of worker processes, defaults to the number of CPU cores
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES") or os.cpu_count() or 1)
+
+# How often (seconds) the supervisor prints busy/idle state of its children
+WORKER_STATUS_INTERVAL = int(os.getenv("WORKER_STATUS_INTERVAL", "30"))
+
+# How long to wait for children to finish their current job on SIGTERM.
+# Article jobs run with job_timeout=60 * 10, so give them a little more.
+WORKER_SHUTDOWN_TIMEOUT = int(os.getenv("WORKER_SHUTDOWN_TIMEOUT", str(60 * 10 + 30)))
+
+# Seconds to wait after a child exited before restarting its slot, avoids crash loops.
+# Doubles for every consecutive crash of a child that ran less than
+# WORKER_RESTART_MAX_DELAY, up to WORKER_RESTART_MAX_DELAY.
+WORKER_RESTART_DELAY = int(os.getenv("WORKER_RESTART_DELAY", "5"))
+WORKER_RESTART_MAX_DELAY = int(os.getenv("WORKER_RESTART_MAX_DELAY", "300"))
+
+
+def run_worker(name: str, burst: bool = False):
+    """
+    Entry point of a single worker process.
+    Every child opens its own Redis connection, sockets must not be shared across fork.
+    SimpleWorker runs jobs in this process instead of forking a work horse
+    per job, so the worker-lifetime Prisma client in lib.db is reused.
+    With burst=True the worker exits once the queues are empty.
+    """
+    redis_conn = Redis.from_url(os.getenv("REDIS_URL"))
+    queues = [Queue(n, connection=redis_conn) for n in worker_queue_names()]
+    worker = worker_class()(queues, connection=redis_conn, name=name)
+
+    # RQ installs its own SIGTERM/SIGINT handlers: first signal is a warm
+    # shutdown (finish current job), second one is a cold shutdown.
+    try:
+        worker.work(burst=burst)
+    finally:
+        close_db()
+
+
+class WorkerSupervisor:
+    def __init__(
+        self,
+        num_workers: int = WORKER_PROCESSES,
+        status_interval: int = WORKER_STATUS_INTERVAL,
+        shutdown_timeout: int = WORKER_SHUTDOWN_TIMEOUT,
+        restart_delay: int = WORKER_RESTART_DELAY,
+        max_restart_delay: int = WORKER_RESTART_MAX_DELAY,
+    ):
+        self.num_workers = max(1, num_workers)
+        self.status_interval = status_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max(restart_delay, max_restart_delay)
+        self.redis_conn = Redis.from_url(os.getenv("REDIS_URL"))
+
+        # slot -> (process, rq worker name)
+        self.children: Dict[int, Tuple[Process, str]] = {}
+        self.started_at: Dict[int, float] = {}
+        # slot -> when its child was seen dead, and how many quick crashes in a row
+        self.exited_at: Dict[int, float] = {}
+        self.crashes: Dict[int, int] = {}
+        self.stopping = False
+
+    def _spawn(self, slot: int):
+        # RQ registers workers by name, so every (re)start gets a fresh one
+        name = f"{socket.gethostname()}.{os.getpid()}.{slot}.{uuid4().hex[:6]}"
+        process = Process(target=run_worker, args=(name,), name=name)
+        process.start()
+
+        self.children[slot] = (process, name)
+        self.started_at[slot] = time.monotonic()
+        print(f"🚀 Started worker {name} (pid {process.pid})")
+
+    def _handle_stop(self, signum, frame):
+        if not self.stopping:
+            print(f"🛑 Received signal {signum}, draining workers...")
+        self.stopping = True
+
+    def _restart_dead(self):
+        for slot, (process, name) in list(self.children.items()):
+            if process.is_alive():
+                continue
+
+            now = time.monotonic()
+            if slot not in self.exited_at:
+                process.join()
+                self.exited_at[slot] = now
+                # A child that ran for a while is not crash looping, start over
+                if now - self.started_at[slot] >= self.max_restart_delay:
+                    self.crashes[slot] = 0
+                self.crashes[slot] = self.crashes.get(slot, 0) + 1
+                delay = self._restart_delay(slot)
+                print(
+                    f"⚠️ Worker {name} exited with code {process.exitcode}, "
+                    f"restarting in {delay}s"
+                )
+
+            if now - self.exited_at[slot] < self._restart_delay(slot):
+                continue
+
+            del self.exited_at[slot]
+            self._spawn(slot)
+
+    def _restart_delay(self, slot: int) -> int:
+        # restart_delay, doubled for every further consecutive crash
+        crashes = self.crashes.get(slot, 1)
+        return min(self.restart_delay * 2 ** min(crashes - 1, 16), self.max_restart_delay)
+
+    def _drain(self):
+        # Warm shutdown: every child finishes its current job, then exits
+        for process, _ in self.children.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process, _ in self.children.values():
+            process.join(timeout=max(0, deadline - time.monotonic()))
+
+        for process, name in self.children.values():
+            if process.is_alive():
+                print(f"❌ Worker {name} did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+        print("Closing Worker Supervisor")
+
+    def states(self) -> Dict[str, dict]:
+        """
+        Returns busy/idle state of every child, keyed by rq worker name.
+        """
+        try:
+            registered = {
+                w.name: w for w in Worker.all(connection=self.redis_conn)
+            }
+        except Exception as e:
+            print("@@ERROR (worker states):", e)
+            registered = {}
+
+        states = {}
+        for slot, (process, name) in sorted(self.children.items()):
+            worker = registered.get(name)
+            states[name] = {
+                "slot": slot,
+                "pid": process.pid,
+                "alive": process.is_alive(),
+                "state": worker.get_state() if worker else "starting",
+                "job": worker.get_current_job_id() if worker else None,
+            }
+
+        return states
+
+    def report(self):
+        for name, state in self.states().items():
+            job = f" job={state['job']}" if state["job"] else ""
+            print(f"📊 [{state['slot']}] {name} pid={state['pid']} {state['state']}{job}")
+
+        try:
+            for name, stats in queue_stats(self.redis_conn).items():
+                print(
+                    f"📥 {name}: depth={stats['depth']} running={stats['running']} "
+                    f"oldest_wait={stats['oldest_wait_seconds']}s"
+                )
+        except Exception as e:
+            print("@@ERROR (queue stats):", e)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for slot in range(self.num_workers):
+            self._spawn(slot)
+
+        last_report = time.monotonic()
+        while not self.stopping:
+            self._restart_dead()
+
+            if time.monotonic() - last_report >= self.status_interval:
+                self.report()
+                last_report = time.monotonic()
+
+            time.sleep(1)
+
+        self._drain()
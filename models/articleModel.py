@@ -50,3 +50,10 @@ class RegenerateManualArticleModel(BaseModel):
     articleId: int
     trigger: str
     prompt: str
+
+
+class BatchArticleModel(BaseModel):
+    topicIds: List[int]
+    trigger: str
+    prompt: str | None = ""
+    regenerate: bool = False
@@ -30,6 +30,8 @@ class TopicModel(BaseModel):
     max_topics: int | None = 2
     time_duration: str | None = "24 hours"
     excluded_titles: ExcludedTitles | None = []
+    auto_pipeline: bool | None = False
+    single_pass: bool | None = False
 
 
 class RetryTopicModel(BaseModel):
@@ -50,3 +52,9 @@ class SingleTopicModel(BaseModel):
     categoryId: int
     prompt: str | None = ""
     userId: str
+    auto_pipeline: bool | None = False
+
+
+class DeletedTopicsModel(BaseModel):
+    categoryId: int
+    topicIds: List[int]
@@ -1,8 +1,14 @@
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from lib.validate_key import isValidApiKey
-from fastapi import APIRouter, Header, FastAPI
+from lib.queues import enqueue_many, get_queue, queue_stats
+from lib import job_state
+from lib.job_events import stream_job_events
+from lib.usage_rollup import USAGE_MAX_DAYS, default_range, usage_report
+from fastapi import APIRouter, Header, FastAPI, Query
 from contextlib import asynccontextmanager
+from datetime import date
+from typing import Optional
 
 from prisma.enums import TYPE, TRIGGER, STATUS
 from prisma import Prisma
@@ -10,12 +16,22 @@ import os
 
 # Queue for AI Agents
 from redis import Redis
-from rq import Queue
 
 # Create Topics with AI Agents
-from config.topic.create_topics import run_researcher_crew
-from schemas.topicSchema import TopicEntity, RetryTopicEntity, SingleTopicEntity
-from models.topicModel import TopicModel, RetryTopicModel, SingleTopicModel
+from config.topic.create_topics import run_researcher_crew, run_multi_category_crew
+from schemas.topicSchema import (
+    TopicEntity,
+    RetryTopicEntity,
+    SingleTopicEntity,
+    DeletedTopicsEntity,
+)
+from models.topicModel import (
+    TopicModel,
+    RetryTopicModel,
+    SingleTopicModel,
+    DeletedTopicsModel,
+)
+from lib.topic_index import topic_index
 
 # Create Articles with AI Agents using Topics
 from config.article.create_article import run_article_writer_crew
@@ -24,12 +40,14 @@ from schemas.articleSchema import (
     RegenerateArticleEntity,
     ManualArticleEntity,
     RegenerateManualArticleEntity,
+    BatchArticleEntity,
 )
 from models.articleModel import (
     ArticleModel,
     RegenerateArticleModel,
     ManualArticleModel,
     RegenerateManualArticleModel,
+    BatchArticleModel,
 )
 
 
@@ -49,7 +67,9 @@ apiRoute = APIRouter(lifespan=lifespan)
 
 # redis_conn = Redis(host="localhost", port=6379, db=0)
 redis_conn = Redis.from_url(os.getenv("REDIS_URL"))
-task_queue = Queue(connection=redis_conn)
+
+# Most topics one /create-articles/batch request may enqueue
+ARTICLE_BATCH_MAX = int(os.getenv("ARTICLE_BATCH_MAX", "25"))
 
 
 @apiRoute.post("/cron/create-topics")
@@ -69,19 +89,55 @@ async def create_topics(
         excluded_titles_json = jsonable_encoder(data["excluded_titles"])
         categories = await db.category.find_many(where={"slug": {"not": "blog"}})
 
-        for category in categories:
-            job = await db.job.create(
-                data={
-                    "categoryId": category.id,
-                    "type": TYPE.TOPIC_GENERATION,
-                    "trigger": TRIGGER.CRON,
-                    "status": STATUS.QUEUED,
+        # One INSERT for every category job, one Redis pipeline for every enqueue
+        jobs = await job_state.create_jobs(
+            db,
+            [category.id for category in categories],
+            TYPE.TOPIC_GENERATION,
+            TRIGGER.CRON,
+        )
+        job_ids = {job["categoryId"]: job["id"] for job in jobs}
+        queue = get_queue(TRIGGER.CRON, TYPE.TOPIC_GENERATION, redis_conn)
+
+        # One research pass for every category, fanned out to the category jobs
+        if data["single_pass"] and categories:
+            queue.enqueue(
+                run_multi_category_crew,
+                args=(
+                    data["min_topics"],
+                    data["max_topics"],
+                    data["time_duration"],
+                    excluded_titles_json,
+                    [
+                        {
+                            "id": category.id,
+                            "name": category.name,
+                            "slug": category.slug,
+                            "description": category.description,
+                        }
+                        for category in categories
+                    ],
+                    TRIGGER.CRON,
+                    job_ids,
+                    "",
+                ),
+                kwargs={"auto_pipeline": bool(data["auto_pipeline"])},
+                job_timeout=60 * 20,
+            )
+
+            return JSONResponse(
+                content={
+                    "message": "Successfully added process to queue",
+                    "jobIds": [job["id"] for job in jobs],
                 },
+                status_code=200,
             )
 
-            task_queue.enqueue(
-                run_researcher_crew,
-                args=(
+        enqueue_many(
+            queue,
+            run_researcher_crew,
+            [
+                (
                     data["min_topics"],
                     data["max_topics"],
                     data["time_duration"],
@@ -89,15 +145,18 @@ async def create_topics(
                     category.name,
                     category.id,
                     TRIGGER.CRON,
-                    job.id,
+                    job_ids[category.id],
                     "",
-                    os.getenv("GROQ_API_KEY_1"),
-                ),
-            ),
+                )
+                for category in categories
+            ],
+            kwargs={"auto_pipeline": bool(data["auto_pipeline"])},
+        )
 
         return JSONResponse(
             content={
                 "message": "Successfully added process to queue",
+                "jobIds": [job["id"] for job in jobs],
             },
             status_code=200,
         )
@@ -141,11 +200,7 @@ async def retry_topic(
             },
         )
 
-        api_key = os.getenv(
-            "GROQ_API_KEY_1" if job.trigger == TRIGGER.CRON else "GROQ_API_KEY_2"
-        )
-
-        task_queue.enqueue(
+        get_queue(job.trigger, TYPE.TOPIC_GENERATION, redis_conn).enqueue(
             run_researcher_crew,
             args=(
                 data["min_topics"],
@@ -157,7 +212,6 @@ async def retry_topic(
                 job.trigger,
                 data["jobId"],
                 "",
-                api_key,
             ),
         )
 
@@ -208,13 +262,7 @@ async def create_article(authorization: str = Header(None), body: ArticleModel =
             },
         )
 
-        api_key = os.getenv(
-            "GROQ_API_KEY_1"
-            if data["trigger"] == TRIGGER.CRON
-            else "GROQ_API_KEY_2"
-        )
-
-        task_queue.enqueue(
+        get_queue(data["trigger"], TYPE.ARTICLE_GENERATION, redis_conn).enqueue(
             run_article_writer_crew,
             args=(
                 data["title"],
@@ -225,7 +273,6 @@ async def create_article(authorization: str = Header(None), body: ArticleModel =
                 data["trigger"],
                 data["topicId"],
                 "",
-                api_key,
             ),
             job_timeout=60 * 10,
         )
@@ -244,6 +291,129 @@ async def create_article(authorization: str = Header(None), body: ArticleModel =
         )
 
 
+@apiRoute.post("/create-articles/batch")
+async def create_articles_batch(
+    authorization: str = Header(None), body: BatchArticleModel = None
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    secret = authorization.split(" ")[1]
+    if not isValidApiKey(secret):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    if not body:
+        return JSONResponse(
+            content={"message": "Invalid request body"}, status_code=400
+        )
+
+    try:
+        data = BatchArticleEntity(body)
+        topic_ids = list(dict.fromkeys(data["topicIds"]))
+
+        if len(topic_ids) > ARTICLE_BATCH_MAX:
+            return JSONResponse(
+                content={"message": f"At most {ARTICLE_BATCH_MAX} topics per batch"},
+                status_code=400,
+            )
+
+        # Completed topics already have an article, only regenerated on request
+        blocked = [STATUS.QUEUED, STATUS.PROCESSING]
+        if not data["regenerate"]:
+            blocked.append(STATUS.COMPLETED)
+
+        # The job is included for its trigger, a batch can mix CRON and MANUAL topics
+        topics = await db.topic.find_many(
+            where={"id": {"in": topic_ids}}, include={"job": True}
+        )
+        topics_by_id = {topic.id: topic for topic in topics}
+
+        results = []
+        accepted = []
+        for topicId in topic_ids:
+            topic = topics_by_id.get(topicId)
+            if not topic:
+                results.append(
+                    {"topicId": topicId, "accepted": False, "message": "Topic not found"}
+                )
+            elif topic.status in blocked:
+                results.append(
+                    {
+                        "topicId": topicId,
+                        "accepted": False,
+                        "message": "Topic already has an article, set regenerate to replace it"
+                        if topic.status == STATUS.COMPLETED
+                        else f"Topic is already {topic.status}",
+                    }
+                )
+            else:
+                accepted.append(topic)
+                results.append(
+                    {"topicId": topicId, "accepted": True, "jobId": topic.jobId}
+                )
+
+        # Claimed in one conditional update, a concurrent batch that got to
+        # one of the topics first makes this one enqueue nothing
+        if accepted and not await job_state.claim_topics(
+            db, [topic.id for topic in accepted], bool(data["regenerate"])
+        ):
+            return JSONResponse(
+                content={
+                    "message": "Some topics were queued by another request, nothing was enqueued. Please retry."
+                },
+                status_code=409,
+            )
+
+        if accepted:
+            await job_state.articles_queued(
+                db,
+                [topic.jobId for topic in accepted],
+                [topic.id for topic in accepted],
+                topics_claimed=True,
+            )
+
+            # Each article runs under its topic's own job trigger, which
+            # picks its queue, key reservation and usage attribution
+            by_trigger = {}
+            for topic in accepted:
+                trigger = topic.job.trigger if topic.job else data["trigger"]
+                by_trigger.setdefault(trigger, []).append(topic)
+
+            for trigger, trigger_topics in by_trigger.items():
+                enqueue_many(
+                    get_queue(trigger, TYPE.ARTICLE_GENERATION, redis_conn),
+                    run_article_writer_crew,
+                    [
+                        (
+                            topic.title,
+                            topic.summary,
+                            topic.source,
+                            topic.jobId,
+                            topic.categoryId,
+                            trigger,
+                            topic.id,
+                            data["prompt"] or "",
+                        )
+                        for topic in trigger_topics
+                    ],
+                    timeout=60 * 10,
+                )
+
+        return JSONResponse(
+            content={
+                "message": f"Successfully added {len(accepted)} of {len(topic_ids)} topics to queue",
+                "topics": results,
+            },
+            status_code=200,
+        )
+
+    except Exception as e:
+        print("@@ERROR (create_articles_batch):", e)
+        return JSONResponse(
+            content={"message": "Invalid request body"}, status_code=400
+        )
+
+
 @apiRoute.post("/regenerate-article")
 async def regenerate_article(
     authorization: str = Header(None), body: RegenerateArticleModel = None
@@ -288,13 +458,7 @@ async def regenerate_article(
             },
         )
 
-        api_key = os.getenv(
-            "GROQ_API_KEY_1"
-            if data["trigger"] == TRIGGER.CRON
-            else "GROQ_API_KEY_2"
-        )
-
-        task_queue.enqueue(
+        get_queue(data["trigger"], TYPE.ARTICLE_GENERATION, redis_conn).enqueue(
             run_article_writer_crew,
             args=(
                 data["title"],
@@ -305,7 +469,6 @@ async def regenerate_article(
                 data["trigger"],
                 data["topicId"],
                 "",
-                api_key,
             ),
             job_timeout=60 * 10,
         )
@@ -364,13 +527,7 @@ async def create_manual_article(
             },
         )
 
-        api_key = os.getenv(
-            "GROQ_API_KEY_1"
-            if data["trigger"] == TRIGGER.CRON
-            else "GROQ_API_KEY_2"
-        )
-
-        task_queue.enqueue(
+        get_queue(data["trigger"], TYPE.ARTICLE_GENERATION, redis_conn).enqueue(
             run_article_writer_crew,
             args=(
                 data["title"],
@@ -381,7 +538,6 @@ async def create_manual_article(
                 data["trigger"],
                 data["topicId"],
                 data["prompt"],
-                api_key,
             ),
             job_timeout=60 * 10,
         )
@@ -447,13 +603,7 @@ async def regenerate_manual_article(
             },
         )
 
-        api_key = os.getenv(
-            "GROQ_API_KEY_1"
-            if data["trigger"] == TRIGGER.CRON
-            else "GROQ_API_KEY_2"
-        )
-
-        task_queue.enqueue(
+        get_queue(data["trigger"], TYPE.ARTICLE_GENERATION, redis_conn).enqueue(
             run_article_writer_crew,
             args=(
                 data["title"],
@@ -464,7 +614,6 @@ async def regenerate_manual_article(
                 data["trigger"],
                 data["topicId"],
                 data["prompt"],
-                api_key,
             ),
             job_timeout=60 * 10,
         )
@@ -509,7 +658,7 @@ async def create_topic(
             },
         )
 
-        task_queue.enqueue(
+        get_queue(TRIGGER.MANUAL, TYPE.TOPIC_GENERATION, redis_conn).enqueue(
             run_researcher_crew,
             args=(
                 data["min_topics"],
@@ -521,8 +670,8 @@ async def create_topic(
                 TRIGGER.MANUAL,
                 job.id,
                 data["prompt"],
-                os.getenv("GROQ_API_KEY_2"),
             ),
+            kwargs={"auto_pipeline": bool(data["auto_pipeline"])},
         ),
 
         return JSONResponse(
@@ -537,3 +686,136 @@ async def create_topic(
         return JSONResponse(
             content={"message": "Invalid request body"}, status_code=400
         )
+
+
+@apiRoute.post("/topics/deleted")
+async def topics_deleted(
+    authorization: str = Header(None), body: DeletedTopicsModel = None
+):
+    """
+    Called by the frontend after deleting topics, so new topics are no longer
+    compared against them.
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    secret = authorization.split(" ")[1]
+    if not isValidApiKey(secret):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    if not body:
+        return JSONResponse(
+            content={"message": "Invalid request body"}, status_code=400
+        )
+
+    try:
+        data = DeletedTopicsEntity(body)
+        topic_index.remove(data["categoryId"], data["topicIds"])
+
+        return JSONResponse(
+            content={"message": f"Removed {len(data['topicIds'])} topics from the index"},
+            status_code=200,
+        )
+
+    except Exception as e:
+        print("@@ERROR (topics_deleted):", e)
+        return JSONResponse(
+            content={"message": "Invalid request body"}, status_code=400
+        )
+
+
+@apiRoute.get("/queues/stats")
+async def get_queue_stats(authorization: str = Header(None)):
+    if not authorization or not authorization.startswith("Bearer "):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    secret = authorization.split(" ")[1]
+    if not isValidApiKey(secret):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    try:
+        return JSONResponse(content=queue_stats(redis_conn), status_code=200)
+
+    except Exception as e:
+        print("@@ERROR (queue_stats):", e)
+        return JSONResponse(
+            content={"message": "Failed to read queue stats"}, status_code=500
+        )
+
+
+@apiRoute.get("/usage")
+async def get_usage(
+    start: Optional[date] = Query(None, alias="from", description="YYYY-MM-DD, default 30 days ago"),
+    end: Optional[date] = Query(None, alias="to", description="YYYY-MM-DD, default today (UTC)"),
+    categoryId: Optional[int] = Query(None),
+    trigger: Optional[TRIGGER] = Query(None),
+    authorization: str = Header(None),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    secret = authorization.split(" ")[1]
+    if not isValidApiKey(secret):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    default_start, default_end = default_range()
+    start, end = start or default_start, end or default_end
+    if start > end or (end - start).days >= USAGE_MAX_DAYS:
+        return JSONResponse(
+            content={"message": f"Invalid range, from <= to and at most {USAGE_MAX_DAYS} days"},
+            status_code=400,
+        )
+
+    try:
+        report = await usage_report(db, start, end, categoryId, trigger)
+        return JSONResponse(content=report, status_code=200)
+
+    except Exception as e:
+        print("@@ERROR (usage):", e)
+        return JSONResponse(content={"message": "Failed to read usage"}, status_code=500)
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@apiRoute.get("/jobs/{jobId}/events")
+async def job_events(jobId: int, authorization: str = Header(None)):
+    if not authorization or not authorization.startswith("Bearer "):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    secret = authorization.split(" ")[1]
+    if not isValidApiKey(secret):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    return StreamingResponse(
+        stream_job_events([jobId]),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@apiRoute.get("/jobs/events")
+async def jobs_events(
+    ids: str = Query(..., description="Comma separated job ids"),
+    authorization: str = Header(None),
+):
+    if not authorization or not authorization.startswith("Bearer "):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    secret = authorization.split(" ")[1]
+    if not isValidApiKey(secret):
+        return JSONResponse(content={"message": "Unauthorized"}, status_code=401)
+
+    try:
+        jobIds = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        return JSONResponse(content={"message": "Invalid job ids"}, status_code=400)
+
+    if not jobIds:
+        return JSONResponse(content={"message": "Invalid job ids"}, status_code=400)
+
+    return StreamingResponse(
+        stream_job_events(jobIds),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
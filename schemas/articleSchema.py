@@ -148,3 +148,30 @@ def RegenerateManualArticleEntity(item) -> dict:
             "trigger": item.trigger,
             "prompt": item.prompt,
         }
+
+
+def BatchArticleEntity(item) -> dict:
+    """
+    Converts a batch of topic ids to a dictionary representation.
+
+    Args:
+        item: The batch item to convert.
+
+    Returns:
+        A dictionary representation of the batch item.
+    """
+
+    if item is None:
+        return {
+            "topicIds": None,
+            "trigger": None,
+            "prompt": None,
+            "regenerate": None,
+        }
+    else:
+        return {
+            "topicIds": item.topicIds,
+            "trigger": item.trigger,
+            "prompt": item.prompt,
+            "regenerate": item.regenerate,
+        }
@@ -14,6 +14,8 @@ def TopicEntity(item) -> dict:
             "max_topics": None,
             "time_duration": None,
             "excluded_titles": None,
+            "auto_pipeline": None,
+            "single_pass": None,
         }
     else:
         return {
@@ -21,6 +23,8 @@ def TopicEntity(item) -> dict:
             "max_topics": item.max_topics,
             "time_duration": item.time_duration,
             "excluded_titles": item.excluded_titles,
+            "auto_pipeline": item.auto_pipeline,
+            "single_pass": item.single_pass,
         }
 
 
@@ -75,6 +79,7 @@ def SingleTopicEntity(item) -> dict:
             "categoryId": None,
             "prompt": None,
             "userId": None,
+            "auto_pipeline": None,
         }
     else:
         return {
@@ -85,4 +90,27 @@ def SingleTopicEntity(item) -> dict:
             "categoryId": item.categoryId,
             "prompt": item.prompt,
             "userId": item.userId,
+            "auto_pipeline": item.auto_pipeline,
+        }
+
+
+def DeletedTopicsEntity(item) -> dict:
+    """
+    Converts a list of deleted topic ids to a dictionary representation.
+
+    Args:
+        item: The deleted topics item to convert.
+
+    Returns:
+        A dictionary representation of the deleted topics item.
+    """
+    if item is None:
+        return {
+            "categoryId": None,
+            "topicIds": None,
+        }
+    else:
+        return {
+            "categoryId": item.categoryId,
+            "topicIds": item.topicIds,
         }
@@ -1,16 +1,14 @@
-from rq import Worker, Queue
-from redis import Redis
 import sys
 import os
 
 # Add current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from lib.worker_pool import WorkerSupervisor, WORKER_PROCESSES
+
 # Connect to Redis inside Docker (service name)
 # redis_conn = Redis(host='redis', port=6379)
-redis_conn = Redis.from_url(os.getenv("REDIS_URL"))
 
-# Start RQ worker
-queue = Queue(connection=redis_conn)
-worker = Worker([queue], connection=redis_conn)
-worker.work()
+# Start a supervisor with N RQ workers (WORKER_PROCESSES, defaults to core count)
+if __name__ == "__main__":
+    WorkerSupervisor(num_workers=WORKER_PROCESSES).run()